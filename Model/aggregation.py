@@ -0,0 +1,300 @@
+# Dependences
+import numpy as np
+import pandas as pd
+
+# default quantiles of the monte carlo summaries, the outer and inner pairs are plotted as bands around the median
+DEFAULT_QUANTILES = (0.05, 0.25, 0.5, 0.75, 0.95)
+
+# statistics of every summary besides the quantiles
+SUMMARY_STATISTICS = ['count', 'mean', 'std', 'min', 'max']
+
+
+# Helper Functions
+def quantile_column(q):
+    """
+    Summary column of a quantile, e.g. 0.05 -> 'p5' and 0.975 -> 'p97.5'.
+    """
+    return 'p' + f'{q * 100:g}'
+
+def _check_quantiles(quantiles):
+    quantiles = tuple(float(q) for q in quantiles)
+    if any(not 0 <= q <= 1 for q in quantiles):
+        raise ValueError(f"Quantiles have to lie between 0 and 1, not {quantiles}.")
+    return quantiles
+
+def summarize_runs(df, aggregate_dimension, y, quantiles=DEFAULT_QUANTILES):
+    '''
+    Definition:
+    Summarize the monte carlo runs of a metric along a dimension in a single pass: the values are sorted once by
+    the dimension and their value, all statistics are reduced from the sorted array. Quantiles are interpolated
+    linearly like pandas' quantile() and median(), NaN values are ignored.
+
+    Parameters:
+    df: data frame of the simulation results, e.g. of all runs
+    aggregate_dimension: the dimension to aggregate on, the standard one is timestep
+    y: the metric to summarize
+    quantiles: quantiles of the summary, see DEFAULT_QUANTILES
+
+    Returns:
+    data frame with the aggregate dimension and the columns count, mean, std, min, max and one column per quantile
+    (see quantile_column), one row per value of the aggregate dimension
+    '''
+    quantiles = _check_quantiles(quantiles)
+    keys, groups = np.unique(df[aggregate_dimension].to_numpy(), return_inverse=True)
+    values = np.asarray(df[y], dtype=float)
+    valid = ~np.isnan(values)
+    groups, values = groups[valid], values[valid]
+
+    # one sort by group and value yields the group boundaries, the extremes and the order statistics
+    order = np.lexsort((values, groups))
+    groups, values = groups[order], values[order]
+    count = np.bincount(groups, minlength=len(keys))
+    start = np.concatenate(([0], np.cumsum(count)[:-1]))
+    last = start + count - 1
+    empty = count == 0
+
+    with np.errstate(invalid='ignore', divide='ignore'):
+        mean = np.bincount(groups, weights=values, minlength=len(keys)) / count
+        std = np.sqrt(np.bincount(groups, weights=(values - mean[groups])**2, minlength=len(keys)) / (count - 1))
+    std[count < 2] = np.nan
+    summary = {
+        aggregate_dimension: keys,
+        'count': count,
+        'mean': mean,
+        'std': std,
+        'min': np.where(empty, np.nan, values[np.minimum(start, len(values) - 1)] if len(values) else np.nan),
+        'max': np.where(empty, np.nan, values[np.maximum(last, 0)] if len(values) else np.nan),
+    }
+    for q in quantiles:
+        position = start + q * np.maximum(count - 1, 0)
+        lower = np.floor(position).astype(int)
+        upper = np.minimum(lower + 1, np.maximum(last, 0))
+        if len(values):
+            lower_values = values[np.minimum(lower, len(values) - 1)]
+            upper_values = values[np.minimum(upper, len(values) - 1)]
+            summary[quantile_column(q)] = np.where(empty, np.nan, lower_values + (position - lower) * (upper_values - lower_values))
+        else:
+            summary[quantile_column(q)] = np.full(len(keys), np.nan)
+    return pd.DataFrame(summary)
+
+
+class Welford:
+    """
+    Running count, mean, variance, minimum and maximum of many cells at once (Welford's algorithm), e.g. of every
+    timestep and metric of the monte carlo runs. Numerically stable and exact up to floating point errors.
+
+    cells: initial number of cells, grown by resize()
+    """
+
+    def __init__(self, cells=0):
+        self.count = np.zeros(cells, dtype=np.int64)
+        self.mean = np.zeros(cells)
+        self.m2 = np.zeros(cells)
+        self.min = np.full(cells, np.inf)
+        self.max = np.full(cells, -np.inf)
+
+    def resize(self, cells):
+        grow = cells - len(self.count)
+        if grow > 0:
+            self.count = np.concatenate([self.count, np.zeros(grow, dtype=np.int64)])
+            self.mean = np.concatenate([self.mean, np.zeros(grow)])
+            self.m2 = np.concatenate([self.m2, np.zeros(grow)])
+            self.min = np.concatenate([self.min, np.full(grow, np.inf)])
+            self.max = np.concatenate([self.max, np.full(grow, -np.inf)])
+
+    def update(self, cells, values):
+        """
+        Add one value to each of the given cells, the cells must be unique.
+        """
+        self.count[cells] += 1
+        delta = values - self.mean[cells]
+        self.mean[cells] += delta / self.count[cells]
+        self.m2[cells] += delta * (values - self.mean[cells])
+        self.min[cells] = np.minimum(self.min[cells], values)
+        self.max[cells] = np.maximum(self.max[cells], values)
+
+    def std(self):
+        """
+        Sample standard deviation of every cell, NaN for cells with less than two values.
+        """
+        with np.errstate(invalid='ignore', divide='ignore'):
+            return np.where(self.count > 1, np.sqrt(self.m2 / (self.count - 1)), np.nan)
+
+
+class P2Quantiles:
+    """
+    Streaming estimates of quantiles of many cells at once with the P² algorithm (Jain & Chlamtac, 1985): five
+    markers per cell and quantile are moved towards their desired positions with piecewise parabolic interpolation,
+    so the memory use does not grow with the number of values. The first five values of a cell are kept and give
+    exact quantiles.
+
+    quantiles: the estimated quantiles, e.g. (0.05, 0.95)
+    cells: initial number of cells, grown by resize()
+    """
+
+    def __init__(self, quantiles, cells=0):
+        self.quantiles = _check_quantiles(quantiles)
+        q = np.array(self.quantiles)[:, None]
+        self.increments = np.hstack([np.zeros_like(q), q / 2, q, (1 + q) / 2, np.ones_like(q)])
+        self.count = np.zeros(0, dtype=np.int64)
+        self.heights = np.zeros((0, len(self.quantiles), 5))
+        self.positions = np.zeros((0, len(self.quantiles), 5))
+        self.desired = np.zeros((0, len(self.quantiles), 5))
+        self.resize(cells)
+
+    def resize(self, cells):
+        grow = cells - len(self.count)
+        if grow > 0:
+            shape = (grow, len(self.quantiles), 5)
+            self.count = np.concatenate([self.count, np.zeros(grow, dtype=np.int64)])
+            self.heights = np.concatenate([self.heights, np.zeros(shape)])
+            self.positions = np.concatenate([self.positions, np.broadcast_to(np.arange(1, 6, dtype=float), shape)])
+            self.desired = np.concatenate([self.desired, np.broadcast_to(1 + 4 * self.increments, shape)])
+
+    def update(self, cells, values):
+        """
+        Add one value to each of the given cells, the cells must be unique.
+        """
+        count = self.count[cells]
+        self.count[cells] += 1
+
+        # the first five values of a cell are the sorted initial marker heights
+        initial = count < 5
+        if initial.any():
+            initial_cells, slots = cells[initial], count[initial]
+            self.heights[initial_cells, :, slots] = values[initial][:, None]
+            full = initial_cells[slots == 4]
+            self.heights[full] = np.sort(self.heights[full], axis=2)
+        cells, values = cells[~initial], values[~initial]
+        if not len(cells):
+            return
+
+        # one row per cell and quantile
+        heights = self.heights[cells].reshape(-1, 5)
+        positions = self.positions[cells].reshape(-1, 5)
+        desired = (self.desired[cells] + self.increments).reshape(-1, 5)
+        values = np.repeat(values, len(self.quantiles))
+
+        # cell k of the markers that contains the value, the extreme markers are moved to new extremes
+        heights[:, 0] = np.minimum(heights[:, 0], values)
+        heights[:, 4] = np.maximum(heights[:, 4], values)
+        k = (values[:, None] >= heights[:, 1:4]).sum(axis=1)
+        positions += np.arange(5) > k[:, None]
+
+        # move the three middle markers by one position if they are off by more than one
+        for i in range(1, 4):
+            d = desired[:, i] - positions[:, i]
+            move = ((d >= 1) & (positions[:, i + 1] - positions[:, i] > 1)) | ((d <= -1) & (positions[:, i - 1] - positions[:, i] < -1))
+            if not move.any():
+                continue
+            d = np.sign(d[move])
+            h, n = heights[move], positions[move]
+            parabolic = h[:, i] + d / (n[:, i + 1] - n[:, i - 1]) * (
+                (n[:, i] - n[:, i - 1] + d) * (h[:, i + 1] - h[:, i]) / (n[:, i + 1] - n[:, i]) +
+                (n[:, i + 1] - n[:, i] - d) * (h[:, i] - h[:, i - 1]) / (n[:, i] - n[:, i - 1]))
+            neighbour = (i + d).astype(int)
+            rows = np.arange(len(d))
+            linear = h[:, i] + d * (h[rows, neighbour] - h[:, i]) / (n[rows, neighbour] - n[:, i])
+            h[:, i] = np.where((h[:, i - 1] < parabolic) & (parabolic < h[:, i + 1]), parabolic, linear)
+            n[:, i] += d
+            heights[move], positions[move] = h, n
+
+        shape = (len(cells), len(self.quantiles), 5)
+        self.heights[cells], self.positions[cells], self.desired[cells] = heights.reshape(shape), positions.reshape(shape), desired.reshape(shape)
+
+    def values(self):
+        """
+        Quantile estimates of every cell (cells x quantiles), exact for cells with at most five values, NaN for empty
+        cells.
+        """
+        estimates = self.heights[:, :, 2].copy()
+        estimates[self.count == 0] = np.nan
+        for count in range(1, 5):
+            few = self.count == count
+            if few.any():
+                estimates[few] = np.quantile(self.heights[few, 0, :count], self.quantiles, axis=1).T
+        return estimates
+
+
+class RunAggregator:
+    '''
+    Online summary of monte carlo runs, updated whenever runs complete instead of keeping all runs in memory: the
+    moments, minima and maxima per timestep are exact (see Welford), the quantiles are P² estimates (see P2Quantiles).
+    summary() has the same layout as summarize_runs().
+
+    metrics: metrics to summarize
+    aggregate_dimension: the dimension to aggregate on, the standard one is timestep
+    quantiles: quantiles of the summary, see DEFAULT_QUANTILES
+
+    Example:
+    aggregator = RunAggregator(['lp_token_price'])
+    for run_df in completed_runs:
+        aggregator.add(run_df)
+    aggregator.summary('lp_token_price')
+    '''
+
+    def __init__(self, metrics, aggregate_dimension='timestep', quantiles=DEFAULT_QUANTILES):
+        self.metrics = list(metrics)
+        self.aggregate_dimension = aggregate_dimension
+        self.quantiles = _check_quantiles(quantiles)
+        self.keys = []
+        self._key_index = {}
+        self.moments = Welford()
+        self.sketch = P2Quantiles(self.quantiles)
+
+    def __repr__(self):
+        return f"RunAggregator({self.metrics}, {len(self.keys)} {self.aggregate_dimension}s)"
+
+    def _key_indices(self, keys):
+        new_keys = [key for key in dict.fromkeys(keys.tolist()) if key not in self._key_index]
+        if new_keys:
+            for key in new_keys:
+                self._key_index[key] = len(self.keys)
+                self.keys.append(key)
+            cells = len(self.keys) * len(self.metrics)
+            self.moments.resize(cells)
+            self.sketch.resize(cells)
+        return np.array([self._key_index[key] for key in keys.tolist()], dtype=np.int64)
+
+    def add(self, data):
+        """
+        Add the results of completed runs, a data frame with the aggregate dimension and the metrics.
+        """
+        index = self._key_indices(data[self.aggregate_dimension].to_numpy())
+        cells = index[:, None] * len(self.metrics) + np.arange(len(self.metrics))
+        values = np.column_stack([np.asarray(data[metric], dtype=float) for metric in self.metrics])
+
+        # every cell takes one value per update, so repeated keys (several runs at once) are added in rounds
+        order = np.argsort(index, kind='stable')
+        starts = np.flatnonzero(np.diff(index[order], prepend=-1) != 0)
+        occurrence = np.empty(len(index), dtype=np.int64)
+        occurrence[order] = np.arange(len(index)) - np.repeat(starts, np.diff(np.append(starts, len(index))))
+        for round_ in range(occurrence.max() + 1 if len(index) else 0):
+            rows = occurrence == round_ if round_ or occurrence.any() else slice(None)
+            round_cells, round_values = cells[rows].ravel(), values[rows].ravel()
+            valid = ~np.isnan(round_values)
+            round_cells, round_values = round_cells[valid], round_values[valid]
+            self.moments.update(round_cells, round_values)
+            self.sketch.update(round_cells, round_values)
+
+    def summary(self, metric):
+        """
+        Summary of a metric per value of the aggregate dimension, sorted by the dimension (see summarize_runs).
+        """
+        j = self.metrics.index(metric)
+        order = np.argsort(np.array(self.keys), kind='stable') if self.keys else np.array([], dtype=int)
+        cells = order * len(self.metrics) + j
+        count = self.moments.count[cells]
+        empty = count == 0
+        summary = {
+            self.aggregate_dimension: np.array(self.keys)[order] if self.keys else np.array([]),
+            'count': count,
+            'mean': np.where(empty, np.nan, self.moments.mean[cells]),
+            'std': self.moments.std()[cells],
+            'min': np.where(empty, np.nan, self.moments.min[cells]),
+            'max': np.where(empty, np.nan, self.moments.max[cells]),
+        }
+        quantiles = self.sketch.values()[cells]
+        for i, q in enumerate(self.quantiles):
+            summary[quantile_column(q)] = quantiles[:, i]
+        return pd.DataFrame(summary)
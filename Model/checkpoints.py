@@ -0,0 +1,167 @@
+# Dependences
+import pickle
+import zlib
+
+import numpy as np
+
+# Project dependences
+from executor import single_run_in_place
+from parts.simulation_calendar import simulation_calendar, calendar_months, DATE_WINDOW_PARAMETERS, EVENT_DATE_PARAMETERS
+
+# amount parameters that only take effect in the month of their event date
+EVENT_AMOUNT_PARAMETERS = {
+    'airdrop_amount1': 'airdrop_date1',
+    'airdrop_amount2': 'airdrop_date2',
+    'airdrop_amount3': 'airdrop_date3',
+}
+
+
+class Checkpoints:
+    """
+    Compressed state snapshots of one run of the in-place executor at chosen timesteps, used to fork scenario
+    variants from the last unaffected timestep instead of re-simulating them from the start (see fork_run).
+    The initial state (timestep 0) is always checkpointed.
+
+    timesteps: timesteps at whose end the state is saved
+    """
+
+    def __init__(self, timesteps=()):
+        self.timesteps = frozenset(int(timestep) for timestep in timesteps) | {0}
+        self.params = None
+        self._states = {}
+
+    def __contains__(self, timestep):
+        return timestep in self._states
+
+    def __len__(self):
+        return len(self._states)
+
+    def __repr__(self):
+        return f"Checkpoints({sorted(self._states)}, {self.nbytes} bytes)"
+
+    @property
+    def nbytes(self):
+        """
+        Size of all compressed checkpoint states in bytes.
+        """
+        return sum(len(state) for state in self._states.values())
+
+    def reset(self, params):
+        """
+        Drop all checkpoints, called by the executor at the start of a run with the parameters of the run.
+        """
+        self.params = params
+        self._states = {}
+
+    def save(self, state):
+        """
+        Save a compressed snapshot of the state at the end of its timestep.
+        """
+        self._states[state['timestep']] = zlib.compress(pickle.dumps(state, -1), 1)
+
+    def state(self, timestep):
+        """
+        Copy of the state saved at the end of a timestep.
+        """
+        return pickle.loads(zlib.decompress(self._states[timestep]))
+
+    def latest(self, before):
+        """
+        Latest checkpointed timestep before the given timestep.
+        """
+        return max(timestep for timestep in self._states if timestep < before)
+
+
+# Helper Functions
+def changed_parameters(base_params, params):
+    """
+    Names of the parameters that differ between two parameter sets.
+    """
+    keys = list(base_params) + [key for key in params if key not in base_params]
+    return [key for key in keys if key not in base_params or key not in params or not _equal(base_params[key], params[key])]
+
+def _equal(a, b):
+    try:
+        return bool(np.all(a == b)) if isinstance(a, np.ndarray) or isinstance(b, np.ndarray) else a == b
+    except (TypeError, ValueError):
+        return False
+
+def earliest_affected_timestep(base_params, params, timesteps):
+    '''
+    Definition:
+    Earliest timestep whose state can differ between runs with two parameter sets, all earlier timesteps are equal.
+    Date window parameters (see DATE_WINDOW_PARAMETERS) take effect at the first month whose window membership changes,
+    event dates (see EVENT_DATE_PARAMETERS) and their amounts (see EVENT_AMOUNT_PARAMETERS) at the first month of an
+    old or new event. All other parameters may change the state from the first timestep on.
+
+    Parameters:
+    base_params: parameter set of the original run
+    params: modified parameter set
+    timesteps: number of simulated timesteps
+
+    Returns:
+    first affected timestep, timesteps + 1 if no timestep is affected
+    '''
+    changed = changed_parameters(base_params, params)
+    if not changed:
+        return timesteps + 1
+
+    window_parameters = {key: name for name, keys in DATE_WINDOW_PARAMETERS.items() for key in keys}
+    if any(key not in window_parameters and key not in EVENT_DATE_PARAMETERS and key not in EVENT_AMOUNT_PARAMETERS for key in changed):
+        return 1
+
+    # the policies of timestep t read the calendar at the timesteps t-1 and t, so a change of the calendar at
+    # timestep t can affect the state of timestep t onwards
+    months = calendar_months(timesteps)
+    base_calendar = simulation_calendar(base_params, months=months)
+    calendar = simulation_calendar(params, months=months)
+    changed_months = [timesteps + 1]
+    for key in changed:
+        if key in window_parameters:
+            name = window_parameters[key]
+            changed_months.extend(np.flatnonzero(base_calendar.windows[name] != calendar.windows[name]))
+        else:
+            name = EVENT_AMOUNT_PARAMETERS.get(key, key)
+            changed_months.extend(np.flatnonzero(base_calendar.events[name] | calendar.events[name]))
+    return int(max(min(changed_months), 1))
+
+
+# Scenario Forks
+def checkpointed_run(initial_state, state_update_blocks, params, timesteps, checkpoint_timesteps, **kwargs):
+    '''
+    Definition:
+    Run one parameter set with the in-place executor and checkpoint its state at the given timesteps.
+
+    Parameters:
+    checkpoint_timesteps: timesteps at whose end the state is saved, e.g. range(12, timesteps, 12)
+    further parameters: see executor.single_run_in_place
+
+    Returns:
+    list of state records, Checkpoints of the run
+    '''
+    checkpoints = Checkpoints(checkpoint_timesteps)
+    records = single_run_in_place(initial_state, state_update_blocks, params, timesteps, checkpoints=checkpoints, **kwargs)
+    return records, checkpoints
+
+def fork_run(checkpoints, state_update_blocks, params, timesteps, **kwargs):
+    '''
+    Definition:
+    Simulate a variant of a checkpointed run with modified parameters, starting from the latest checkpoint before the
+    earliest timestep the parameter changes can affect (see earliest_affected_timestep). The records of the
+    checkpointed run up to that checkpoint are valid for the variant as well.
+
+    Parameters:
+    checkpoints: Checkpoints of the original run (see checkpointed_run)
+    state_update_blocks: the QTM state update block of the original run
+    params: modified parameter set
+    timesteps: number of simulated timesteps
+    further parameters: see executor.single_run_in_place, e.g. the same run, subset and record_substeps as before
+
+    Returns:
+    checkpoint timestep the variant was forked from, list of state records of the later timesteps
+    '''
+    if checkpoints.params is None:
+        raise ValueError("The checkpoints do not belong to a run yet.")
+    fork_timestep = checkpoints.latest(earliest_affected_timestep(checkpoints.params, params, timesteps))
+    records = single_run_in_place(checkpoints.state(fork_timestep), state_update_blocks, params, timesteps, resume=True, **kwargs)
+    return fork_timestep, records
@@ -0,0 +1,252 @@
+# Dependences
+import argparse
+import json
+import math
+import os
+import sys
+import time
+import traceback
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+# Project dependences
+# Get the current directory
+current_dir = os.path.dirname(os.path.abspath(__file__))
+
+# Go up one folder
+parent_dir = os.path.abspath(os.path.join(current_dir, os.pardir))
+
+# Append the parent directory to sys.path
+sys.path.append(parent_dir)
+
+from sys_params import QTM_INPUTS
+from sweep import available_processes
+
+
+# Helper Functions
+def scenario_name(path):
+    """
+    Experiment name of an inputs CSV file, its file name without extension.
+    """
+    return os.path.splitext(os.path.basename(path))[0]
+
+def find_inputs(paths):
+    """
+    Inputs CSV files of the given files and directories (all CSV files of a directory), in the given order.
+    """
+    files = []
+    for path in paths:
+        if os.path.isdir(path):
+            files.extend(sorted(os.path.join(path, name) for name in os.listdir(path) if name.lower().endswith('.csv')))
+        elif os.path.isfile(path):
+            files.append(path)
+        else:
+            raise FileNotFoundError(f"The inputs file {path} does not exist.")
+    return files
+
+def read_sweep_spec(path):
+    '''
+    Definition:
+    Read a sweep spec, a JSON file with the parameter values to sweep and optionally the inputs files to sweep them
+    for, e.g. {"inputs": ["client_a.csv"], "sweep": {"lock_apr": [5, 10, 15]}}. Relative inputs paths are relative to
+    the spec file. All parameter subsets of an inputs file are combined with all combinations of the swept values
+    (see sweep.cartesian_sweep).
+
+    Returns:
+    list of inputs files, dictionary of the swept parameters and their values
+    '''
+    with open(path) as f:
+        spec = json.load(f)
+    unknown_keys = [key for key in spec if key not in ('inputs', 'sweep')]
+    if unknown_keys:
+        raise ValueError(f"The sweep spec {path} has unknown keys {unknown_keys}, use 'inputs' and 'sweep'.")
+    inputs = spec.get('inputs', [])
+    inputs = [inputs] if isinstance(inputs, str) else inputs
+    spec_dir = os.path.dirname(os.path.abspath(path))
+    return [os.path.join(spec_dir, inputs_path) for inputs_path in inputs], spec.get('sweep', {})
+
+def parse_substeps(value):
+    """
+    Substeps of the --substeps option, e.g. '16,19,23'.
+    """
+    try:
+        return sorted(set(int(substep) for substep in value.split(',') if substep.strip()))
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"The substeps have to be comma separated numbers, not '{value}'.")
+
+def parse_metrics(value):
+    """
+    Metrics of the --metrics option, e.g. 'lp_token_price,ua_product_users'.
+    """
+    return [metric.strip() for metric in value.split(',') if metric.strip()]
+
+def scenario_tasks(inputs, sweep, runs, workers):
+    """
+    Split the monte carlo runs of all parameter subsets of a scenario into tasks of about the same number of runs, at
+    least one task per worker if there are enough runs (see sweep.run_chunks). A scenario with a single parameter
+    subset and many runs is thus simulated by all workers as well.
+    Returns the number of subsets and the list of ((first subset, last subset + 1), (first run, last run + 1)) of
+    the tasks.
+    """
+    from model import load_model
+    from sweep import cartesian_sweep, run_chunks
+
+    sys_param = load_model(inputs).sys_param
+    if sweep:
+        sys_param = cartesian_sweep(sys_param, sweep)
+    subsets = max(len(values) for values in sys_param.values())
+    chunk_size = math.ceil(subsets * runs / workers)
+    return subsets, [((first_subset, first_subset + max(len(values) for values in chunk_param.values())), (first_run, first_run + chunk_runs))
+                     for first_subset, first_run, chunk_param, chunk_runs in run_chunks(sys_param, runs, chunk_size)]
+
+
+# Workers
+def run_task(scenario, inputs, sweep, subsets, runs, store, table, timesteps, substeps, metrics, engine='in-place'):
+    '''
+    Definition:
+    Simulate a range of monte carlo runs of a range of parameter subsets of a scenario with the in-place executor or
+    the vectorized engine in a worker process and append the results to the result store.
+
+    Parameters:
+    scenario: name of the scenario, the experiment name of its results
+    inputs: path of the inputs CSV file
+    sweep: dictionary of swept parameters and their values, may be empty
+    subsets: (first subset, last subset + 1) of the task
+    runs: (first run, last run + 1) of the task, 0-based
+    engine: 'in-place' to run every subset and run with the in-place executor, 'vectorized' to simulate all runs of a
+            subset at once with the vectorized engine
+    further parameters: see the command line options
+
+    Returns:
+    dictionary with the scenario, the number of written rows and the start and end time of the task
+    '''
+    from radcad.core import generate_parameter_sweep
+    from model import load_model
+    from sweep import cartesian_sweep
+    from executor import single_run_in_place
+    from vectorized_simulation import vectorized_run
+    from result_sinks import SelectionSink, SQLiteSink, ArrowSink
+    from result_store import is_arrow_store
+
+    start_time = time.time()
+    model = load_model(inputs)
+    sys_param = cartesian_sweep(model.sys_param, sweep) if sweep else model.sys_param
+    param_sweep = generate_parameter_sweep(sys_param)
+
+    target = (ArrowSink if is_arrow_store(store) else SQLiteSink)(store, table=table, experiment=scenario, if_exists='append')
+    with SelectionSink(target, metrics=metrics, keep_substeps=substeps is not None) as sink:
+        if engine == 'vectorized':
+            for subset in range(*subsets):
+                vectorized_run(param_sweep[subset], model.stakeholder_name_mapping, timesteps, substeps=substeps, runs=runs[1] - runs[0],
+                               subset=subset, sink=sink, action_dicts=True, first_run=runs[0])
+        else:
+            for run in range(*runs):
+                for subset in range(*subsets):
+                    single_run_in_place(model.initial_state, model.state_update_block, param_sweep[subset], timesteps,
+                                        run=run, subset=subset, record_substeps=substeps, sink=sink)
+    return {'scenario': scenario, 'rows': target.rows, 'start': start_time, 'end': time.time()}
+
+
+# Command Line Interface
+def build_parser():
+    parser = argparse.ArgumentParser(
+        prog='python cli.py',
+        description="Simulate Quantitative Token Model scenarios headless on a process pool and write their results "
+                    "into a result store. Every inputs CSV file is one scenario, its results are stored as the "
+                    "experiment named after the file.")
+    parser.add_argument('inputs', nargs='*',
+                        help="exported 'radCAD_inputs' CSV files or directories of them, defaults to the inputs in data/")
+    parser.add_argument('--sweep', metavar='SPEC',
+                        help="JSON sweep spec with the swept parameter values and optionally the inputs files, e.g. "
+                             "{\"inputs\": [\"client_a.csv\"], \"sweep\": {\"lock_apr\": [5, 10, 15]}}")
+    parser.add_argument('--store', default='results.db',
+                        help="result store, an SQLite database (e.g. results.db) or an Arrow store directory of Arrow "
+                             "IPC files, i.e. a path without extension (default: results.db)")
+    parser.add_argument('--table', default='simulation_data', help="results table (default: simulation_data)")
+    parser.add_argument('--runs', type=int, default=1, help="monte carlo runs per parameter subset (default: 1)")
+    parser.add_argument('--timesteps', type=int, default=120, help="simulated months (default: 120)")
+    parser.add_argument('--substeps', type=parse_substeps,
+                        help="comma separated substeps to record, e.g. 16,23, defaults to the last substep")
+    parser.add_argument('--workers', type=int, default=None,
+                        help="worker processes, defaults to the number of CPU cores minus one")
+    parser.add_argument('--metrics', type=parse_metrics,
+                        help="comma separated metrics to store, defaults to all metrics")
+    parser.add_argument('--engine', choices=['in-place', 'vectorized'], default='in-place',
+                        help="simulation engine, the in-place executor or the vectorized engine that simulates all runs "
+                             "of a task at once (default: in-place)")
+    return parser
+
+def main(argv=None):
+    '''
+    Definition:
+    Run the scenarios of the command line arguments, print the throughput of every scenario once it is complete.
+
+    Returns:
+    exit code, 1 if any scenario failed
+    '''
+    parser = build_parser()
+    args = parser.parse_args(argv)
+    if args.runs < 1 or args.timesteps < 1:
+        parser.error("--runs and --timesteps have to be positive.")
+
+    inputs, sweep = read_sweep_spec(args.sweep) if args.sweep else ([], {})
+    inputs = find_inputs(args.inputs or inputs or [QTM_INPUTS])
+    names = [scenario_name(path) for path in inputs]
+    duplicates = sorted(set(name for name in names if names.count(name) > 1))
+    if duplicates:
+        parser.error(f"The scenario names {duplicates} are not unique, rename the inputs files.")
+    workers = available_processes(args.workers)
+
+    # the results of the scenarios are replaced, the tasks of a scenario append to them
+    from result_store import open_result_store
+    with open_result_store(args.store) as store:
+        for name in set(names) & set(store.experiments(args.table)):
+            store.delete(name, table=args.table)
+
+    print(f"Simulating {len(inputs)} scenario(s) with {args.runs} run(s) of {args.timesteps} timesteps on {workers} worker(s) into {args.store}")
+    start_time = time.time()
+    scenarios, failed = {}, []
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = {}
+        for name, path in zip(names, inputs):
+            try:
+                subsets, tasks = scenario_tasks(path, sweep, args.runs, workers)
+            except Exception as e:
+                failed.append(name)
+                print(f"(x) {name}: {type(e).__name__}: {e}")
+                continue
+            scenarios[name] = {'subsets': subsets, 'tasks': len(tasks), 'done': 0, 'rows': 0, 'start': None, 'end': None}
+            for subset_range, run_range in tasks:
+                future = pool.submit(run_task, name, path, sweep, subset_range, run_range, args.store, args.table,
+                                     args.timesteps, args.substeps, args.metrics, args.engine)
+                futures[future] = name
+
+        for future in as_completed(futures):
+            name = futures[future]
+            stats = scenarios[name]
+            if name in failed:
+                continue
+            try:
+                result = future.result()
+            except Exception:
+                failed.append(name)
+                print(f"(x) {name} failed:\n{traceback.format_exc()}")
+                continue
+            stats['done'] += 1
+            stats['rows'] += result['rows']
+            stats['start'] = result['start'] if stats['start'] is None else min(stats['start'], result['start'])
+            stats['end'] = result['end'] if stats['end'] is None else max(stats['end'], result['end'])
+            if stats['done'] == stats['tasks']:
+                seconds = stats['end'] - stats['start']
+                simulated = stats['subsets'] * args.runs * args.timesteps
+                print(f"(✓) {name}: {stats['subsets']} subset(s) x {args.runs} run(s) in {seconds:.1f} s, "
+                      f"{simulated / seconds:.0f} timesteps/s, {stats['rows'] / seconds:.0f} rows/s, {stats['rows']} rows")
+
+    seconds = time.time() - start_time
+    total_rows = sum(stats['rows'] for name, stats in scenarios.items() if name not in failed)
+    print(f"{len(inputs) - len(failed)}/{len(inputs)} scenario(s) in {seconds:.1f} s, {total_rows} rows, "
+          f"{(len(inputs) - len(failed)) * 3600 / seconds:.0f} scenarios/h")
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,226 @@
+# Dependences
+import hashlib
+import pickle
+from collections.abc import Mapping
+from functools import reduce
+
+from radcad.core import generate_parameter_sweep
+
+
+class StateMutationError(TypeError):
+    """
+    Raised when a policy or a state update function mutates state variables it does not own.
+    """
+
+
+# Read-only state views
+class ReadOnlyView(Mapping):
+    """
+    Read-only view of a state variable for the policy functions of the in-place executor.
+    Nested mappings (e.g. the agents of an AgentTable) are wrapped on access, so nothing below the view can be
+    assigned either. copy() returns a shallow dictionary copy whose nested values stay read-only, whereas a pickled
+    and unpickled view is a plain (mutable) copy of the state variable.
+    """
+
+    __slots__ = ('_data',)
+
+    def __init__(self, data):
+        self._data = data
+
+    def __getitem__(self, key):
+        return read_only(self._data[key])
+
+    def __setitem__(self, key, value):
+        raise StateMutationError(f"Policy functions must not modify the state, tried to set '{key}'.")
+
+    def __delitem__(self, key):
+        raise StateMutationError(f"Policy functions must not modify the state, tried to delete '{key}'.")
+
+    def __contains__(self, key):
+        return key in self._data
+
+    def __iter__(self):
+        return iter(self._data)
+
+    def __len__(self):
+        return len(self._data)
+
+    def __repr__(self):
+        return f"ReadOnlyView({self._data!r})"
+
+    def copy(self):
+        return {key: read_only(value) for key, value in self._data.items()}
+
+    def __reduce__(self):
+        # pickling a view copies the underlying state variable, the copy is not read-only anymore
+        return (_unwrap, (self._data,))
+
+def _unwrap(data):
+    return data
+
+def read_only(value):
+    """
+    Wrap mappings into a ReadOnlyView, all other values (numbers, strings, dates) are immutable already.
+    """
+    if isinstance(value, Mapping):
+        return ReadOnlyView(value)
+    return value
+
+
+# Helper Functions
+def state_digests(state):
+    """
+    Digest of every state variable, used to detect accidental state mutations.
+    """
+    return {key: hashlib.sha1(pickle.dumps(value, -1)).digest() for key, value in state.items()}
+
+def check_state_digests(state, digests, allowed_keys, culprit):
+    """
+    Compare the state against previously computed digests and raise a StateMutationError for every changed
+    state variable that is not in allowed_keys.
+    """
+    current_digests = state_digests(state)
+    mutated_keys = [key for key in digests if key not in allowed_keys and current_digests[key] != digests[key]]
+    if mutated_keys:
+        raise StateMutationError(f"{culprit} mutated the state variable(s) {mutated_keys}.")
+    return current_digests
+
+def recorded_substep_set(record_substeps, n_substeps):
+    """
+    Set of the (1-based) substeps to record, see single_run_in_place().
+    """
+    if record_substeps is None:
+        return {n_substeps}
+    if record_substeps == 'all':
+        return set(range(1, n_substeps + 1))
+    record_substeps = set(record_substeps)
+    invalid_substeps = sorted(substep for substep in record_substeps if not 1 <= substep <= n_substeps)
+    if invalid_substeps:
+        raise ValueError(f"The substeps {invalid_substeps} are not part of the state update block with {n_substeps} substeps.")
+    return record_substeps
+
+def add_signals(signals, policy_signals):
+    """
+    Aggregate the signals of several policies of one substep the same way as radCAD does.
+    """
+    for key, value in policy_signals.items():
+        if signals.get(key, None):
+            signals[key] += value
+        else:
+            signals[key] = value
+    return signals
+
+
+# In-place Executor
+def single_run_in_place(initial_state, state_update_blocks, params, timesteps, simulation=0, run=0, subset=0,
+                        record_substeps=None, check_mutation=False, sink=None, checkpoints=None, resume=False):
+    '''
+    Definition:
+    radCAD compatible run of one parameter subset without copying the state between substeps.
+
+    The state is copied once at the beginning of the run. Afterwards, the policy functions receive read-only
+    views of the live state and the state update functions receive the live state itself and may update their
+    state variable in place. As in radCAD, the returned state variables are applied after all state update
+    functions of a substep were called. Only the recorded substeps are snapshotted.
+
+    Parameters:
+    initial_state: initial state variables
+    state_update_blocks: the QTM state update block
+    params: single parameter set
+    timesteps: number of simulated timesteps
+    record_substeps: (1-based) substeps to record, e.g. lp_transaction_substeps of state_update_blocks.py, 'all' for
+                     every substep (like radCAD), defaults to the last substep of each timestep (like radCAD
+                     Engine(drop_substeps=True)); the states of the other substeps are never copied
+    check_mutation: debug flag, raise a StateMutationError if a policy mutates the state or a state update
+                    function mutates another state variable than its own
+    sink: optional ResultSink (see result_sinks.py) that receives the records of every completed timestep, the
+          records are not kept afterwards and the state history of the policies only holds the current timestep
+    checkpoints: optional Checkpoints (see checkpoints.py) the state is saved to at each of its checkpoint timesteps
+    resume: continue a run from a checkpoint state (see Checkpoints.state()) given as initial state up to timesteps,
+            the checkpoint state itself is not recorded again
+
+    Returns:
+    list of state records, the same as the flattened radCAD results (empty if a sink is given)
+    '''
+    state = pickle.loads(pickle.dumps(initial_state, -1))
+    state['simulation'] = simulation
+    state['subset'] = subset
+    state['run'] = run + 1
+    state['substep'] = 0
+    if not state.get('timestep', False):
+        state['timestep'] = 0
+    initial_timestep = state['timestep']
+    first_timestep = initial_timestep if resume else 0
+
+    recorded_substeps = recorded_substep_set(record_substeps, len(state_update_blocks))
+    records = [] if resume else [pickle.loads(pickle.dumps(state, -1))]
+    state_view = ReadOnlyView(state)
+    if checkpoints is not None:
+        checkpoints.reset(params)
+        if first_timestep in checkpoints.timesteps:
+            checkpoints.save(state)
+
+    for timestep in range(first_timestep, timesteps):
+        for substep, psu in enumerate(state_update_blocks):
+            digests = state_digests(state) if check_mutation else None
+
+            # policies
+            policy_signals = []
+            for name, policy in psu['policies'].items():
+                policy_signals.append(policy(params, substep, records, state_view))
+                if check_mutation:
+                    digests = check_state_digests(state, digests, [], f"Policy '{name}'")
+            signals = reduce(add_signals, policy_signals, {}) if len(policy_signals) != 1 else policy_signals[0]
+
+            # state updates
+            updates = []
+            for key, function in psu['variables'].items():
+                if key not in state:
+                    raise KeyError("Invalid state key in partial state update block")
+                state_key, value = function(params, substep, records, state, signals)
+                if state_key != key:
+                    raise KeyError(f"PSU state key {key} doesn't match function state key {state_key}")
+                if isinstance(value, ReadOnlyView):
+                    raise StateMutationError(f"State update function '{function.__name__}' returned a read-only state view for '{key}'.")
+                if check_mutation:
+                    digests = check_state_digests(state, digests, [key], f"State update function '{function.__name__}'")
+                updates.append((key, value))
+            state.update(updates)
+
+            state['substep'] = substep + 1
+            state['timestep'] = initial_timestep + 1 if timestep == 0 else timestep + 1
+            if substep + 1 in recorded_substeps:
+                records.append(pickle.loads(pickle.dumps(state, -1)))
+
+        if checkpoints is not None and state['timestep'] in checkpoints.timesteps:
+            checkpoints.save(state)
+        if sink is not None:
+            sink.append(records)
+            records = []
+
+    if sink is not None and records:
+        sink.append(records)
+        records = []
+
+    return records
+
+def simulation_in_place(initial_state, state_update_blocks, sys_param, timesteps, runs=1, record_substeps=None,
+                        check_mutation=False, sink=None):
+    '''
+    Definition:
+    Run all parameter subsets and monte carlo runs with the in-place executor, in the same order as radCAD.
+    If a ResultSink is given, the results are streamed into the sink timestep by timestep and the sink is flushed at
+    the end, so the memory use does not grow with the number of runs.
+
+    Returns:
+    list of state records, use pd.DataFrame(records) as with radCAD results (empty if a sink is given)
+    '''
+    records = []
+    param_sweep = generate_parameter_sweep(sys_param)
+    for run in range(runs):
+        for subset, params in enumerate(param_sweep):
+            records.extend(single_run_in_place(initial_state, state_update_blocks, params, timesteps, run=run, subset=subset,
+                                               record_substeps=record_substeps, check_mutation=check_mutation, sink=sink))
+    if sink is not None:
+        sink.flush()
+    return records
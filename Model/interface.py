@@ -5,7 +5,7 @@ import pandas as pd
 import sqlite3
 import time
 from plots import *
-from simulation import simulation
+from worker import JobQueue, QUEUED, RUNNING, DONE, CANCELLED, FINISHED_STATES
 
 st.title('QTM File Upload')
 
@@ -31,6 +31,9 @@ if uploaded_file is not None:
     
     st.write(f"File '{uploaded_file.name}' uploaded successfully!")
 
+    # simulate the uploaded inputs from now on
+    st.session_state.inputs = file_path
+
 script_dir = os.path.dirname(os.path.abspath(__file__))
 script_path = os.path.join(script_dir, 'simulation.py')
 
@@ -49,23 +52,50 @@ if st.button('Plot Results'):
 
 
 if st.session_state.button_clicked:
-    
-    st.markdown("<div style='background-color:blue; padding:10px; border-radius:5px;'>Simulation running...</div>", unsafe_allow_html=True)
-    
-    # Run the simulation.py script
-    result = simulation()
 
-    if result == 0:
+    # submit the simulation to the background worker shared by all sessions, the page polls its progress, the results
+    # are stored as the experiment of the job, so jobs of other sessions do not overwrite them, and replace the results
+    # of the former job of the session
+    with JobQueue('interfaceData.db') as jobs:
+        st.session_state.job_id = jobs.submit(timesteps=12*10, runs=1, inputs=st.session_state.get('inputs'),
+                                              replaces=st.session_state.get('last_job_id'))
+    st.session_state.last_job_id = st.session_state.job_id
+    st.session_state.pop('experiment', None)
+
+    # Reset the session state variable after submitting the simulation
+    st.session_state.button_clicked = False
+
+
+
+if st.session_state.get('job_id') is not None:
+
+    with JobQueue('interfaceData.db') as jobs:
+        job = jobs.status(st.session_state.job_id)
+
+    if job['status'] in (QUEUED, RUNNING):
+        st.markdown("<div style='background-color:blue; padding:10px; border-radius:5px;'>Simulation running...</div>", unsafe_allow_html=True)
+        st.progress(job['progress'])
+        st.write(f"Simulated month {job['timestep']} of {job['timesteps']}")
+        if st.button('Cancel Simulation'):
+            with JobQueue('interfaceData.db') as jobs:
+                jobs.cancel(job['id'])
+        time.sleep(0.5)
+        st.experimental_rerun()
+
+    elif job['status'] == DONE:
         st.markdown("<div style='background-color:green; padding:10px; border-radius:5px;'>Simulation completed successfully!</div>", unsafe_allow_html=True)
-        #st.write(result.stdout.decode('utf-8'))
+        st.session_state.experiment = job['experiment']
+        plot_results('timestep', ['seed_a_tokens_vested_cum','angle_a_tokens_vested_cum','team_a_tokens_vested_cum','reserve_a_tokens_vested_cum'], 1, experiment=job['experiment'])
+
+    elif job['status'] == CANCELLED:
+        st.markdown("<div style='background-color:orange; padding:10px; border-radius:5px;'>Simulation cancelled.</div>", unsafe_allow_html=True)
+
     else:
         st.markdown("<div style='background-color:red; padding:10px; border-radius:5px;'>Simulation encountered an error.</div>", unsafe_allow_html=True)
-        st.write(result.stderr.decode('utf-8'))
-
-    plot_results('timestep', ['seed_a_tokens_vested_cum','angle_a_tokens_vested_cum','team_a_tokens_vested_cum','reserve_a_tokens_vested_cum'], 1)
+        st.write(job['message'])
 
-    # Reset the session state variable after running the simulation
-    st.session_state.button_clicked = False
+    if job['status'] in FINISHED_STATES:
+        st.session_state.job_id = None
 
 
 
@@ -73,7 +103,9 @@ if st.session_state.button_plot_clicked:
     
     st.markdown("<div style='background-color:blue; padding:10px; border-radius:5px;'>Plotting Results...</div>", unsafe_allow_html=True)
 
-    plot_results('timestep', ['seed_a_tokens_vested_cum','angle_a_tokens_vested_cum','team_a_tokens_vested_cum','reserve_a_tokens_vested_cum','presale_1_a_tokens_vested_cum'], 1)
+    # results of the last simulation job of the session, else of the last 'python simulation.py' run
+    plot_results('timestep', ['seed_a_tokens_vested_cum','angle_a_tokens_vested_cum','team_a_tokens_vested_cum','reserve_a_tokens_vested_cum','presale_1_a_tokens_vested_cum'], 1,
+                 experiment=st.session_state.get('experiment', 'default'))
 
     # Reset the session state variable after running the simulation
     st.session_state.button_plot_clicked = False
@@ -0,0 +1,67 @@
+# Dependences
+import os
+from functools import lru_cache
+
+from radcad.core import generate_parameter_sweep
+
+# Project dependences
+from sys_params import QTM_INPUTS, parse_inputs, derive_sys_param, stakeholder_name_mapping
+from state_variables import compose_initial_state
+from state_update_blocks import state_update_block
+
+
+class QTMModel:
+    """
+    Ready to simulate Quantitative Token Model of one set of inputs, see build_model().
+
+    inputs: the Quantitative Token Model inputs tab 'radCAD_inputs', path of its CSV file or its data frame
+    sys_param: system parameters, lists of parameter values (see sys_params.py)
+    initial_state: initial state variables (see state_variables.py)
+    state_update_block: the QTM state update block (see state_update_blocks.py)
+    stakeholder_name_mapping: agent names and their types
+    """
+
+    def __init__(self, inputs, sys_param, initial_state, state_update_block, stakeholder_name_mapping):
+        self.inputs = inputs
+        self.sys_param = sys_param
+        self.initial_state = initial_state
+        self.state_update_block = state_update_block
+        self.stakeholder_name_mapping = stakeholder_name_mapping
+
+    def __repr__(self):
+        return f"QTMModel({len(self.param_sweep())} parameter subsets, {len(self.state_update_block)} substeps)"
+
+    def param_sweep(self):
+        """
+        Parameter sets of all parameter subsets, as simulated by radCAD.
+        """
+        return generate_parameter_sweep(self.sys_param)
+
+
+def build_model(inputs=QTM_INPUTS):
+    '''
+    Definition:
+    Build the model of a set of Quantitative Token Model inputs without touching any module state, so a long
+    running server can switch between scenarios without reloading the model modules.
+
+    Parameters:
+    inputs: path of the exported 'radCAD_inputs' CSV file or its data frame, defaults to the inputs in data/
+
+    Returns:
+    QTMModel with the system parameters, initial state and state update block of the inputs
+    '''
+    sys_param = derive_sys_param(parse_inputs(inputs))
+    initial_state = compose_initial_state(sys_param, stakeholder_name_mapping)
+    return QTMModel(inputs, sys_param, initial_state, state_update_block, stakeholder_name_mapping)
+
+@lru_cache(maxsize=8)
+def _cached_model(path, modified, size):
+    return build_model(path)
+
+def load_model(path=QTM_INPUTS):
+    """
+    Cached build_model() of an inputs CSV file, rebuilt when the file changes. The model must not be modified.
+    """
+    path = os.path.abspath(path)
+    stat = os.stat(path)
+    return _cached_model(path, stat.st_mtime_ns, stat.st_size)
@@ -0,0 +1,169 @@
+from collections.abc import MutableMapping
+
+import numpy as np
+
+__all__ = ['AgentTable', 'AgentView', 'AgentColumns', 'AGENT_FIELDS', 'AGENT_OBJECT_FIELDS', 'AGENT_NUMERIC_FIELDS', 'AGENT_FIELD_INDEX']
+
+# agent fields in the order of new_agent() in parts/utils.py
+AGENT_FIELDS = [
+    'a_name', 'a_type', 'a_usd_funds', 'a_tokens',
+    'a_tokens_vested', 'a_tokens_vested_cum',
+    'a_tokens_airdropped', 'a_tokens_airdropped_cum',
+    'a_tokens_incentivised', 'a_tokens_incentivised_cum',
+    'a_tokens_apr_locked', 'a_tokens_apr_locked_cum', 'a_tokens_apr_locked_remove', 'a_tokens_apr_locked_rewards',
+    'a_tokens_buyback_locked', 'a_tokens_buyback_locked_cum', 'a_tokens_buyback_locked_remove', 'a_tokens_buyback_locked_rewards',
+    'a_tokens_staking_vesting_locked', 'a_tokens_staking_vesting_locked_cum', 'a_tokens_staking_vesting_locked_remove', 'a_tokens_staking_vesting_locked_rewards',
+    'a_tokens_liquidity_mining', 'a_tokens_liquidity_mining_cum', 'a_tokens_liquidity_mining_remove', 'a_tokens_liquidity_mining_rewards',
+    'a_tokens_transferred', 'a_tokens_transferred_cum', 'a_tokens_burned', 'a_tokens_burned_cum',
+    'a_selling_tokens', 'a_utility_tokens', 'a_holding_tokens',
+    'a_selling_from_holding_tokens', 'a_utility_from_holding_tokens', 'a_holding_from_holding_tokens',
+    'a_actions', 'a_current_action'
+]
+
+# agent fields that are no float values (names, types, action dictionaries)
+AGENT_OBJECT_FIELDS = ['a_name', 'a_type', 'a_actions', 'a_current_action']
+AGENT_NUMERIC_FIELDS = [field for field in AGENT_FIELDS if field not in AGENT_OBJECT_FIELDS]
+AGENT_FIELD_INDEX = {field: i for i, field in enumerate(AGENT_NUMERIC_FIELDS)}
+
+
+class AgentTable(MutableMapping):
+    """
+    Struct-of-arrays storage of all token ecosystem agents aka stakeholders.
+
+    Numeric agent fields are kept in one float64 array of shape (fields, agents), so every field is a contiguous row
+    (see AgentTable.columns). Agents are addressed by their integer index and AgentTable[index] returns a dict-like
+    view of a single agent, so policies written for the former uuid-keyed dict-of-dicts keep working.
+    The batched vectorized simulation uses tables with an additional run axis, i.e. numeric arrays of shape
+    (fields, runs, agents); the dict-like agent views are only supported for tables without run axis.
+    """
+
+    def __init__(self, numeric, objects):
+        self.numeric = numeric
+        self.objects = objects
+        self._views = [AgentView(self, i) for i in range(numeric.shape[-1])]
+        self.columns = AgentColumns(self)
+
+    @classmethod
+    def from_agents(cls, agents):
+        """
+        Create an agent table from an iterable of agent dictionaries as created by new_agent().
+        """
+        agents = list(agents)
+        numeric = np.array([[agent[field] for agent in agents] for field in AGENT_NUMERIC_FIELDS], dtype=np.float64).reshape(len(AGENT_NUMERIC_FIELDS), len(agents))
+        objects = {field: [agent[field] for agent in agents] for field in AGENT_OBJECT_FIELDS}
+        return cls(numeric, objects)
+
+    # dict-like view
+    def __getitem__(self, key):
+        try:
+            return self._views[key]
+        except (IndexError, TypeError):
+            raise KeyError(key)
+
+    def __setitem__(self, key, agent):
+        view = self[key]
+        for field, value in agent.items():
+            view[field] = value
+
+    def __delitem__(self, key):
+        raise TypeError("Agents can not be removed from an AgentTable.")
+
+    def __iter__(self):
+        return iter(range(len(self._views)))
+
+    def __len__(self):
+        return len(self._views)
+
+    def __repr__(self):
+        return f"AgentTable({', '.join(self.objects['a_name'])})"
+
+    def __getstate__(self):
+        return {'numeric': self.numeric, 'objects': self.objects}
+
+    def __setstate__(self, state):
+        self.__init__(state['numeric'], state['objects'])
+
+    def copy(self):
+        """
+        Independent copy of the agent state, i.e. a single array copy for all numeric fields. Unlike dict.copy() of the
+        former dict-of-dicts, updating an agent of the copy never changes the agent of the original table.
+        """
+        return AgentTable(self.numeric.copy(), {field: list(values) for field, values in self.objects.items()})
+
+    def batched(self, runs):
+        """
+        Independent copy of the agent state with a leading run axis of the given size for every numeric field.
+        """
+        return AgentTable(np.repeat(self.numeric[:, np.newaxis, :], runs, axis=1), {field: list(values) for field, values in self.objects.items()})
+
+    def mask(self, field, value):
+        """
+        Boolean array selecting the agents whose object field (e.g. 'a_type') equals value.
+        """
+        return np.array([x == value for x in self.objects[field]], dtype=bool)
+
+
+class AgentView(MutableMapping):
+    """
+    Dict-like view of a single agent in an AgentTable.
+    """
+
+    __slots__ = ('_table', '_index')
+
+    def __init__(self, table, index):
+        self._table = table
+        self._index = index
+
+    def __getitem__(self, field):
+        if field in AGENT_FIELD_INDEX:
+            return float(self._table.numeric[AGENT_FIELD_INDEX[field], self._index])
+        return self._table.objects[field][self._index]
+
+    def __setitem__(self, field, value):
+        if field in AGENT_FIELD_INDEX:
+            self._table.numeric[AGENT_FIELD_INDEX[field], self._index] = value
+        elif field in self._table.objects:
+            self._table.objects[field][self._index] = value
+        else:
+            raise KeyError(field)
+
+    def __delitem__(self, field):
+        raise TypeError("Agent fields can not be removed.")
+
+    def __iter__(self):
+        return iter(AGENT_FIELDS)
+
+    def __len__(self):
+        return len(AGENT_FIELDS)
+
+    def __repr__(self):
+        return repr(dict(self))
+
+    def copy(self):
+        return dict(self)
+
+
+class AgentColumns(MutableMapping):
+    """
+    Column access to the numeric agent fields of an AgentTable. Assigning a column writes into the table storage.
+    """
+
+    __slots__ = ('_table',)
+
+    def __init__(self, table):
+        self._table = table
+
+    def __getitem__(self, field):
+        return self._table.numeric[AGENT_FIELD_INDEX[field]]
+
+    def __setitem__(self, field, values):
+        self._table.numeric[AGENT_FIELD_INDEX[field]] = values
+
+    def __delitem__(self, field):
+        raise TypeError("Agent fields can not be removed.")
+
+    def __iter__(self):
+        return iter(AGENT_NUMERIC_FIELDS)
+
+    def __len__(self):
+        return len(AGENT_NUMERIC_FIELDS)
@@ -1,3 +1,35 @@
+import numpy as np
+
+# default concentration of the stochastic agent behavior (see draw_meta_bucket_shares)
+DEFAULT_BEHAVIOR_CONCENTRATION = 100
+
+# Helper Functions
+def draw_meta_bucket_shares(params, size, rng=np.random):
+    """
+    Draw random 'sell', 'hold' and 'utility' shares for the stochastic agent behavior.
+
+    The shares follow a Dirichlet distribution centred on the average token allocations of the parameter set and
+    sum up to the same total, i.e. to 1 for valid inputs. The input parameter agent_behavior_concentration (default
+    DEFAULT_BEHAVIOR_CONCENTRATION for inputs without it) controls the spread: the higher the concentration, the closer
+    the shares are to the averages.
+    size: number of draws, e.g. the number of agents or (runs, agents) for the batched vectorized simulation
+    rng: numpy random generator or the numpy.random module
+
+    Returns an array of shape size + (3,) with the 'sell', 'hold' and 'utility' shares in the last dimension.
+    """
+    size = (size,) if np.isscalar(size) else tuple(size)
+    average_shares = np.array([params['avg_token_selling_allocation'],
+                               params['avg_token_holding_allocation'],
+                               params['avg_token_utility_allocation']], dtype=float)
+    total_share = average_shares.sum()
+    if total_share <= 0:
+        return np.zeros(size + (3,))
+
+    concentration = params.get('agent_behavior_concentration', DEFAULT_BEHAVIOR_CONCENTRATION)
+    draws = rng.gamma(concentration * average_shares / total_share, size=size + (3,))
+    return total_share * draws / draws.sum(axis=-1, keepdims=True)
+
+
 # POLICY FUNCTIONS
 def generate_agent_meta_bucket_behavior(params, substep, state_history, prev_state, **kwargs):
     """
@@ -8,109 +40,29 @@ def generate_agent_meta_bucket_behavior(params, substep, state_history, prev_sta
         if params['agent_behavior'] == 'stochastic':
             """
             Define the agent behavior for each agent type for the stochastic agent behavior
-            Agent actions are based on a weighted random choices.
+            Agent meta bucket shares are drawn randomly around the average token allocations for every agent.
             """
-            agent_behavior_dict = {
-                'angle': {
-                    'trade': params['avg_token_selling_allocation']-params['avg_token_utility_removal']/3,
-                    'hold': params['avg_token_holding_allocation']-params['avg_token_utility_removal']/3,
-                    'utility': params['avg_token_utility_allocation']-params['avg_token_utility_removal']/3,
-                    'remove_locked_tokens': params['avg_token_utility_removal'],
-                },
-                'seed': {
-                    'trade': params['avg_token_selling_allocation']-params['avg_token_utility_removal']/3,
-                    'hold': params['avg_token_holding_allocation']-params['avg_token_utility_removal']/3,
-                    'utility': params['avg_token_utility_allocation']-params['avg_token_utility_removal']/3,
-                    'remove_locked_tokens': params['avg_token_utility_removal'],
-                },
-                'presale_1': {
-                    'trade': params['avg_token_selling_allocation']-params['avg_token_utility_removal']/3,
-                    'hold': params['avg_token_holding_allocation']-params['avg_token_utility_removal']/3,
-                    'utility': params['avg_token_utility_allocation']-params['avg_token_utility_removal']/3,
-                    'remove_locked_tokens': params['avg_token_utility_removal'],
-                },
-                'presale_2': {
-                    'trade': params['avg_token_selling_allocation']-params['avg_token_utility_removal']/3,
-                    'hold': params['avg_token_holding_allocation']-params['avg_token_utility_removal']/3,
-                    'utility': params['avg_token_utility_allocation']-params['avg_token_utility_removal']/3,
-                    'remove_locked_tokens': params['avg_token_utility_removal'],
-                },
-                'public_sale': {
-                    'trade': params['avg_token_selling_allocation']-params['avg_token_utility_removal']/3,
-                    'hold': params['avg_token_holding_allocation']-params['avg_token_utility_removal']/3,
-                    'utility': params['avg_token_utility_allocation']-params['avg_token_utility_removal']/3,
-                    'remove_locked_tokens': params['avg_token_utility_removal'],
-                },
-                'team': {
-                    'trade': params['avg_token_selling_allocation']-params['avg_token_utility_removal']/3,
-                    'hold': params['avg_token_holding_allocation']-params['avg_token_utility_removal']/3,
-                    'utility': params['avg_token_utility_allocation']-params['avg_token_utility_removal']/3,
-                    'remove_locked_tokens': params['avg_token_utility_removal'],
-                },
-                'reserve': {
-                    'trade': 0,
-                    'hold': 50,
-                    'utility': 0,
-                    'remove_locked_tokens': 0,
-                    'incentivise': 50
-                },
-                'community': {
-                    'trade': 0,
-                    'hold': 100,
-                    'utility': 0,
-                    'remove_locked_tokens': 0,
-                    'incentivise': 0
-                },
-                'foundation': {
-                    'trade': 0,
-                    'hold': 100,
-                    'utility': 0,
-                    'remove_locked_tokens': 0,
-                    'incentivise': 0
-                },
-                'incentivisation': {
-                    'trade': 0,
-                    'hold': 100,
-                    'utility': 0,
-                    'remove_locked_tokens': 0,
-                    'incentivise': 0
-                },
-                'staking_vesting': {
-                    'trade': 0,
-                    'hold': 100,
-                    'utility': 0,
-                    'remove_locked_tokens': 0,
-                    'incentivise': 0
-                },
-                'market_investors': {
-                    'trade': 60,
-                    'hold': 10,
-                    'utility': 25,
-                    'remove_locked_tokens': 5,
-                    'incentivise': 0
-                },
-                'airdrop_receivers': {
-                    'trade': 60,
-                    'hold': 10,
-                    'utility': 25,
-                    'remove_locked_tokens': 5,
-                    'incentivise': 0
-                },
-                'incentivisation_receivers': {
-                    'trade': 60,
-                    'hold': 10,
-                    'utility': 25,
-                    'remove_locked_tokens': 5,
-                    'incentivise': 0
+            agents = prev_state['agents']
+
+            # draw the agent meta bucket shares
+            shares = draw_meta_bucket_shares(params, size=len(agents))
+
+            # populate agent behavior dictionary
+            agent_behavior_dict = {}
+            for agent, (selling_share, holding_share, utility_share) in zip(agents, shares):
+                agent_behavior_dict[agent] = {
+                    'sell': selling_share,
+                    'hold': holding_share,
+                    'utility': utility_share,
+                    'remove_tokens': params['avg_token_utility_removal'],
                 }
-            }
         
         elif params['agent_behavior'] == 'static':
             """
             Define the agent behavior for each agent type for the static 1:1 QTM behavior
             ToDo: Consistency checks of correct meta bucket and utility share amounts, which should be 100% in total for each agent type
             """
-            agents = prev_state['agents'].copy()
+            agents = prev_state['agents']
             
             # initialize agent behavior dictionary
             agent_behavior_dict = {}
@@ -1,12 +1,18 @@
-import math
+from functools import lru_cache
+
+import numpy as np
 from parts.utils import *
+from parts.simulation_calendar import calendar_months, launch_calendar
 
+# The user adoption numbers refer to 10 years (product_users_after_10y & token_holders_after_10y)
+TOTAL_ADOPTION_DAYS = 3653
 
 
 def calculate_user_adoption(initial_users,final_users,velocity,timestamp,total_days):
     """
     Definition:
-        Function to take in user adoption data and calculate the amount of adoption, can be used for token adoption and product users
+        Function to take in user adoption data and calculate the amount of adoption, can be used for token adoption and product users.
+        All parameters may also be numpy arrays to evaluate the adoption for several timesteps or velocities at once.
     
     Parameters:
         initial_users: starting amount of users
@@ -17,14 +23,70 @@ def calculate_user_adoption(initial_users,final_users,velocity,timestamp,total_d
     
     """
 
-    term1 = (1 / (1 + math.exp(-velocity * 0.002 * (timestamp - 1825) / velocity))) * final_users + initial_users
-    term2 = (1 / (1 + math.exp(-velocity * 0.002 * (0 - 1825) / velocity))) * final_users
+    term1 = (1 / (1 + np.exp(-velocity * 0.002 * (timestamp - 1825) / velocity))) * final_users + initial_users
+    term2 = (1 / (1 + np.exp(-velocity * 0.002 * (0 - 1825) / velocity))) * final_users
     term3 = initial_users * (timestamp / total_days)
     term4 = final_users - (term1 - term2 - term3)
     result = term1 - term2 - term3 + (term4 * (timestamp / total_days))
     
     return result
 
+@lru_cache(maxsize=256)
+def _adoption_curve(initial_users, final_users, velocity, launch_date, months):
+    days = launch_calendar(launch_date, months).month_end_days
+    curve = calculate_user_adoption(initial_users, final_users, float(velocity), days, TOTAL_ADOPTION_DAYS)
+    curve.setflags(write=False)
+    return curve
+
+def adoption_curves(initial_users, final_users, velocities, launch_date, months):
+    """
+    Definition:
+        User adoption of every month for several adoption velocities, e.g. all sweep values of product_adoption_velocity.
+        The curves are memoized per parameter tuple.
+
+    Parameters:
+        initial_users: starting amount of users
+        final_users: ending amount of users
+        velocities: iterable of adoption velocities
+        launch_date: launch date of the token ('%d.%m.%y')
+        months: number of months of the curves
+
+    Returns:
+        array of shape (velocities, months + 1), index t of a curve is the adoption in timestep t
+    """
+    velocities = list(velocities)
+    return np.array([_adoption_curve(initial_users, final_users, velocity, launch_date, months) for velocity in velocities]).reshape(len(velocities), months + 1)
+
+def adoption_curve(initial_users, final_users, velocity, launch_date, months):
+    """
+    Memoized (read-only) user adoption curve of a single velocity, see adoption_curves().
+    """
+    return _adoption_curve(initial_users, final_users, velocity, launch_date, months)
+
+def user_adoption_curves(params, months):
+    """
+    Product user and token holder adoption curves of a parameter set.
+
+    Returns:
+        tuple of the product user and token holder curves of length months + 1
+    """
+    product_users = adoption_curve(params['initial_product_users'], params['product_users_after_10y'], params['product_adoption_velocity'], params['launch_date'], months)
+    token_holders = adoption_curve(params['initial_token_holders'], params['token_holders_after_10y'], params['token_adoption_velocity'], params['launch_date'], months)
+    return product_users, token_holders
+
+def precompute_user_adoption(param_sweep, months):
+    """
+    Compute the user adoption curves of all parameter sets of a parameter sweep, grouped by the initial users, final
+    users and launch date they share.
+    """
+    for prefix_initial, prefix_final, prefix_velocity in [('initial_product_users', 'product_users_after_10y', 'product_adoption_velocity'),
+                                                         ('initial_token_holders', 'token_holders_after_10y', 'token_adoption_velocity')]:
+        velocities = {}
+        for params in param_sweep:
+            velocities.setdefault((params[prefix_initial], params[prefix_final], params['launch_date']), []).append(params[prefix_velocity])
+        for (initial_users, final_users, launch_date), curve_velocities in velocities.items():
+            adoption_curves(initial_users, final_users, curve_velocities, launch_date, months)
+
 
 # POLICY FUNCTIONS
 def user_adoption_metrics(params, substep, state_history, prev_state, **kwargs):
@@ -33,22 +95,15 @@ def user_adoption_metrics(params, substep, state_history, prev_state, **kwargs):
     """
 
     current_month = prev_state['timestep']
-    current_date = prev_state['date']
-    launchDate = pd.to_datetime(params['launch_date'], format='%d.%m.%y')
-
-    current_day = (pd.to_datetime(current_date)+pd.DateOffset(months=1) - launchDate).days
 
-    # This is what is shown in the model as a constant as the user adoption numbers refer to 10 years (product_users_after_10y & token_holers_after_10y)
-    total_days = 3653                        
+    # look up the precomputed adoption curves, extend them if the simulation runs longer than the curves
+    product_users_curve, token_holders_curve = user_adoption_curves(params, calendar_months(current_month))
 
     ## Product user adoption
-    initial_product_users = params['initial_product_users']
-    product_users_after_10y = params['product_users_after_10y']
-    product_adoption_velocity = params['product_adoption_velocity']
     one_time_product_revenue_per_user = params['one_time_product_revenue_per_user']
     regular_product_revenue_per_user = params['regular_product_revenue_per_user']
 
-    product_users = calculate_user_adoption(initial_product_users,product_users_after_10y,product_adoption_velocity,current_day,total_days)
+    product_users = float(product_users_curve[current_month])
 
     ## Product Revenue
     
@@ -59,13 +114,10 @@ def user_adoption_metrics(params, substep, state_history, prev_state, **kwargs):
         product_revenue = (product_users-prev_product_users)*one_time_product_revenue_per_user+product_users*regular_product_revenue_per_user
 
     ## Token holder adoption
-    initial_token_holders = params['initial_token_holders']
-    token_holders_after_10y = params['token_holders_after_10y']
-    token_adoption_velocity = params['token_adoption_velocity']
     one_time_token_buy_per_user = params['one_time_token_buy_per_user']
     regular_token_buy_per_user = params['regular_token_buy_per_user']
 
-    token_holders = calculate_user_adoption(initial_token_holders,token_holders_after_10y,token_adoption_velocity,current_day,total_days)
+    token_holders = float(token_holders_curve[current_month])
 
     ## Calculating Token Buys
     prev_token_holders = prev_state['user_adoption']['ua_token_holders']
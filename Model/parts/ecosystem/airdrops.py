@@ -1,4 +1,4 @@
-import pandas as pd
+from parts.simulation_calendar import simulation_calendar
 
 # POLICY FUNCTIONS
 def airdrops(params, substep, state_history, prev_state, **kwargs):
@@ -8,25 +8,23 @@ def airdrops(params, substep, state_history, prev_state, **kwargs):
     # get parameters
     total_token_supply = params['initial_total_supply']
     airdrop_allocation = params['airdrop_allocation']
-    airdrop_date1 = pd.to_datetime(params['airdrop_date1'], format='%d.%m.%y')
-    airdrop_date2 = pd.to_datetime(params['airdrop_date2'], format='%d.%m.%y')
-    airdrop_date3 = pd.to_datetime(params['airdrop_date3'], format='%d.%m.%y')
     airdrop_amount1 = params['airdrop_amount1']
     airdrop_amount2 = params['airdrop_amount2']
     airdrop_amount3 = params['airdrop_amount3']
 
     # get state variables
-    current_date = pd.to_datetime(prev_state['date'])
+    current_month = prev_state['timestep']
+    calendar = simulation_calendar(params, current_month)
 
     # policy logic
     # calculate airdrop amounts
     airdrop_tokens = 0
     # check if current month is airdrop month
-    if current_date <= airdrop_date1 and current_date+pd.DateOffset(months=1) > airdrop_date1:
+    if calendar.in_month('airdrop_date1', current_month):
         airdrop_tokens += total_token_supply * airdrop_allocation/100 * airdrop_amount1/100
-    if current_date <= airdrop_date2 and current_date+pd.DateOffset(months=1) > airdrop_date2:
+    if calendar.in_month('airdrop_date2', current_month):
         airdrop_tokens += total_token_supply * airdrop_allocation/100 * airdrop_amount2/100
-    if current_date <= airdrop_date3 and current_date+pd.DateOffset(months=1) > airdrop_date3:
+    if calendar.in_month('airdrop_date3', current_month):
         airdrop_tokens += total_token_supply * airdrop_allocation/100 * airdrop_amount3/100
 
     # ensuring that the number of airdrop tokens is never negative
@@ -1,4 +1,4 @@
-import pandas as pd
+from parts.simulation_calendar import simulation_calendar
 
 # POLICY FUNCTIONS
 def burn_from_protocol_bucket(params, substep, state_history, prev_state, **kwargs):
@@ -7,16 +7,14 @@ def burn_from_protocol_bucket(params, substep, state_history, prev_state, **kwar
     """
     # get parameters
     total_token_supply = params['initial_total_supply']
-    burn_start = pd.to_datetime(params['burn_start'], format='%d.%m.%y')
-    burn_end = pd.to_datetime(params['burn_end'], format='%d.%m.%y')
     burn_per_month = params['burn_per_month']
 
     # get state variables
-    current_date = pd.to_datetime(prev_state['date'])
+    current_month = prev_state['timestep']
 
     # policy logic
     # calculate burn amount
-    if burn_start <= current_date and burn_end > current_date:
+    if simulation_calendar(params, current_month).in_window('burn', current_month):
         burn_token_amount = total_token_supply * burn_per_month/100
     else:
         burn_token_amount = 0
@@ -13,18 +13,19 @@ def initialize_liquidity_pool(params, substep, state_history, prev_state, **kwar
 
     # state variables
     current_month = prev_state['timestep']
-    liquidity_pool = prev_state['liquidity_pool']
 
     if current_month == 0:
         print('Initializing the liquidity pool...')
         constant_product = required_usdc * required_tokens
         token_price = required_usdc / required_tokens
 
-        # initialize the liquidity pool from the system parameters
-        liquidity_pool['lp_tokens'] = required_tokens
-        liquidity_pool['lp_usdc'] = required_usdc
-        liquidity_pool['lp_constant_product'] = constant_product
-        liquidity_pool['lp_token_price'] = token_price
+        # initial liquidity pool values from the system parameters
+        seeded_liquidity_pool = {
+            'lp_tokens': required_tokens,
+            'lp_usdc': required_usdc,
+            'lp_constant_product': constant_product,
+            'lp_token_price': token_price,
+        }
 
         # check if required funds are available from funds raised
         sum_of_raised_capital = calculate_raised_capital(params)
@@ -33,9 +34,9 @@ def initialize_liquidity_pool(params, substep, state_history, prev_state, **kwar
             raise ValueError(f'The required funds to seed the DEX liquidity are {required_usdc}, '
                              f'which is higher than the sum of raised capital {sum_of_raised_capital}!')
         
-        return {'liquidity_pool': liquidity_pool}
+        return {'liquidity_pool': seeded_liquidity_pool}
     else:
-        return {'liquidity_pool': prev_state['liquidity_pool']}
+        return {'liquidity_pool': {}}
 
 def liquidity_pool_tx1_after_adoption(params, substep, state_history, prev_state, **kwargs):
     """
@@ -47,8 +48,8 @@ def liquidity_pool_tx1_after_adoption(params, substep, state_history, prev_state
     usdc_lp_weight = 0.5
 
     # state variables
-    liquidity_pool = prev_state['liquidity_pool'].copy()
-    user_adoption = prev_state['user_adoption'].copy()
+    liquidity_pool = prev_state['liquidity_pool']
+    user_adoption = prev_state['user_adoption']
     token_buys = user_adoption['ua_token_buys']
 
     # policy variables
@@ -82,9 +83,9 @@ def liquidity_pool_tx2_after_vesting_sell(params, substep, state_history, prev_s
     usdc_lp_weight = 0.5
 
     # state variables
-    liquidity_pool = prev_state['liquidity_pool'].copy()
-    agents = prev_state['agents'].copy()
-    token_economy = prev_state['token_economy'].copy()
+    liquidity_pool = prev_state['liquidity_pool']
+    agents = prev_state['agents']
+    token_economy = prev_state['token_economy']
 
     # policy variables
     lp_tokens = liquidity_pool['lp_tokens']
@@ -136,8 +137,8 @@ def liquidity_pool_tx3_after_liquidity_addition(params, substep, state_history,
     # parameters
 
     # state variables
-    liquidity_pool = prev_state['liquidity_pool'].copy()
-    agents = prev_state['agents'].copy()
+    liquidity_pool = prev_state['liquidity_pool']
+    agents = prev_state['agents']
 
     # policy variables
     lp_tokens = liquidity_pool['lp_tokens']
@@ -171,8 +172,8 @@ def liquidity_pool_tx4_after_buyback(params, substep, state_history, prev_state,
     usdc_lp_weight = 0.5
 
     # state variables
-    liquidity_pool = prev_state['liquidity_pool'].copy()
-    business_assumptions = prev_state['business_assumptions'].copy()
+    liquidity_pool = prev_state['liquidity_pool']
+    business_assumptions = prev_state['business_assumptions']
 
     # policy variables
     lp_tokens = liquidity_pool['lp_tokens']
@@ -202,8 +203,11 @@ def update_lp_after_lp_seeding(params, substep, state_history, prev_state, polic
     """
     Function to update the agents based on the changes in business funds to seed the liquidity pool.
     """
+    # get state variables
+    updated_liquidity_pool = prev_state['liquidity_pool'].copy()
+
     # get policy inputs
-    updated_liquidity_pool = policy_input['liquidity_pool']
+    updated_liquidity_pool.update(policy_input['liquidity_pool'])
 
     return ('liquidity_pool', updated_liquidity_pool)
 
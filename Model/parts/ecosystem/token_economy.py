@@ -1,18 +1,15 @@
-import pandas as pd
+from parts.simulation_calendar import simulation_calendar
 
 # POLICY FUNCTIONS
 def generate_date(params, substep, state_history, prev_state, **kwargs):
     """
     Generate the current date from timestep
     """
-    # parameters
-    initial_date = pd.to_datetime(params['launch_date'], format='%d.%m.%y')
-    
     # state variables
     old_timestep = prev_state['timestep']
     
     # policy logic
-    new_date = pd.to_datetime(initial_date)+pd.DateOffset(months=old_timestep-1)
+    new_date = simulation_calendar(params, old_timestep).dates[old_timestep]
 
     return {'new_date': new_date}
 
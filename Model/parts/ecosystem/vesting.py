@@ -1,41 +1,78 @@
+from functools import lru_cache
+
+import numpy as np
+
+# Helper Functions
+def vesting_parameters(params, agent_names):
+    """
+    Hashable key of all parameters the vesting schedule depends on: the total supply and the token allocation,
+    initial vesting, cliff and vesting duration of every agent (0 if not defined for the agent).
+    """
+    return (params['initial_total_supply'],
+            tuple((name,
+                   params.get(name+"_token_allocation", 0),
+                   params.get(name+"_initial_vesting", 0),
+                   params.get(name+"_cliff", 0),
+                   params.get(name+"_vesting_duration", 0)) for name in agent_names))
+
+@lru_cache(maxsize=256)
+def _vesting_schedule(vesting_parameters, months):
+    total_token_supply, agent_parameters = vesting_parameters
+
+    vesting_matrix_rows = []
+    last_vesting_month = 1
+    for name, token_allocation, initial_vesting_perc, cliff_months, vesting_duration in agent_parameters:
+        initial_tokens_vested = (initial_vesting_perc / 100) * (token_allocation * total_token_supply)
+
+        # Parameter integrity checks
+        if vesting_duration <= 0:
+            if initial_vesting_perc > 0 and initial_vesting_perc != 100:
+                print("ERROR: agent "+str(name)+" vesting duration is 0 but initial vesting percentage is not 100%! It is "+str(initial_vesting_perc)+"%. Setting vesting amount to 0.")
+            vesting_period_token_amount = 0
+        else:
+            vesting_period_token_amount = (token_allocation * total_token_supply - (initial_vesting_perc / 100 * token_allocation * total_token_supply)) / vesting_duration
+
+        vesting_matrix_rows.append((initial_tokens_vested, vesting_period_token_amount, cliff_months, max(vesting_duration, 0)))
+        last_vesting_month = max(last_vesting_month, int(np.ceil(cliff_months + max(vesting_duration, 0))))
+
+    # month 0 is the initial state, month t the vested tokens in timestep t
+    n_months = last_vesting_month + 1 if months is None else months + 1
+    month = np.arange(n_months)
+    vesting_matrix = np.zeros((len(agent_parameters), n_months))
+    for i, (initial_tokens_vested, vesting_period_token_amount, cliff_months, vesting_duration) in enumerate(vesting_matrix_rows):
+        vesting_matrix[i] = np.where((month > cliff_months) & (month <= cliff_months + vesting_duration), vesting_period_token_amount, 0)
+        if n_months > 1:
+            vesting_matrix[i, 1] += initial_tokens_vested
+
+    vesting_matrix.setflags(write=False)
+    return vesting_matrix
+
+def vesting_schedule(params, agent_names, months=None):
+    """
+    Agents x months matrix of the tokens vested per agent and month, where column t holds the tokens vested in
+    timestep t and column 0 is the initial state. The schedule only depends on the vesting parameters, so it is
+    computed once and shared by all parameter sets with the same vesting parameters.
+    months: number of months of the schedule, defaults to the last month in which any agent vests tokens
+    """
+    return _vesting_schedule(vesting_parameters(params, agent_names), months)
+
+
 # POLICIY FUNCTIONS
 def vest_tokens(params, substep, state_history, prev_state, **kwargs):
     """
     Policy function to vest tokens for each stakeholder.
     """
-    agents = prev_state['agents'].copy()
-    total_token_supply = params['initial_total_supply']
+    agents = prev_state['agents']
     current_month = prev_state['timestep']
-    
-    agent_token_vesting_dict = {}
-    for key, agent in agents.items():
-        # Get all invesotor info
-        agent_type = agent['a_name']
-        agent_token_allocation = [params[agent_type+"_token_allocation"] if agent_type+"_token_allocation" in params else 0][0]
-        agent_initial_vesting_perc = [params[agent_type+"_initial_vesting"] if agent_type+"_initial_vesting" in params else 0][0]
-        agent_cliff_months = [params[agent_type+"_cliff"] if agent_type+"_cliff" in params else 0][0]
-        agent_vesting_duration = [params[agent_type+"_vesting_duration"] if agent_type+"_vesting_duration" in params else 0][0]
-
-        # initial vesting
-        if current_month == 1:
-            initial_agent_tokens_vested = (agent_initial_vesting_perc / 100) * (agent_token_allocation * total_token_supply)
-            agent_token_vesting_dict[key] = initial_agent_tokens_vested
 
-        # Parameter integrity checks
-        if agent_vesting_duration <= 0 and agent_initial_vesting_perc <= 0:
-            vesting_period_token_amount = 0
-        elif agent_vesting_duration <= 0 and agent_initial_vesting_perc != 100:
-            print("ERROR: agent "+str(agent_type)+" vesting duration is 0 but initial vesting percentage is not 100%! It is "+str(agent_initial_vesting_perc)+"%. Setting vesting amount to 0.")
-            vesting_period_token_amount = 0
-        elif agent_vesting_duration <= 0:
-            agent_vesting_duration = 0
-        else:
-            vesting_period_token_amount = (agent_token_allocation * total_token_supply - (agent_initial_vesting_perc / 100 * agent_token_allocation* total_token_supply)) / agent_vesting_duration
-        
-        if (current_month > agent_cliff_months + agent_vesting_duration) or current_month <= agent_cliff_months:
-            vesting_period_token_amount = 0
+    # look up the vested tokens of the current month in the precomputed vesting schedule
+    vesting_matrix = vesting_schedule(params, tuple(agent['a_name'] for agent in agents.values()))
+    if current_month < vesting_matrix.shape[1]:
+        vested_tokens = vesting_matrix[:, current_month].tolist()
+    else:
+        vested_tokens = [0.0] * len(agents)
 
-        agent_token_vesting_dict[key] = [vesting_period_token_amount + agent_token_vesting_dict[key] if key in agent_token_vesting_dict else vesting_period_token_amount][0]
+    agent_token_vesting_dict = dict(zip(agents, vested_tokens))
 
     return {'agent_token_vesting_dict': agent_token_vesting_dict}
 
@@ -0,0 +1,119 @@
+from calendar import monthrange
+from datetime import datetime
+from functools import lru_cache
+
+import numpy as np
+
+# date format of all date parameters
+DATE_FORMAT = '%d.%m.%y'
+
+# default number of months of the calendar, doubled whenever a simulation runs longer
+CALENDAR_MONTHS = 120
+
+# date window parameters (start, end), a timestep lies in the window if start <= date < end
+DATE_WINDOW_PARAMETERS = {
+    'buyback': ('buyback_start', 'buyback_end'),
+    'burn': ('burn_start', 'burn_end'),
+}
+
+# event date parameters, a timestep contains the event if the event date lies in its month
+EVENT_DATE_PARAMETERS = ['airdrop_date1', 'airdrop_date2', 'airdrop_date3']
+
+
+def parse_date(value):
+    """
+    Date of a date parameter in DATE_FORMAT, e.g. '01.01.24'.
+    """
+    return datetime.strptime(value, DATE_FORMAT)
+
+def add_months(date, months):
+    """
+    Date shifted by a number of calendar months, the day is clipped to the end of shorter months (e.g. 31.01. + 1
+    month = 28.02. / 29.02.).
+    """
+    month = date.month - 1 + months
+    year, month = date.year + month // 12, month % 12 + 1
+    return date.replace(year=year, month=month, day=min(date.day, monthrange(year, month)[1]))
+
+
+class SimulationCalendar:
+    """
+    Calendar of the simulated months, built once from the launch date and the date parameters of a parameter set.
+
+    All arrays are indexed by the timestep, i.e. index t refers to the month of timestep t and index 0 to the
+    initial state (the month before launch):
+    dates: month start dates, the 'date' state variable of each timestep
+    month_index: timestep of every entry
+    month_start_days / month_end_days: days since launch at the start / end of each month
+    windows: boolean masks of the timesteps within each date window (see DATE_WINDOW_PARAMETERS)
+    events: boolean masks of the timesteps whose month contains the event date (see EVENT_DATE_PARAMETERS)
+    """
+
+    def __init__(self, launch_date, months, windows=(), events=()):
+        self.launch_date = parse_date(launch_date)
+        self.months = months
+        self.month_index = np.arange(months + 1)
+        self.dates = [add_months(self.launch_date, t-1) for t in range(months + 1)]
+        month_ends = [add_months(date, 1) for date in self.dates]
+        self.month_start_days = np.array([(date - self.launch_date).days for date in self.dates], dtype=float)
+        self.month_end_days = np.array([(date - self.launch_date).days for date in month_ends], dtype=float)
+
+        self.windows = {}
+        for name, start, end in windows:
+            start = parse_date(start)
+            end = parse_date(end)
+            self.windows[name] = np.array([start <= date and end > date for date in self.dates])
+
+        self.events = {}
+        for name, event_date in events:
+            event_date = parse_date(event_date)
+            self.events[name] = np.array([date <= event_date and month_end > event_date for date, month_end in zip(self.dates, month_ends)])
+
+        for array in [self.month_index, self.month_start_days, self.month_end_days, *self.windows.values(), *self.events.values()]:
+            array.setflags(write=False)
+
+    def __repr__(self):
+        return f"SimulationCalendar({self.launch_date.date()}, months={self.months})"
+
+    def in_window(self, name, timestep):
+        """
+        True if the month of the timestep lies within the date window, e.g. 'buyback' or 'burn'.
+        """
+        return bool(self.windows[name][timestep])
+
+    def in_month(self, name, timestep):
+        """
+        True if the event date, e.g. 'airdrop_date1', lies within the month of the timestep.
+        """
+        return bool(self.events[name][timestep])
+
+
+@lru_cache(maxsize=64)
+def _simulation_calendar(launch_date, months, windows, events):
+    return SimulationCalendar(launch_date, months, windows, events)
+
+def calendar_months(timestep):
+    """
+    Number of months of a calendar covering the timestep, CALENDAR_MONTHS doubled as often as needed.
+    """
+    months = CALENDAR_MONTHS
+    while months < timestep:
+        months *= 2
+    return months
+
+def simulation_calendar(params, timestep=0, months=None):
+    """
+    Cached simulation calendar of a parameter set, shared by all parameter sets with the same date parameters.
+    timestep: timestep the calendar has to cover, used to choose the number of months if months is not given
+    months: number of months of the calendar
+    """
+    months = calendar_months(timestep) if months is None else months
+    windows = tuple((name, params[start], params[end]) for name, (start, end) in DATE_WINDOW_PARAMETERS.items())
+    events = tuple((name, params[name]) for name in EVENT_DATE_PARAMETERS)
+    return _simulation_calendar(params['launch_date'], months, windows, events)
+
+def launch_calendar(launch_date, months):
+    """
+    Cached calendar without date windows and events, e.g. for the user adoption curves.
+    """
+    return _simulation_calendar(launch_date, months, (), ())
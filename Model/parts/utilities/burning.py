@@ -7,7 +7,7 @@ def burning_agent_allocation(params, substep, state_history, prev_state, **kwarg
     burning_share = params['burning_share']/100
 
     # get state variables
-    agents = prev_state['agents'].copy()
+    agents = prev_state['agents']
 
     # policy logic
     agent_utility_sum = 0
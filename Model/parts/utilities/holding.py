@@ -10,8 +10,8 @@ def holding_agent_allocation(params, substep, state_history, prev_state, **kwarg
     token_payout_apr = params['holding_apr'] / 100
 
     # get state variables
-    agents = prev_state['agents'].copy()
-    liquidity_pool = prev_state['liquidity_pool'].copy()
+    agents = prev_state['agents']
+    liquidity_pool = prev_state['liquidity_pool']
 
     #rewards
     token_after_adoption = liquidity_pool['lp_tokens_after_adoption']
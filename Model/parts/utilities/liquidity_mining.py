@@ -8,9 +8,9 @@ def staking_liquidity_mining_agent_allocation(params, substep, state_history, pr
     liquidity_mining_share = params['liquidity_mining_share']/100
     
     # get state variables
-    agents = prev_state['agents'].copy()
-    lp = prev_state['liquidity_pool'].copy()
-    token_economy = prev_state['token_economy'].copy()
+    agents = prev_state['agents']
+    lp = prev_state['liquidity_pool']
+    token_economy = prev_state['token_economy']
 
     # get impermanent loss adjustment related variables
     selling_allocation = token_economy['te_selling_allocation']
@@ -8,7 +8,7 @@ def staking_apr_allocation(params, substep, state_history, prev_state, **kwargs)
     lock_share = params['lock_share']/100
     
     # get state variables
-    agents = prev_state['agents'].copy()
+    agents = prev_state['agents']
 
     # policy logic
     # initialize policy logic variables
@@ -7,8 +7,8 @@ def staking_revenue_share_buyback_allocation(params, substep, state_history, pre
     lock_buyback_distribute_share = params['lock_buyback_distribute_share']/100
 
     # get state variables
-    agents = prev_state['agents'].copy()
-    utilities = prev_state['utilities'].copy()
+    agents = prev_state['agents']
+    utilities = prev_state['utilities']
 
     # rewards state variables
     lp_tokens_after_liquidity_addition  =  prev_state['liquidity_pool']['lp_tokens_after_liquidity_addition']
@@ -64,7 +64,7 @@ def staking_revenue_share_buyback_amount(params, substep, state_history, prev_st
     revenue_share = params['lock_buyback_from_revenue_share'] # revenue share to be used for buyback
 
     # get state variables
-    user_adoption = prev_state['user_adoption'].copy()
+    user_adoption = prev_state['user_adoption']
     product_revenue = user_adoption['ua_product_revenue']
 
     # policy logic
@@ -7,8 +7,8 @@ def staking_vesting_allocation(params, substep, state_history, prev_state, **kwa
     lock_vesting_share = params['lock_vesting_share']/100
     
     # get state variables
-    agents = prev_state['agents'].copy()
-    utilities = prev_state['utilities'].copy()
+    agents = prev_state['agents']
+    utilities = prev_state['utilities']
 
     # policy logic
     # initialize policy logic variables
@@ -7,7 +7,7 @@ def transfer_agent_allocation(params, substep, state_history, prev_state, **kwar
     transfer_share = params['transfer_share']/100
 
     # get state variables
-    agents = prev_state['agents'].copy()
+    agents = prev_state['agents']
 
     # policy logic
     # initialize policy logic variables
@@ -1,14 +1,12 @@
 import numpy as np
-import math
-import uuid
-import random
 import sys
 import os
 from datetime import datetime
 from typing import *
-import pandas as pd
 import json
-import sqlite3
+
+from parts.agent_table import *
+from parts.agents_behavior.agent_meta_bucket_behavior import DEFAULT_BEHAVIOR_CONCENTRATION
 
 # Helper Functions
 def convert_date(sys_param):
@@ -85,14 +83,14 @@ def new_agent(stakeholder_name: str, stakeholder_type: str, usd_funds: float,
     return agent
 
 
-def generate_agents(stakeholder_name_mapping: dict) -> dict:
+def generate_agents(stakeholder_name_mapping: dict) -> AgentTable:
     """
-    Initialize all token ecosystem agents aka stakeholders.
+    Initialize all token ecosystem agents aka stakeholders as a columnar AgentTable indexed by integer agent ids.
     """
 
-    initial_agents = {}
+    initial_agents = []
     for stakeholder_name, stakeholder_type in stakeholder_name_mapping.items():
-        initial_agents[uuid.uuid4()] = new_agent(stakeholder_name = stakeholder_name,
+        initial_agents.append(new_agent(stakeholder_name = stakeholder_name,
                                     stakeholder_type = stakeholder_type,
                                     usd_funds = 0,
                                     tokens = 0,
@@ -129,47 +127,123 @@ def generate_agents(stakeholder_name_mapping: dict) -> dict:
                                     utility_from_holding_tokens = 0,
                                     holding_from_holding_tokens = 0,
                                     actions = {},
-                                    current_action = 'hold')
-    return initial_agents
+                                    current_action = 'hold'))
+    return AgentTable.from_agents(initial_agents)
 
-def create_parameter_list(parameter_name, not_iterable_parameters, init_value, min, max, intervals):
+class InputsError(ValueError):
     """
-    Create list of parameters for parameter sweep based on the QTM input tab 'cadCAD_inputs'.
+    Raised for malformed rows of the Quantitative Token Model inputs, lists all of them with their row numbers.
+
+    rows: list of (row number, parameter name, problem), row numbers as in the spreadsheet (header = row 1)
     """
 
-    if parameter_name in not_iterable_parameters:
-        return [init_value.replace(",","").replace("%","")]
-    else:
-        try:
-            if type(init_value) == str:
-                init_value = float(init_value.replace(",","").replace("%",""))
-            if type(min) == str:
-                min = float(min.replace(",","").replace("%",""))
-            if type(max) == str:
-                max = float(max.replace(",","").replace("%",""))
-            if type(intervals) == str and intervals != '':
-                intervals = int(float(intervals.replace(",","")).replace("%",""))
-        except ValueError:
-            return [init_value]
-        if math.isnan(min) or math.isnan(max) or math.isnan(intervals) or max<=min:
-            if max<=min:
-                print("Maximum parameter boundary is lower than minimum parameter boundary: Min: ", min, "; Max:", max, ". Using initial value ", init_value, " instead.")
-            return [float(init_value)]
-        else:
-            if math.isnan(intervals):
-                return [float(init_value)]
-            else:
-                return list(np.linspace(min, max, int(intervals)))
+    def __init__(self, rows):
+        self.rows = rows
+        super().__init__("Malformed QTM inputs:\n" + "\n".join(f"row {row}: {name}: {problem}" for row, name, problem in rows))
 
-def compose_initial_parameters(QTM_inputs, not_iterable_parameters):
+
+# parameters of former input formats (V1.88) and their current names (V1.89)
+LEGACY_PARAMETER_NAMES = {
+    'placeholder_allocation': 'staking_vesting_allocation',
+    'placeholder_initial_vesting': 'staking_vesting_initial_vesting',
+    'placeholder_cliff': 'staking_vesting_cliff',
+    'placeholder_vesting_duration': 'staking_vesting_vesting_duration',
+}
+
+# parameters missing in former input formats (V1.88) or in exports of the QTM spreadsheet, and their default values
+LEGACY_PARAMETER_DEFAULTS = {
+    'lock_vesting_share': [0.0],
+    'agent_behavior_concentration': [float(DEFAULT_BEHAVIOR_CONCENTRATION)],
+}
+
+# columns of the inputs tab 'radCAD_inputs' read by compose_initial_parameters
+INPUT_COLUMNS = ['Parameter Name', 'Initial Value', 'Min', 'Max', 'Interval Steps']
+
+def normalize_parameter_names(names):
+    """
+    Parameter names of the inputs tab as used in sys_param, e.g. 'lock_APR' -> 'lock_apr'.
+    """
+    return names.str.lower().str.replace(' ', '_', regex=False).str.replace(r'[/()]', '', regex=True)
+
+def parse_numbers(values):
     """
-    Compose all initial parameter sets from the Quantitative Token Model inputs tab 'cadCAD_inputs'.
+    Numbers of a column of the inputs tab without thousands separators and percent signs, NaN for empty cells and text.
     """
+    import pandas as pd
 
+    return pd.to_numeric(values.astype('string').str.replace(r'[,%]', '', regex=True).str.strip(), errors='coerce').astype(float)
+
+def compose_initial_parameters(QTM_inputs, not_iterable_parameters):
+    '''
+    Definition:
+    Compose all initial parameter sets from the Quantitative Token Model inputs tab 'radCAD_inputs' (V1.88 or V1.89).
+    All cells are parsed column-wise. Not iterable parameters keep their text, numbers become lists of one value or,
+    if Min, Max and Interval Steps are given, of the swept values. Text values without digits, e.g. payout sources,
+    and dates are kept as they are.
+
+    Parameters:
+    QTM_inputs: data frame of the inputs tab
+    not_iterable_parameters: names of the parameters whose values are never swept, e.g. dates and bucket names
+
+    Returns:
+    dictionary of the parameter names and their lists of values
+
+    Raises:
+    InputsError listing all malformed rows, e.g. unparsable numbers or incomplete sweep ranges
+    '''
+    missing = [column for column in INPUT_COLUMNS if column not in QTM_inputs.columns]
+    if missing:
+        raise InputsError([(1, 'header', "missing columns " + ", ".join(missing))])
+
+    rows = np.arange(len(QTM_inputs)) + 2
+    names = normalize_parameter_names(QTM_inputs['Parameter Name'].astype('string'))
+    names = names.replace(LEGACY_PARAMETER_NAMES)
+    text = QTM_inputs['Initial Value'].astype('string')
+    value, low, high, steps = (parse_numbers(QTM_inputs[column]) for column in INPUT_COLUMNS[1:])
+    not_iterable = names.isin(not_iterable_parameters).to_numpy()
+
+    # text values are kept, digits that are neither a number nor a date are malformed
+    is_number = value.notna().to_numpy()
+    is_date = text.str.strip().str.fullmatch(r'\d{1,2}[./]\d{1,2}[./](\d{2}|\d{4})').fillna(False).to_numpy(dtype=bool)
+    is_text = ~text.str.contains(r'\d').fillna(True).to_numpy(dtype=bool)
+
+    # sweeps need all of Min, Max and Interval Steps
+    given = {column: QTM_inputs[column].notna().to_numpy() for column in INPUT_COLUMNS[2:]}
+    sweep = given['Min'] & given['Max'] & given['Interval Steps']
+
+    problems = [
+        (names.isna().to_numpy(), "missing parameter name"),
+        (names.duplicated(keep='first').to_numpy() & names.notna().to_numpy(), "duplicate parameter name"),
+        (text.isna().to_numpy(), "missing initial value"),
+        (~not_iterable & text.notna().to_numpy() & ~is_number & ~is_date & ~is_text, "initial value is not a number"),
+    ]
+    for column, parsed in zip(INPUT_COLUMNS[2:], [low, high, steps]):
+        problems.append((given[column] & parsed.isna().to_numpy(), column + " is not a number"))
+    problems += [
+        (~not_iterable & (given['Min'] | given['Max'] | given['Interval Steps']) & ~sweep, "Min, Max and Interval Steps have to be given together"),
+        (~not_iterable & sweep & ~is_number, "only numbers can be swept"),
+        (sweep & (high <= low).to_numpy(), "Max is not larger than Min"),
+        (sweep & ((steps < 1) | (steps % 1 != 0)).to_numpy(), "Interval Steps is not a positive integer"),
+    ]
+    malformed = sorted((int(rows[i]), names.iloc[i] if names.notna().iloc[i] else '?', problem)
+                       for mask, problem in problems for i in np.flatnonzero(mask))
+    if malformed:
+        raise InputsError(malformed)
+
+    stripped = text.str.replace(r'[,%]', '', regex=True)
     initial_parameters = {}
-    for index, row in QTM_inputs.iterrows():
-        parameter_name = row['Parameter Name'].lower().replace(' ', '_').replace('/', '').replace('(', '').replace(')', '')
-        initial_parameters[parameter_name] = create_parameter_list(parameter_name, not_iterable_parameters, row['Initial Value'], row['Min'], row['Max'], row['Interval Steps'])
+    for name, keep, number, swept, original, plain, start, stop, intervals in zip(
+            names, not_iterable, value, sweep, text, stripped, low, high, steps):
+        if keep:
+            initial_parameters[name] = [plain]
+        elif np.isnan(number):
+            initial_parameters[name] = [original]
+        elif swept:
+            initial_parameters[name] = list(np.linspace(start, stop, int(intervals)))
+        else:
+            initial_parameters[name] = [float(number)]
+    for name, default in LEGACY_PARAMETER_DEFAULTS.items():
+        initial_parameters.setdefault(name, list(default))
     return initial_parameters
 
 def calculate_investor_allocation(sys_param, stakeholder_name):
@@ -351,6 +425,8 @@ def test_timeseries(data, data_key, data_row_multiplier, QTM_data_tables, QTM_ro
     print("------------------------------------")
 
 def import_dummy_data(row, timestep):
+    import pandas as pd
+
     # Get the current directory
     current_dir = os.path.dirname(os.path.abspath(__file__))
 
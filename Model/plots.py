@@ -1,30 +1,63 @@
 import matplotlib.pyplot as plt
+from matplotlib.figure import Figure
 import pandas as pd
 import streamlit as st
 import numpy as np
-import sqlite3
+import os
+
+from result_store import open_result_store
+from aggregation import summarize_runs, quantile_column, DEFAULT_QUANTILES
+
+# maximum number of individual runs drawn in monte carlo plots, more runs are only shown as quantile bands
+MAX_RUN_LINES = 10
 
 # TODO Write comments for functions
 
-def get_simulation_data(db, dataset_name):
-    # Connect to the SQLite database
-    conn = sqlite3.connect(db)
-    # Read the data from the SQLite table into a DataFrame
-    df = pd.read_sql(f'SELECT * FROM {dataset_name}', conn)
+def get_simulation_data(db, dataset_name, experiment=None, columns=None, runs=None):
+    # Read the simulation results of a SQLite database or Arrow IPC result store directory (see result_store.py) into a
+    # DataFrame, only the requested columns and runs are read from the store
+    with open_result_store(db) as store:
+        df = store.load(experiment=experiment, table=dataset_name, columns=columns, runs=runs)
+    return df
 
-    # Close the connection
-    conn.close()
+def query_simulation_data(db, dataset_name, metrics, runs=None, timesteps=None, aggregate=None, experiment=None):
+    # Read selected metrics of selected runs and timesteps (first, last), optionally aggregated over the runs per
+    # timestep, e.g. aggregate='mean', the filters and aggregations are evaluated by the store (see result_store.py)
+    with open_result_store(db) as store:
+        df = store.query(metrics, experiment=experiment, table=dataset_name, runs=runs, timesteps=timesteps, aggregate=aggregate)
     return df
 
-def plot_results(x, y_columns, run):
+def results_version(db, dataset_name, experiment=None):
+    # Version of the results of an experiment in a result store, changes whenever they are written, but not when other
+    # experiments or the job table are written, so it can key cached query results (see result_store.py)
+    if not os.path.exists(db):
+        return ()
+    with open_result_store(db) as store:
+        return store.version(experiment, table=dataset_name)
+
+@st.experimental_memo(max_entries=64, show_spinner=False)
+def cached_query_simulation_data(db, dataset_name, metrics, runs=None, timesteps=None, aggregate=None, experiment=None, version=None):
+    # query_simulation_data() cached across reruns and sessions of the interface, pass
+    # version=results_version(db, dataset_name, experiment) so the cache is refreshed whenever the results are written,
+    # every call returns its own copy of the cached data
+    return query_simulation_data(db, dataset_name, list(metrics), runs=runs, timesteps=timesteps, aggregate=aggregate, experiment=experiment)
 
-    df = get_simulation_data('interfaceData.db', 'simulation_data')
+def results_figure(db, dataset_name, x, y_columns, run, experiment):
+    # Line plot figure of the results of a run of an experiment, only the data is cached, the figure is built on every
+    # rerun, so sessions never share a mutable figure, it is not registered with pyplot, so it is not kept open by it
+    df = cached_query_simulation_data(db, dataset_name, (x,) + tuple(y_columns), runs=(run,), experiment=experiment,
+                                      version=results_version(db, dataset_name, experiment))
+    return line_plot_figure(df, x, list(y_columns), run)
+
+def plot_results(x, y_columns, run, experiment='default'):
+
+    db = 'interfaceData.db'
 
     # example for Monte Carlo plots
     #monte_carlo_plot_st(df,'timestep','timestep','seed_a_tokens_vested_cum',3)
 
     # example for line plots of different outputs in one figure
-    line_plot_st(df,x, y_columns, run)
+    st.pyplot(results_figure(db, 'simulation_data', x, tuple(y_columns), run, experiment))
 
 def plot_stacked_area_graph(df):
     # pivot the dataframe to create a multi-level index with Investor_Name and timestep
@@ -112,19 +145,69 @@ def aggregate_runs(df,aggregate_dimension,x,y):
     Parameters:
     df: dataframe name
     aggregate_dimension: the dimension you would like to aggregate on, the standard one is timestep.
+    x = x axis variable, aggregated as well unless it is the aggregate dimension
+    y = y axis variable
+
+    Returns:
+    mean, median, standard deviation and minimum frames with the float columns aggregate_dimension, x and y, the same
+    frames as the groupby(aggregate_dimension).mean().reset_index() etc. of these columns
 
     Example run:
-    mean_df,median_df,std_df,min_df = aggregate_runs(df,'timestep')
+    mean_df,median_df,std_df,min_df = aggregate_runs(df,'timestep','timestep','lp_token_price')
     '''
-    df = df[[x,y]].copy()
-    mean_df = df.astype(float).groupby(aggregate_dimension).mean().reset_index()
-    median_df = df.astype(float).groupby(aggregate_dimension).median().reset_index()
-    std_df = df.astype(float).groupby(aggregate_dimension).std().reset_index()
-    min_df = df.astype(float).groupby(aggregate_dimension).min().reset_index()
+    # all statistics come from one summary of the runs (see aggregation.summarize_runs)
+    columns = [column for column in dict.fromkeys([x,y]) if column != aggregate_dimension]
+    summaries = {column: summarize_runs(df, aggregate_dimension, column, quantiles=[0.5]) for column in columns}
+    keys = next(iter(summaries.values()))[aggregate_dimension].astype(float) if summaries else pd.Series(dtype=float)
+    aggregates = []
+    for statistic in ['mean', quantile_column(0.5), 'std', 'min']:
+        aggregates.append(pd.DataFrame({aggregate_dimension: keys, **{column: summary[statistic] for column, summary in summaries.items()}}))
 
-    return mean_df,median_df,std_df,min_df
+    return tuple(aggregates)
+
+def monte_carlo_figure(df,aggregate_dimension,x,y,runs,quantiles=DEFAULT_QUANTILES,max_run_lines=MAX_RUN_LINES,fig=None):
+    '''
+    A function that generates the figure of a timeseries plot of Monte Carlo runs: up to max_run_lines runs are drawn
+    individually, more runs as their median and bands between the quantile pairs (e.g. 5%-95% and 25%-75%) per
+    aggregate dimension. The mean is always drawn.
+
+    Parameters:
+    df: dataframe name, or a summary of the runs (see aggregation.summarize_runs / aggregation.RunAggregator)
+    aggregate_dimension: the dimension you would like to aggregate on, the standard one is timestep.
+    x = x axis variable for plotting
+    y = y axis variable for plotting
+    runs = the number of monte carlo simulations
+    quantiles = quantiles of the bands, pairs from the outside in and the median
+    fig = figure to draw into, by default a new figure that is not registered with pyplot
+    '''
+    fig = Figure(figsize=(10,6)) if fig is None else fig
+    ax = fig.subplots()
+    summary = df if 'mean' in df.columns else summarize_runs(df, aggregate_dimension, y, quantiles=quantiles)
+    keys = np.asarray(summary[aggregate_dimension], float)
+    if 'mean' not in df.columns and runs <= max_run_lines:
+        # split the data frame into the runs once instead of filtering it per run
+        run_dfs = dict(tuple(df.groupby(df['run'].astype(int))))
+        for r in range(1,runs+1):
+            run_df = run_dfs.get(r, df.iloc[:0])
+            ax.plot(np.asarray(run_df[x], float), np.asarray(run_df[y], float), label = 'Run ' + str(r) if runs > 1 else None)
+    elif runs > 1:
+        # thousands of runs are drawn as quantile bands instead of single lines
+        quantiles = sorted(q for q in quantiles if quantile_column(q) in summary.columns)
+        for i in range(len(quantiles) // 2):
+            lower, upper = quantile_column(quantiles[i]), quantile_column(quantiles[-1-i])
+            ax.fill_between(keys, np.asarray(summary[lower], float), np.asarray(summary[upper], float), color = 'tab:blue', alpha = 0.15 + 0.15*i, linewidth = 0,
+                            label = lower[1:] + '% - ' + upper[1:] + '%')
+        if quantile_column(0.5) in summary.columns:
+            ax.plot(keys, np.asarray(summary[quantile_column(0.5)], float), label = 'Median', color = 'tab:blue')
+    if runs > 1:
+        ax.plot(keys, np.asarray(summary['mean'], float), label = 'Mean', color = 'black')
+        ax.legend(bbox_to_anchor=(1.05, 1), loc=2, borderaxespad=0.)
+    ax.set_xlabel(x)
+    ax.set_ylabel(y)
+    ax.set_title('Performance of ' + y + ' over ' + str(runs) + ' Monte Carlo Runs')
+
+    return fig
 
-# 
 def monte_carlo_plot(df,aggregate_dimension,x,y,runs):
     '''
     A function that generates timeseries plot of Monte Carlo runs.
@@ -139,19 +222,7 @@ def monte_carlo_plot(df,aggregate_dimension,x,y,runs):
     Example run:
     monte_carlo_plot(df,'timestep','timestep','revenue',run_count=100)
     '''
-    mean_df,median_df,std_df,min_df = aggregate_runs(df,aggregate_dimension,x,y)
-
-    plt.figure(figsize=(10,6))
-    for r in range(1,runs+1):
-        legend_name = 'Run ' + str(r)
-        plt.plot(df[df.run==r].timestep, df[df.run==r][y], label = legend_name )
-    
-    plt.plot(mean_df[x], mean_df[y], label = 'Mean', color = 'black')
-    plt.legend(bbox_to_anchor=(1.05, 1), loc=2, borderaxespad=0.)
-    plt.xlabel(x)
-    plt.ylabel(y)
-    title_text = 'Performance of ' + y + ' over ' + str(runs) + ' Monte Carlo Runs'
-    plt.title(title_text)
+    return monte_carlo_figure(df,aggregate_dimension,x,y,runs,fig=plt.figure(figsize=(10,6)))
 
 def monte_carlo_plot_st(df,aggregate_dimension,x,y,runs):
     '''
@@ -167,35 +238,27 @@ def monte_carlo_plot_st(df,aggregate_dimension,x,y,runs):
     Example run:
     monte_carlo_plot(df,'timestep','timestep','revenue',run_count=100)
     '''
-    fig = plt.figure(figsize=(10,6))
-    if runs > 1:
-        for r in range(1,runs+1):
-            legend_name = 'Run ' + str(r)
-            plt.plot(np.asarray(df[df['run'].astype(int)==r].timestep, float), np.asarray(df[df['run'].astype(int)==r][y], float), label = legend_name )
-        mean_df,median_df,std_df,min_df = aggregate_runs(df,aggregate_dimension,x,y)
-        plt.plot(np.asarray(mean_df[x], float), np.asarray(mean_df[y], float), label = 'Mean', color = 'black')
-        plt.legend(bbox_to_anchor=(1.05, 1), loc=2, borderaxespad=0.)
-    
-    else:
-        plt.plot(np.asarray(df[df['run'].astype(int)==1].timestep, float), np.asarray(df[df['run'].astype(int)==1][y], float))
-    plt.xlabel(x)
-    plt.ylabel(y)
-    title_text = 'Performance of ' + y + ' over ' + str(runs) + ' Monte Carlo Runs'
-    plt.title(title_text)
+    st.pyplot(monte_carlo_figure(df,aggregate_dimension,x,y,runs))
 
-    st.pyplot(fig)
+def line_plot_figure(df,x,y_series,run):
+    '''
+    A function that generates the figure of a line plot from a series of data series in a frame
+    '''
+    fig = Figure(figsize=(10,6))
+    ax = fig.subplots()
+    run_df = df[df['run'].astype(int)==run]
+    ax.plot(np.asarray(run_df[x], float), np.asarray(run_df[y_series], float), label = y_series)
+    ax.set_xlabel(x)
+    #ax.set_ylabel(y_series)
+    ax.legend(bbox_to_anchor=(1.05, 1), loc=2, borderaxespad=0.)
+
+    return fig
 
 def line_plot_st(df,x,y_series,run):
     '''
     A function that generates a line plot from a series of data series in a frame in streamlit
     '''
-    fig = plt.figure(figsize=(10,6))
-    plt.plot(np.asarray(df[df['run'].astype(int)==run][x], float), np.asarray(df[df['run'].astype(int)==run][y_series], float), label = y_series)
-    plt.xlabel(x)
-    #plt.ylabel(y_series)
-    plt.legend(bbox_to_anchor=(1.05, 1), loc=2, borderaxespad=0.)
-
-    st.pyplot(fig)
+    st.pyplot(line_plot_figure(df,x,y_series,run))
 
 def plot_line_chart(dataframe, x_column, y_columns, title=''):
     """
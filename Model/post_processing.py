@@ -1,76 +1,197 @@
+import numpy as np
 import pandas as pd
 import warnings
+from operator import itemgetter
+
+from parts.agent_table import AgentTable, AGENT_FIELDS, AGENT_FIELD_INDEX
 
 warnings.filterwarnings("ignore")
 
+# state variables holding a dictionary of metrics, in the column order of the post processed data
+STATE_DICT_GROUPS = ['token_economy', 'liquidity_pool', 'agents', 'utilities', 'user_adoption', 'business_assumptions']
+
+
+# Helper Functions
+def _transpose(values, n_columns):
+    """
+    Transpose a list of row tuples into a list of column lists.
+    """
+    return [_column_array(column) for column in zip(*values)] if values else [[] for _ in range(n_columns)]
+
+def _column_array(values):
+    """
+    Float array of a column of numbers, other columns are left to the dtype inference of pandas.
+    """
+    if isinstance(values[0], float):
+        try:
+            return np.array(values, dtype=float)
+        except (TypeError, ValueError):
+            pass
+    return list(values)
+
+def _flatten_dicts(rows, columns):
+    """
+    Write the values of a series of metric dictionaries into one column per key of the first dictionary.
+    Keys missing in a dictionary result in None, as with dict.get().
+    """
+    keys = list(rows[0])
+    get_values = itemgetter(*keys) if len(keys) > 1 else (lambda row: (row[keys[0]],))
+    values = []
+    for row in rows:
+        try:
+            values.append(get_values(row))
+        except KeyError:
+            values.append(tuple(row.get(key) for key in keys))
+    columns.update(zip(keys, _transpose(values, len(keys))))
+
+def _flatten_agents(rows, columns):
+    """
+    Write the agent quantity and every field of the first agent per agent name into the columns
+    '<name>_agents' and '<name>_<field>'. The agent names and fields are taken from the first row.
+    """
+    first_row = rows[0]
+    if isinstance(first_row, AgentTable):
+        first_names = first_row.objects['a_name']
+        fields = AGENT_FIELDS
+    else:
+        first_names = [agent['a_name'] for agent in first_row.values()]
+        fields = list(next(iter(first_row.values())))
+    names = list(dict.fromkeys(first_names))
+    numeric_fields = [field for field in fields if field in AGENT_FIELD_INDEX]
+    numeric_rows = np.array([AGENT_FIELD_INDEX[field] for field in numeric_fields], dtype=np.intp)
+    object_fields = [field for field in fields if field not in AGENT_FIELD_INDEX]
+
+    n_rows = len(rows)
+    counts = np.zeros((n_rows, len(names)), dtype=np.int64)
+    numeric = np.empty((n_rows, len(numeric_fields), len(names)))
+    objects = {field: [None] * n_rows for field in object_fields}
+
+    # group the agent tables by their agent names, so the numeric fields of a group are gathered at once
+    table_groups = {}
+    for i, row in enumerate(rows):
+        if isinstance(row, AgentTable):
+            table_groups.setdefault(tuple(row.objects['a_name']), []).append(i)
+        else:
+            first_agents, count = {}, {}
+            for agent in row.values():
+                first_agents.setdefault(agent['a_name'], agent)
+                count[agent['a_name']] = count.get(agent['a_name'], 0) + 1
+            counts[i] = [count.get(name, 0) for name in names]
+            numeric[i] = [[first_agents[name][field] for name in names] for field in numeric_fields]
+            for field in object_fields:
+                objects[field][i] = tuple(first_agents[name][field] for name in names)
+
+    for row_names, indices in table_groups.items():
+        # position of the first agent and number of agents per name
+        first, count = {}, {}
+        for j, name in enumerate(row_names):
+            first.setdefault(name, j)
+            count[name] = count.get(name, 0) + 1
+        first_agents = np.array([first[name] for name in names], dtype=np.intp)
+        counts[indices] = [count.get(name, 0) for name in names]
+        stacked = np.stack([rows[i].numeric for i in indices])
+        if not (np.array_equal(numeric_rows, np.arange(stacked.shape[1])) and np.array_equal(first_agents, np.arange(stacked.shape[2]))):
+            stacked = stacked[:, numeric_rows[:, np.newaxis], first_agents]
+        numeric[indices] = stacked
+        get_first = itemgetter(*first_agents.tolist()) if len(names) > 1 else (lambda values: (values[first_agents[0]],))
+        for field in object_fields:
+            for i in indices:
+                objects[field][i] = get_first(rows[i].objects[field])
+
+    objects = {field: _transpose(values, len(names)) for field, values in objects.items()}
+    for k, name in enumerate(names):
+        columns[name+'_agents'] = counts[:, k]
+        for field in fields:
+            if field in AGENT_FIELD_INDEX:
+                columns[name+'_'+field] = numeric[:, numeric_fields.index(field), k]
+            else:
+                columns[name+'_'+field] = objects[field][k]
+
+def _flatten_rows(df):
+    """
+    Flatten the state variable dictionaries of the simulation data frame in a single pass over its rows.
+    """
+    columns = {'timestep': df['timestep'].values, 'date': df['date'].values, 'run': df['run'].values}
+    if len(df) > 0:
+        for group in STATE_DICT_GROUPS:
+            rows = df[group].tolist()
+            if group == 'agents':
+                _flatten_agents(rows, columns)
+            else:
+                _flatten_dicts(rows, columns)
+    return pd.DataFrame(columns, index=df.index)
+
+
 def postprocessing(df, substep):
     '''
     Definition:
     Refine and extract metrics from the simulation
-    
+
     Parameters:
     df: simulation dataframe
     '''
     print("Postprocessing for substep: ", substep, " started..")
     # subset to last substep
-    df = df[df['substep'] == substep] 
-
-    # Get the ABM results
-    timesteps = df.timestep
-    date = df.date
-
-    agent_ds = df.agents
-    liquidity_pool_ds = df.liquidity_pool
-    token_economy_ds = df.token_economy
-    user_adoption_ds = df.user_adoption
-    business_assumptions_ds = df.business_assumptions
-    utilities_ds = df.utilities
-    
-    # Create an analysis dataset
-    data = (pd.DataFrame({'timestep': timesteps,
-                          'date': date,
-                          'run': df.run
-                          })
-           )
-
-    ## Token Economy ##
-    for key in token_economy_ds[token_economy_ds.keys()[0]]:
-        key_values = token_economy_ds.apply(lambda s: s.get(key))
-        data[key] = key_values     
-
-    ## Liquidity Pool ##
-    for key in liquidity_pool_ds[liquidity_pool_ds.keys()[0]]:
-        key_values = liquidity_pool_ds.apply(lambda s: s.get(key))
-        data[key] = key_values  
-    
-    ## AGENTS ##
-    for key in agent_ds[agent_ds.keys()[0]]:
-        # Agent quantity
-        data[agent_ds[agent_ds.keys()[0]][key]['a_name']+'_agents'] = agent_ds.map(lambda s: sum([1 for agent in s.values() if agent['a_name'] == agent_ds[agent_ds.keys()[0]][key]['a_name']]))
-        
-        # Agent attributes
-        key_values = agent_ds.apply(lambda s: s.get(key))
-        for key2 in key_values[key_values.keys()[0]]:
-            data[agent_ds[agent_ds.keys()[0]][key]['a_name']+'_'+key2] = agent_ds.map(lambda s: [agent[key2] for agent in s.values() if agent['a_name'] == agent_ds[agent_ds.keys()[0]][key]['a_name']][0])
-
-    ## UTILITIES ##
-    for key in utilities_ds[utilities_ds.keys()[0]]:
-        key_values = utilities_ds.apply(lambda s: s.get(key))
-        data[key] = key_values  
-
-    ## USER ADOPTION ##
-    for key in user_adoption_ds[user_adoption_ds.keys()[0]]:
-        key_values = user_adoption_ds.apply(lambda s: s.get(key))
-        data[key] = key_values
-
-    ## BUSINESS ASSUMPTIONS ##
-    for key in business_assumptions_ds[business_assumptions_ds.keys()[0]]:
-        key_values = business_assumptions_ds.apply(lambda s: s.get(key))
-        data[key] = key_values
-    
+    df = df[df['substep'] == substep]
+
+    # Flatten the ABM results into one column per metric
+    data = _flatten_rows(df)
+
     ## AGGREGATED METRICS ##
-    
-    
+
+
     print("Postprocessing for substep: ", substep, " finished!")
-    
-    return data
\ No newline at end of file
+
+    return data
+
+def postprocessing_substeps(df, substeps='all', combine=False):
+    '''
+    Definition:
+    Refine and extract metrics of several substeps from the simulation in a single pass over the results
+
+    Parameters:
+    df: simulation dataframe
+    substeps: iterable of substeps to extract or 'all' for every recorded substep
+    combine: return one data frame with a 'substep' column instead of one data frame per substep
+
+    Returns:
+    dictionary of post processed data frames per substep (each equal to postprocessing(df, substep)) or a single
+    data frame with a 'substep' column if combine is True
+    '''
+    recorded_substeps = sorted(df['substep'].unique().tolist())
+    substeps = recorded_substeps if substeps == 'all' else sorted(set(substeps))
+    missing_substeps = [substep for substep in substeps if substep not in recorded_substeps]
+    if missing_substeps:
+        raise ValueError(f"The substeps {missing_substeps} are not recorded in the simulation data frame.")
+
+    print("Postprocessing for substeps: ", substeps, " started..")
+    # subset to the requested substeps
+    df = df[df['substep'].isin(substeps)]
+
+    # Flatten the ABM results of all substeps at once
+    data = _flatten_rows(df)
+    data.insert(3, 'substep', df['substep'].values)
+
+    print("Postprocessing for substeps: ", substeps, " finished!")
+
+    if combine:
+        return data
+    return {substep: frame.drop(columns='substep') for substep, frame in data.groupby('substep', sort=True)}
+
+def flatten_records(records):
+    '''
+    Definition:
+    Flatten raw simulation records (state dictionaries as returned by radCAD or the in-place executor) into the
+    post processed columns, with the 'substep' column after 'run' and the parameter 'subset' as last column
+
+    Parameters:
+    records: list of state dictionaries
+
+    Returns:
+    post processed data frame with one row per record
+    '''
+    df = pd.DataFrame(records)
+    data = _flatten_rows(df).reset_index(drop=True)
+    data.insert(3, 'substep', df['substep'].values)
+    data['subset'] = df['subset'].values
+    return data
@@ -0,0 +1,121 @@
+# Dependences
+import hashlib
+import json
+import os
+from datetime import datetime
+from functools import lru_cache
+
+import numpy as np
+import diskcache
+import radcad
+
+# directory of the Model package, its source code defines the model version
+MODEL_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# default location and size limit of the on-disk result cache
+CACHE_DIR = os.path.join(MODEL_DIR, '.result_cache')
+CACHE_SIZE_LIMIT = 2**30 # 1 GiB
+
+# source files and packages of the model, their source code defines the model version, post_processing.py is part of it
+# as the cached results are post processed
+MODEL_FILES = ['parts', 'state_update_blocks.py', 'state_variables.py', 'sys_params.py', 'model.py', 'executor.py',
+               'substep_compiler.py', 'post_processing.py']
+
+
+# Helper Functions
+def _canonical(value):
+    """
+    JSON serializable representation of a parameter value, numpy values are converted to their Python equivalents.
+    """
+    if isinstance(value, dict):
+        return {str(key): _canonical(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_canonical(item) for item in value]
+    if isinstance(value, np.ndarray):
+        return _canonical(value.tolist())
+    if isinstance(value, np.generic):
+        return value.item()
+    if isinstance(value, (datetime, np.datetime64)):
+        return str(value)
+    return value
+
+def parameter_hash(sys_param):
+    """
+    Stable hash of the system parameters, independent of the order of the parameters.
+    """
+    encoded = json.dumps(_canonical(sys_param), sort_keys=True, default=repr, allow_nan=True)
+    return hashlib.sha256(encoded.encode()).hexdigest()
+
+@lru_cache(maxsize=1)
+def model_version():
+    """
+    Hash of the model source code (the MODEL_FILES of the Model package) and the radCAD version, so cached results are
+    invalidated by every change of the model, but not by changes of the interface, the plots or the batch tools.
+    """
+    digest = hashlib.sha256(radcad.__version__.encode() if hasattr(radcad, '__version__') else b'')
+    paths = []
+    for name in MODEL_FILES:
+        path = os.path.join(MODEL_DIR, name)
+        if os.path.isdir(path):
+            for root, dirs, files in os.walk(path):
+                dirs[:] = sorted(name for name in dirs if name != '__pycache__' and not name.startswith('.'))
+                paths.extend(os.path.join(root, name) for name in sorted(files) if name.endswith('.py'))
+        else:
+            paths.append(path)
+    for path in paths:
+        digest.update(os.path.relpath(path, MODEL_DIR).encode())
+        with open(path, 'rb') as f:
+            digest.update(hashlib.sha256(f.read()).digest())
+    return digest.hexdigest()
+
+def result_key(sys_param, timesteps, runs=1):
+    """
+    Cache key of the simulation results of a scenario: the hash of the system parameters, the model version, the
+    number of timesteps and the number of monte carlo runs.
+    """
+    return f"{parameter_hash(sys_param)}-{model_version()}-{int(timesteps)}-{int(runs)}"
+
+
+class ResultCache:
+    """
+    Content-addressed on-disk cache of post processed simulation results (see result_key).
+
+    The cache is a diskcache.Cache with least-recently-used eviction, so the oldest unused scenarios are removed
+    once the cache exceeds its size limit.
+
+    directory: cache directory, defaults to Model/.result_cache
+    size_limit: maximum size of the cache in bytes
+    """
+
+    def __init__(self, directory=CACHE_DIR, size_limit=CACHE_SIZE_LIMIT):
+        self.cache = diskcache.Cache(directory, size_limit=size_limit, eviction_policy='least-recently-used')
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def __contains__(self, key):
+        return key in self.cache
+
+    def close(self):
+        self.cache.close()
+
+    def get(self, key):
+        """
+        Cached results of a key, None if the results are not cached.
+        """
+        return self.cache.get(key, default=None)
+
+    def set(self, key, data):
+        """
+        Store the results of a key.
+        """
+        self.cache.set(key, data)
+
+    def clear(self):
+        """
+        Remove all cached results.
+        """
+        self.cache.clear()
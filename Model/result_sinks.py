@@ -0,0 +1,258 @@
+# Dependences
+import pandas as pd
+
+from parts.utils import convert_to_json
+from post_processing import flatten_records
+from result_store import ResultStore, ArrowResultStore, DEFAULT_TABLE
+from aggregation import RunAggregator, DEFAULT_QUANTILES
+
+
+class ResultSink:
+    """
+    Destination of the simulation results, filled while the simulation runs.
+
+    Raw state records (see append) are buffered and flattened batch by batch, post processed data frames
+    (see write) are buffered as they are. Every full batch is handed to write_batch() and dropped afterwards, so the
+    memory use only depends on the batch size and not on the number of runs or parameter subsets.
+    Subclasses implement write_batch(data) and optionally close().
+    """
+
+    def __init__(self, batch_size=5000):
+        if batch_size < 1:
+            raise ValueError(f"The batch size has to be positive, not {batch_size}.")
+        self.batch_size = batch_size
+        self.rows = 0
+        self._records = []
+        self._frames = []
+        self._frame_rows = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def append(self, records):
+        """
+        Add raw state records, e.g. the records of one completed timestep of the in-place executor.
+        """
+        self._records.extend(records)
+        if len(self._records) >= self.batch_size:
+            self._flatten_records()
+            self._write_frames()
+
+    def write(self, data):
+        """
+        Add an already post processed data frame, e.g. a chunk of a parameter sweep.
+        """
+        self._frames.append(data)
+        self._frame_rows += len(data)
+        if self._frame_rows >= self.batch_size:
+            self._write_frames()
+
+    def flush(self):
+        """
+        Write all buffered results.
+        """
+        self._flatten_records()
+        self._write_frames()
+
+    def close(self):
+        self.flush()
+
+    def write_batch(self, data):
+        raise NotImplementedError("Result sinks have to implement write_batch(data).")
+
+    def _flatten_records(self):
+        if self._records:
+            records, self._records = self._records, []
+            self._frames.append(flatten_records(records))
+            self._frame_rows += len(self._frames[-1])
+
+    def _write_frames(self):
+        if self._frames:
+            data = pd.concat(self._frames, ignore_index=True) if len(self._frames) > 1 else self._frames[0].reset_index(drop=True)
+            self._frames, self._frame_rows = [], 0
+            self.write_batch(data)
+            self.rows += len(data)
+
+
+class ListSink(ResultSink):
+    """
+    In-memory result sink, mainly for tests and small simulations.
+    """
+
+    def __init__(self, batch_size=5000):
+        super().__init__(batch_size)
+        self.batches = []
+
+    def write_batch(self, data):
+        self.batches.append(data)
+
+    @property
+    def data(self):
+        """
+        All results written so far as one data frame.
+        """
+        self.flush()
+        return pd.concat(self.batches, ignore_index=True) if self.batches else pd.DataFrame()
+
+
+class SQLiteSink(ResultSink):
+    """
+    Result sink appending the results batch by batch to a typed results table (see result_store.ResultStore).
+
+    db: path of the SQLite database
+    table: name of the results table
+    experiment: name of the experiment the results belong to
+    if_exists: 'replace' to delete the stored results of the experiment before the first batch is written, 'append'
+               to extend them
+    """
+
+    def __init__(self, db, table=DEFAULT_TABLE, experiment='default', if_exists='replace', batch_size=5000):
+        super().__init__(batch_size)
+        if if_exists not in ('replace', 'append'):
+            raise ValueError(f"if_exists has to be 'replace' or 'append', not {if_exists}.")
+        self.db = db
+        self.table = table
+        self.experiment = experiment
+        self.if_exists = if_exists
+        self._store = None
+
+    def write_batch(self, data):
+        if self._store is None:
+            self._store = ResultStore(self.db)
+        self._store.save(data, experiment=self.experiment, table=self.table, replace=self.if_exists == 'replace' and self.rows == 0)
+
+    def close(self):
+        super().close()
+        if self._store is not None:
+            self._store.close()
+            self._store = None
+
+
+class ArrowSink(ResultSink):
+    """
+    Result sink writing the results batch by batch into an Arrow result store partitioned by experiment and monte
+    carlo run (see result_store.ArrowResultStore). Requires pyarrow.
+
+    path: directory of the Arrow result store
+    table: name of the results table
+    experiment: name of the experiment the results belong to
+    if_exists: 'replace' to delete the stored results of the experiment before the first batch is written, 'append'
+               to extend them
+    """
+
+    def __init__(self, path, table=DEFAULT_TABLE, experiment='default', if_exists='replace', batch_size=5000):
+        super().__init__(batch_size)
+        if if_exists not in ('replace', 'append'):
+            raise ValueError(f"if_exists has to be 'replace' or 'append', not {if_exists}.")
+        self._store = ArrowResultStore(path)
+        self.path = path
+        self.table = table
+        self.experiment = experiment
+        self.if_exists = if_exists
+
+    def write_batch(self, data):
+        self._store.save(data, experiment=self.experiment, table=self.table, replace=self.if_exists == 'replace' and self.rows == 0)
+
+
+class SelectionSink(ResultSink):
+    """
+    Result sink forwarding a selection of the results to another result sink, e.g. only some metrics of the raw
+    records of the in-place executor. The initial state rows (substep 0) are always dropped.
+
+    sink: result sink the selected results are written to, closed together with this sink
+    metrics: metrics to keep besides the run, subset, timestep and substep columns, None for all
+    keep_substeps: keep the substep column, e.g. if several substeps are recorded
+    """
+
+    def __init__(self, sink, metrics=None, keep_substeps=False, batch_size=5000):
+        super().__init__(batch_size)
+        self.sink = sink
+        self.metrics = list(metrics) if metrics is not None else None
+        self.keep_substeps = keep_substeps
+
+    def write_batch(self, data):
+        if 'substep' in data.columns:
+            data = data[data['substep'] > 0]
+            if not self.keep_substeps:
+                data = data.drop(columns='substep')
+        if self.metrics is not None:
+            unknown_metrics = [key for key in self.metrics if key not in data.columns]
+            if unknown_metrics:
+                raise ValueError(f"The metrics {unknown_metrics} are not part of the results.")
+            index_columns = [key for key in ['run', 'subset', 'timestep', 'substep'] if key in data.columns]
+            data = data[index_columns + [key for key in self.metrics if key not in index_columns]]
+        self.sink.write(data.reset_index(drop=True))
+
+    def close(self):
+        super().close()
+        self.sink.close()
+
+
+class AggregationSink(ResultSink):
+    """
+    Result sink summarizing the monte carlo runs while they complete instead of keeping them (see
+    aggregation.RunAggregator), e.g. for quantile bands of thousands of runs.
+
+    metrics: metrics to summarize
+    aggregate_dimension: the dimension to aggregate on, the standard one is timestep
+    quantiles: quantiles of the summary
+    substep: only rows of this substep are summarized if the results have a substep column, by default the last
+             substep of every batch
+    """
+
+    def __init__(self, metrics, aggregate_dimension='timestep', quantiles=DEFAULT_QUANTILES, substep=None, batch_size=5000):
+        super().__init__(batch_size)
+        self.aggregator = RunAggregator(metrics, aggregate_dimension, quantiles)
+        self.substep = substep
+
+    def write_batch(self, data):
+        if 'substep' in data.columns:
+            data = data[data['substep'] == (data['substep'].max() if self.substep is None else self.substep)]
+        self.aggregator.add(data)
+
+    def summary(self, metric):
+        """
+        Summary of a metric over all runs written so far (see aggregation.RunAggregator.summary).
+        """
+        self.flush()
+        return self.aggregator.summary(metric)
+
+
+class ParquetSink(ResultSink):
+    """
+    Result sink appending the results batch by batch as row groups to a parquet file. Requires pyarrow.
+    Columns holding dictionaries (e.g. the agent actions) are stored as JSON strings.
+
+    path: path of the parquet file
+    """
+
+    def __init__(self, path, batch_size=5000):
+        super().__init__(batch_size)
+        try:
+            import pyarrow
+            import pyarrow.parquet
+        except ImportError:
+            raise ImportError("The ParquetSink requires pyarrow, install it with 'pip install pyarrow'.")
+        self._pa = pyarrow
+        self.path = path
+        self._writer = None
+
+    def write_batch(self, data):
+        for col in data.columns:
+            if data[col].dtype == object and data[col].map(lambda x: isinstance(x, (dict, list))).any():
+                data[col] = data[col].apply(convert_to_json)
+        if self._writer is None:
+            table = self._pa.Table.from_pandas(data, preserve_index=False)
+            self._writer = self._pa.parquet.ParquetWriter(self.path, table.schema)
+        else:
+            table = self._pa.Table.from_pandas(data, schema=self._writer.schema, preserve_index=False)
+        self._writer.write_table(table)
+
+    def close(self):
+        super().close()
+        if self._writer is not None:
+            self._writer.close()
+            self._writer = None
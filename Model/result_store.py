@@ -0,0 +1,661 @@
+# Dependences
+import json
+import os
+import shutil
+import sqlite3
+import uuid
+from urllib.parse import quote, unquote
+
+import numpy as np
+import pandas as pd
+
+# table of the post processed simulation results of the interface
+DEFAULT_TABLE = 'simulation_data'
+
+# table of the versions of the experiments in an SQLite database, see ResultStore.version()
+VERSIONS_TABLE = 'result_versions'
+
+
+# aggregations of the monte carlo runs per timestep supported by query(), with their SQL aggregate function if SQLite
+# can compute them
+AGGREGATIONS = {'mean': 'AVG', 'min': 'MIN', 'max': 'MAX', 'sum': 'SUM', 'count': 'COUNT', 'median': None, 'std': None}
+
+
+# Helper Functions
+def _quote(name):
+    """
+    Quote an SQL identifier, e.g. a metric name.
+    """
+    return '"' + str(name).replace('"', '""') + '"'
+
+def _chunk_rows(n_columns):
+    """
+    Number of rows converted at once when writing or reading results, about one million values.
+    """
+    return max(1, 1000000 // max(n_columns, 1))
+
+def column_type(series):
+    """
+    Declared SQLite type of a post processed data frame column: REAL for floats, INTEGER for integers and booleans,
+    TIMESTAMP for dates and JSON for columns holding dictionaries or lists (e.g. the agent actions), else TEXT.
+    """
+    kind = series.dtype.kind
+    if kind == 'f':
+        return 'REAL'
+    if kind in 'iub':
+        return 'INTEGER'
+    if kind == 'M':
+        return 'TIMESTAMP'
+    first_value = next((value for value in series if value is not None), None)
+    if isinstance(first_value, (dict, list)):
+        return 'JSON'
+    return 'TEXT'
+
+def _sql_values(series, declared_type):
+    """
+    Column values as Python objects that sqlite3 can bind.
+    """
+    if declared_type == 'INTEGER':
+        return series.astype(np.int64).tolist()
+    if declared_type == 'TIMESTAMP':
+        return [None if pd.isnull(value) else str(value) for value in series]
+    if declared_type == 'JSON':
+        return _json_values(series)
+    values = series.tolist()
+    if any(isinstance(value, np.generic) for value in values[:1]):
+        values = [value.item() if isinstance(value, np.generic) else value for value in values]
+    return values
+
+def _json_values(series):
+    """
+    JSON encoded column values, flat dictionaries that occur repeatedly (e.g. the agent actions) are encoded once.
+    """
+    encoded, values = {}, []
+    for value in series:
+        if isinstance(value, dict):
+            try:
+                key = tuple(value.items())
+                if key not in encoded:
+                    encoded[key] = json.dumps(value)
+                values.append(encoded[key])
+                continue
+            except TypeError: # unhashable values
+                pass
+        values.append(json.dumps(value) if isinstance(value, (dict, list)) else value)
+    return values
+
+def _column_values(values, declared_type):
+    """
+    Convert the values of a column read from SQLite according to its declared type.
+    """
+    if declared_type == 'REAL':
+        return np.array(values, dtype=float)
+    if declared_type == 'INTEGER' and None not in values:
+        return np.array(values, dtype=np.int64)
+    if declared_type == 'TIMESTAMP':
+        return pd.to_datetime(list(values))
+    if declared_type == 'JSON':
+        # decode every distinct value once, each row gets its own copy
+        decoded = {}
+        for value in values:
+            if isinstance(value, str) and value not in decoded:
+                decoded[value] = json.loads(value)
+        return [decoded[value].copy() if isinstance(value, str) and isinstance(decoded[value], (dict, list)) else
+                decoded[value] if isinstance(value, str) else value for value in values]
+    return list(values)
+
+def _query_columns(metrics, types, table):
+    """
+    Columns read by a query: run, timestep and the requested metrics, which have to be stored in the table.
+    """
+    metrics = [metrics] if isinstance(metrics, str) else list(metrics)
+    missing_columns = [key for key in metrics if key not in types]
+    if missing_columns:
+        raise ValueError(f"The columns {missing_columns} are not stored in the results table {table}.")
+    return metrics, list(dict.fromkeys(['run', 'timestep'] + metrics))
+
+def _aggregations(aggregate):
+    """
+    List of the requested aggregations of a query, None if the runs are not aggregated.
+    """
+    if aggregate is None:
+        return None
+    aggregations = [aggregate] if isinstance(aggregate, str) else list(aggregate)
+    unknown_aggregations = [aggregation for aggregation in aggregations if aggregation not in AGGREGATIONS]
+    if unknown_aggregations:
+        raise ValueError(f"The aggregations {unknown_aggregations} are not supported, use any of {list(AGGREGATIONS)}.")
+    return aggregations
+
+def _query_result(aggregated, aggregate):
+    """
+    Single data frame for a single aggregation, else the dictionary of data frames per aggregation.
+    """
+    return aggregated[aggregate] if isinstance(aggregate, str) else aggregated
+
+def _query_frame(data, metrics, runs=None, timesteps=None, aggregate=None):
+    """
+    Filter and aggregate the results of a query in pandas, for stores without SQL, see ResultStore.query().
+    """
+    if runs is not None:
+        data = data[data['run'].astype(int).isin([int(run) for run in runs])]
+    if timesteps is not None:
+        data = data[data['timestep'].between(*timesteps)]
+    aggregations = _aggregations(aggregate)
+    if aggregations is None:
+        return data.sort_values(['run', 'timestep'], kind='stable').reset_index(drop=True)
+    grouped = data[list(dict.fromkeys(['timestep'] + metrics))].groupby('timestep', sort=True)
+    return _query_result({aggregation: grouped.agg(aggregation).reset_index() for aggregation in aggregations}, aggregate)
+
+
+class ResultStore:
+    """
+    Typed SQLite storage of post processed simulation results, e.g. interfaceData.db.
+
+    A results table has one column per metric with the SQLite type of the metric (see column_type) and an
+    'experiment' column, so several experiments, e.g. the parameter sweeps of a study, share one table. The rows are
+    indexed by (experiment, run, timestep) and written with a single executemany() per transaction. The database is
+    opened in WAL mode, so the interface can read results while a simulation writes them.
+    """
+
+    def __init__(self, db, timeout=60):
+        self.db = db
+        # several processes may write into one database (e.g. the scenarios of cli.py), writers wait for each other
+        self.conn = sqlite3.connect(db, timeout=timeout)
+        # a result row holds several hundred metrics, large pages avoid overflow pages for every row (only takes
+        # effect for new databases)
+        self.conn.execute('PRAGMA page_size=65536')
+        self.conn.execute('PRAGMA journal_mode=WAL')
+        self.conn.execute('PRAGMA synchronous=NORMAL')
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def close(self):
+        self.conn.close()
+
+    def tables(self):
+        """
+        Names of all tables in the database.
+        """
+        return [row[0] for row in self.conn.execute("SELECT name FROM sqlite_master WHERE type='table' AND name != ? ORDER BY name",
+                                                    (VERSIONS_TABLE,))]
+
+    def columns(self, table=DEFAULT_TABLE):
+        """
+        Dictionary of the columns of a table and their declared types, empty if the table does not exist.
+        """
+        return {row[1]: row[2] for row in self.conn.execute(f'PRAGMA table_info({_quote(table)})')}
+
+    def experiments(self, table=DEFAULT_TABLE):
+        """
+        Names of the experiments stored in a results table.
+        """
+        if 'experiment' not in self.columns(table):
+            return []
+        return [row[0] for row in self.conn.execute(f'SELECT DISTINCT experiment FROM {_quote(table)} ORDER BY experiment')]
+
+    def save(self, data, experiment='default', table=DEFAULT_TABLE, replace=True):
+        '''
+        Definition:
+        Write a post processed data frame into a results table in one transaction.
+
+        Parameters:
+        data: post processed data frame with at least the 'run' and 'timestep' columns
+        experiment: name of the experiment the results belong to
+        table: name of the results table, created on first use and extended by new metric columns
+        replace: delete the stored results of the experiment before writing
+        '''
+        for key in ['run', 'timestep']:
+            if key not in data.columns:
+                raise ValueError(f"The results are missing the '{key}' column.")
+        if 'experiment' in data.columns:
+            raise ValueError("The results must not contain an 'experiment' column, pass the experiment name instead.")
+
+        types = {key: column_type(data[key]) for key in data.columns}
+        # numeric columns are converted as one block, the other columns one by one
+        real_columns = [key for key in data.columns if types[key] == 'REAL']
+        other_columns = [key for key in data.columns if types[key] != 'REAL']
+
+        insert_columns = ', '.join(_quote(key) for key in ['experiment'] + other_columns + real_columns)
+        placeholders = ', '.join('?' * (1 + len(data.columns)))
+
+        with self.conn:
+            # the table is checked and extended within the write transaction, so concurrent writers do not race
+            self.conn.execute('BEGIN IMMEDIATE')
+            existing_columns = self.columns(table)
+            if existing_columns and 'experiment' not in existing_columns:
+                # table of the former untyped JSON format
+                self.conn.execute(f'DROP TABLE {_quote(table)}')
+                existing_columns = {}
+            if not existing_columns:
+                definitions = ', '.join(['experiment TEXT NOT NULL'] + [f'{_quote(key)} {types[key]}' for key in data.columns])
+                self.conn.execute(f'CREATE TABLE {_quote(table)} ({definitions})')
+            else:
+                for key in data.columns:
+                    if key not in existing_columns:
+                        self.conn.execute(f'ALTER TABLE {_quote(table)} ADD COLUMN {_quote(key)} {types[key]}')
+            self.conn.execute(f'CREATE INDEX IF NOT EXISTS {_quote("idx_"+table+"_experiment_run_timestep")} '
+                              f'ON {_quote(table)} (experiment, run, timestep)')
+            if replace:
+                self.conn.execute(f'DELETE FROM {_quote(table)} WHERE experiment = ?', (experiment,))
+            self._increment_version(experiment, table)
+            # convert and insert the rows chunk by chunk to bound the memory use of large experiments
+            chunk_rows = _chunk_rows(data.shape[1])
+            for start in range(0, len(data), chunk_rows):
+                chunk = data.iloc[start:start + chunk_rows]
+                real_rows = chunk[real_columns].to_numpy(dtype=float).tolist() if real_columns else [[] for _ in range(len(chunk))]
+                other_values = [_sql_values(chunk[key], types[key]) for key in other_columns]
+                rows = [(experiment, *other, *real) for other, real in zip(zip(*other_values), real_rows)] if other_columns else \
+                       [(experiment, *real) for real in real_rows]
+                self.conn.executemany(f'INSERT INTO {_quote(table)} ({insert_columns}) VALUES ({placeholders})', rows)
+
+    def append(self, data, experiment='default', table=DEFAULT_TABLE):
+        """
+        Add results to an experiment, see save().
+        """
+        self.save(data, experiment=experiment, table=table, replace=False)
+
+    def delete(self, experiment, table=DEFAULT_TABLE):
+        """
+        Delete the stored results of an experiment.
+        """
+        with self.conn:
+            self.conn.execute(f'DELETE FROM {_quote(table)} WHERE experiment = ?', (experiment,))
+            self._increment_version(experiment, table)
+
+    def version(self, experiment=None, table=DEFAULT_TABLE):
+        """
+        Version of the stored results of an experiment, or of all experiments of a table, changes whenever they are
+        written or deleted, e.g. to key cached query results. Unlike the modification time of the database, it does
+        not change when other experiments or tables (e.g. the job table of worker.py) are written.
+        """
+        if not self.conn.execute("SELECT 1 FROM sqlite_master WHERE type='table' AND name = ?", (VERSIONS_TABLE,)).fetchone():
+            return ()
+        query = f'SELECT experiment, version FROM {VERSIONS_TABLE} WHERE results_table = ?'
+        parameters = (table,) if experiment is None else (table, experiment)
+        return tuple(self.conn.execute(query + (' AND experiment = ?' if experiment is not None else '') + ' ORDER BY experiment', parameters))
+
+    def _increment_version(self, experiment, table):
+        # called within the write transactions of save() and delete()
+        self.conn.execute(f'''CREATE TABLE IF NOT EXISTS {VERSIONS_TABLE} (
+            results_table TEXT NOT NULL,
+            experiment TEXT NOT NULL,
+            version INTEGER NOT NULL,
+            PRIMARY KEY (results_table, experiment))''')
+        self.conn.execute(f'INSERT INTO {VERSIONS_TABLE} (results_table, experiment, version) VALUES (?, ?, 1) '
+                          f'ON CONFLICT (results_table, experiment) DO UPDATE SET version = version + 1', (table, experiment))
+
+    def load(self, experiment=None, table=DEFAULT_TABLE, columns=None, runs=None):
+        '''
+        Definition:
+        Read results from a results table with their stored types, in the order they were written.
+
+        Parameters:
+        experiment: name of the experiment to read, defaults to all experiments (with an 'experiment' column)
+        table: name of the results table
+        columns: metric columns to read, defaults to all columns
+        runs: monte carlo runs to read, defaults to all runs
+
+        Returns:
+        data frame of the results
+        '''
+        types = self.columns(table)
+        if not types:
+            raise ValueError(f"The results table {table} does not exist in {self.db}.")
+        if 'experiment' not in types:
+            # table of the former untyped JSON format
+            return pd.read_sql(f'SELECT * FROM {_quote(table)}', self.conn)
+
+        if columns is None:
+            columns = [key for key in types if key != 'experiment' or experiment is None]
+        else:
+            missing_columns = [key for key in columns if key not in types]
+            if missing_columns:
+                raise ValueError(f"The columns {missing_columns} are not stored in the results table {table}.")
+            columns = list(columns)
+
+        conditions, parameters = [], []
+        if experiment is not None:
+            # without run filter, scan the table in rowid order instead of sorting the rows found via the index
+            conditions.append('experiment = ?' if runs is not None else '+experiment = ?')
+            parameters.append(experiment)
+        if runs is not None:
+            runs = [int(run) for run in runs]
+            conditions.append(f'run IN ({", ".join("?" * len(runs))})')
+            parameters.extend(runs)
+        where = (' WHERE ' + ' AND '.join(conditions)) if conditions else ''
+
+        cursor = self.conn.execute(f'SELECT {", ".join(_quote(key) for key in columns)} FROM {_quote(table)}{where} ORDER BY rowid', parameters)
+        return self._fetch(cursor, columns, types)
+
+    def query(self, metrics, experiment=None, table=DEFAULT_TABLE, runs=None, timesteps=None, aggregate=None):
+        '''
+        Definition:
+        Read selected metrics of selected runs and timesteps, optionally aggregated over the runs per timestep.
+        The filters are evaluated by SQLite via the (experiment, run, timestep) index, mean, min, max, sum and count
+        are aggregated by SQLite as well, so only the requested values are read into pandas.
+
+        Parameters:
+        metrics: metric column or list of metric columns
+        experiment: name of the experiment to read, defaults to all experiments
+        table: name of the results table
+        runs: monte carlo runs to read, defaults to all runs
+        timesteps: (first, last) timestep range to read, both included, defaults to all timesteps
+        aggregate: None to return the runs, an aggregation or a list of aggregations (see AGGREGATIONS)
+
+        Returns:
+        data frame with the run, timestep and metric columns ordered by run and timestep, or for aggregated runs a
+        data frame with the timestep and the aggregated metric columns (a dictionary of data frames per aggregation
+        for a list of aggregations)
+        '''
+        types = self.columns(table)
+        if not types:
+            raise ValueError(f"The results table {table} does not exist in {self.db}.")
+        metrics, columns = _query_columns(metrics, types, table)
+        aggregations = _aggregations(aggregate)
+        if 'experiment' not in types:
+            # table of the former untyped format, all values are stored as text
+            data = self.load(table=table)[columns].apply(pd.to_numeric, errors='ignore')
+            return _query_frame(data, metrics, runs, timesteps, aggregate)
+
+        conditions, parameters = [], []
+        if experiment is not None:
+            conditions.append('experiment = ?')
+            parameters.append(experiment)
+        if runs is not None:
+            runs = [int(run) for run in runs]
+            conditions.append(f'run IN ({", ".join("?" * len(runs))})')
+            parameters.extend(runs)
+        if timesteps is not None:
+            conditions.append('timestep BETWEEN ? AND ?')
+            parameters.extend(int(timestep) for timestep in timesteps)
+        where = (' WHERE ' + ' AND '.join(conditions)) if conditions else ''
+
+        if aggregations is not None and all(AGGREGATIONS[aggregation] for aggregation in aggregations):
+            aggregate_columns = [f'{AGGREGATIONS[aggregation]}({_quote(key)})' for aggregation in aggregations for key in metrics]
+            cursor = self.conn.execute(f'SELECT timestep, {", ".join(aggregate_columns)} FROM {_quote(table)}{where} '
+                                       f'GROUP BY timestep ORDER BY timestep', parameters)
+            rows = cursor.fetchall()
+            values = list(zip(*rows)) if rows else [()] * (1 + len(aggregate_columns))
+            aggregated = {}
+            for i, aggregation in enumerate(aggregations):
+                offset = 1 + i * len(metrics)
+                aggregated[aggregation] = pd.DataFrame({'timestep': np.array(values[0], dtype=np.int64),
+                                                        **{key: np.array(values[offset + j], dtype=np.int64 if aggregation == 'count' else float)
+                                                           for j, key in enumerate(metrics)}})
+            return _query_result(aggregated, aggregate)
+
+        cursor = self.conn.execute(f'SELECT {", ".join(_quote(key) for key in columns)} FROM {_quote(table)}{where} ORDER BY run, timestep', parameters)
+        data = self._fetch(cursor, columns, types)
+        return data if aggregations is None else _query_frame(data, metrics, aggregate=aggregate)
+
+    def _fetch(self, cursor, columns, types):
+        # convert the rows chunk by chunk to bound the memory use of large experiments
+        frames = []
+        while True:
+            rows = cursor.fetchmany(_chunk_rows(len(columns)))
+            if not rows:
+                break
+            frames.append(pd.DataFrame({key: _column_values(column, types[key]) for key, column in zip(columns, zip(*rows))}, columns=columns))
+        if not frames:
+            return pd.DataFrame({key: _column_values((), types[key]) for key in columns}, columns=columns)
+        return pd.concat(frames, ignore_index=True) if len(frames) > 1 else frames[0]
+
+
+class ArrowResultStore:
+    """
+    Arrow IPC storage of post processed simulation results, partitioned by experiment and monte carlo run. Requires
+    pyarrow.
+
+    The results of a table are stored in the directory '<path>/<table>/experiment=<experiment>/run=<run>/', each
+    save() adds one Arrow IPC file per run. Loads only open the files of the requested experiments and runs, and the
+    files are memory-mapped, so only the pages of the requested columns are read from disk. Columns holding
+    dictionaries or lists (e.g. the agent actions) are stored as JSON strings and decoded on load.
+    Offers the same interface as ResultStore.
+    """
+
+    def __init__(self, path):
+        try:
+            import pyarrow
+            import pyarrow.ipc
+        except ImportError:
+            raise ImportError("The ArrowResultStore requires pyarrow, install it with 'pip install pyarrow'.")
+        self._pa = pyarrow
+        self.path = path
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def close(self):
+        pass
+
+    def _experiment_dir(self, experiment, table):
+        return os.path.join(self.path, table, 'experiment=' + quote(str(experiment), safe=''))
+
+    def _files(self, experiment, table, runs=None):
+        """
+        Arrow files of an experiment in the order of the runs and within a run in the order they were written.
+        """
+        experiment_dir = self._experiment_dir(experiment, table)
+        if not os.path.isdir(experiment_dir):
+            return []
+        stored_runs = sorted(int(name[len('run='):]) for name in os.listdir(experiment_dir) if name.startswith('run='))
+        if runs is not None:
+            runs = set(int(run) for run in runs)
+            stored_runs = [run for run in stored_runs if run in runs]
+        files = []
+        for run in stored_runs:
+            run_dir = os.path.join(experiment_dir, f'run={run}')
+            files.extend(os.path.join(run_dir, name) for name in sorted(os.listdir(run_dir)) if name.endswith('.arrow'))
+        return files
+
+    def _read(self, file, columns=None):
+        with self._pa.memory_map(file) as source:
+            arrow_table = self._pa.ipc.open_file(source).read_all()
+        return arrow_table if columns is None else arrow_table.select(columns)
+
+    def tables(self):
+        """
+        Names of all results tables in the store.
+        """
+        if not os.path.isdir(self.path):
+            return []
+        return sorted(name for name in os.listdir(self.path) if os.path.isdir(os.path.join(self.path, name)))
+
+    def columns(self, table=DEFAULT_TABLE):
+        """
+        Dictionary of the columns of a table and their types (SQLite types as in ResultStore), empty if the table does
+        not exist.
+        """
+        for experiment in self.experiments(table):
+            files = self._files(experiment, table)
+            if files:
+                with self._pa.memory_map(files[0]) as source:
+                    schema = self._pa.ipc.open_file(source).schema
+                json_columns = json.loads(schema.metadata.get(b'json_columns', b'[]') if schema.metadata else b'[]')
+                return {'experiment': 'TEXT', **{field.name: 'JSON' if field.name in json_columns else self._column_type(field.type)
+                                                 for field in schema}}
+        return {}
+
+    def experiments(self, table=DEFAULT_TABLE):
+        """
+        Names of the experiments stored in a results table.
+        """
+        table_dir = os.path.join(self.path, table)
+        if not os.path.isdir(table_dir):
+            return []
+        return sorted(unquote(name[len('experiment='):]) for name in os.listdir(table_dir) if name.startswith('experiment='))
+
+    def save(self, data, experiment='default', table=DEFAULT_TABLE, replace=True):
+        '''
+        Definition:
+        Write a post processed data frame into a results table, one Arrow file per monte carlo run.
+
+        Parameters:
+        data: post processed data frame with at least the 'run' and 'timestep' columns
+        experiment: name of the experiment the results belong to
+        table: name of the results table
+        replace: delete the stored results of the experiment before writing
+        '''
+        for key in ['run', 'timestep']:
+            if key not in data.columns:
+                raise ValueError(f"The results are missing the '{key}' column.")
+        if 'experiment' in data.columns:
+            raise ValueError("The results must not contain an 'experiment' column, pass the experiment name instead.")
+
+        if replace:
+            self.delete(experiment, table)
+        json_columns = [key for key in data.columns if data[key].dtype == object and column_type(data[key]) == 'JSON']
+        if json_columns:
+            data = data.assign(**{key: _json_values(data[key]) for key in json_columns})
+        # the pandas metadata is not needed to restore the column types and is large for several hundred columns
+        arrow_table = self._pa.Table.from_pandas(data, preserve_index=False)
+        arrow_table = arrow_table.replace_schema_metadata({b'json_columns': json.dumps(json_columns).encode()})
+
+        experiment_dir = self._experiment_dir(experiment, table)
+        runs = data['run'].to_numpy()
+        for run in pd.unique(runs):
+            run_dir = os.path.join(experiment_dir, f'run={int(run)}')
+            os.makedirs(run_dir, exist_ok=True)
+            part = sum(name.endswith('.arrow') for name in os.listdir(run_dir))
+            while True:
+                # reserve the file name first, so concurrent writers of the same run never overwrite each other's parts
+                try:
+                    os.close(os.open(os.path.join(run_dir, f'part-{part:05d}.arrow'), os.O_CREAT | os.O_EXCL | os.O_WRONLY))
+                    break
+                except FileExistsError:
+                    part += 1
+            run_table = arrow_table.filter(self._pa.array(runs == run))
+            with self._pa.OSFile(os.path.join(run_dir, f'part-{part:05d}.arrow'), 'wb') as sink:
+                with self._pa.ipc.new_file(sink, run_table.schema) as writer:
+                    writer.write_table(run_table)
+        if os.path.isdir(experiment_dir):
+            self._write_version(experiment, table)
+
+    def append(self, data, experiment='default', table=DEFAULT_TABLE):
+        """
+        Add results to an experiment, see save().
+        """
+        self.save(data, experiment=experiment, table=table, replace=False)
+
+    def delete(self, experiment, table=DEFAULT_TABLE):
+        """
+        Delete the stored results of an experiment.
+        """
+        experiment_dir = self._experiment_dir(experiment, table)
+        if os.path.isdir(experiment_dir):
+            shutil.rmtree(experiment_dir)
+
+    def version(self, experiment=None, table=DEFAULT_TABLE):
+        """
+        Version of the stored results of an experiment, or of all experiments of a table, see ResultStore.version().
+        """
+        versions = []
+        for name in (self.experiments(table) if experiment is None else [experiment]):
+            version_file = os.path.join(self._experiment_dir(name, table), 'version')
+            if os.path.isfile(version_file):
+                with open(version_file) as f:
+                    versions.append((name, f.read()))
+        return tuple(versions)
+
+    def _write_version(self, experiment, table):
+        # a new random version per save(), so the versions of concurrent writers differ as well, the version file is
+        # replaced atomically
+        experiment_dir = self._experiment_dir(experiment, table)
+        version = uuid.uuid4().hex
+        with open(os.path.join(experiment_dir, 'version.' + version), 'w') as f:
+            f.write(version)
+        os.replace(os.path.join(experiment_dir, 'version.' + version), os.path.join(experiment_dir, 'version'))
+
+    def load(self, experiment=None, table=DEFAULT_TABLE, columns=None, runs=None):
+        '''
+        Definition:
+        Read results from a results table, ordered by experiment and run. Only the files of the requested experiments
+        and runs are opened and only the requested columns are converted.
+
+        Parameters:
+        experiment: name of the experiment to read, defaults to all experiments (with an 'experiment' column)
+        table: name of the results table
+        columns: metric columns to read, defaults to all columns
+        runs: monte carlo runs to read, defaults to all runs
+
+        Returns:
+        data frame of the results
+        '''
+        types = self.columns(table)
+        if not types:
+            raise ValueError(f"The results table {table} does not exist in {self.path}.")
+        if columns is None:
+            columns = [key for key in types if key != 'experiment' or experiment is None]
+        else:
+            missing_columns = [key for key in columns if key not in types]
+            if missing_columns:
+                raise ValueError(f"The columns {missing_columns} are not stored in the results table {table}.")
+            columns = list(columns)
+        file_columns = [key for key in columns if key != 'experiment']
+
+        experiments = self.experiments(table) if experiment is None else [experiment]
+        tables, experiment_names = [], []
+        for name in experiments:
+            for file in self._files(name, table, runs):
+                tables.append(self._read(file, file_columns))
+                experiment_names.extend([name] * tables[-1].num_rows)
+        if not tables:
+            return pd.DataFrame({key: _column_values((), types[key]) for key in columns}, columns=columns)
+
+        try:
+            arrow_table = self._pa.concat_tables(tables, promote_options='default')
+        except TypeError: # pyarrow < 14
+            arrow_table = self._pa.concat_tables(tables, promote=True)
+        data = arrow_table.to_pandas()
+        for key in file_columns:
+            if types[key] == 'JSON':
+                data[key] = _column_values(data[key].tolist(), 'JSON')
+        if 'experiment' in columns:
+            data['experiment'] = experiment_names
+        return data[columns]
+
+    def query(self, metrics, experiment=None, table=DEFAULT_TABLE, runs=None, timesteps=None, aggregate=None):
+        '''
+        Definition:
+        Read selected metrics of selected runs and timesteps, optionally aggregated over the runs per timestep.
+        Only the files of the requested runs and the requested columns are read, see ResultStore.query().
+        '''
+        types = self.columns(table)
+        if not types:
+            raise ValueError(f"The results table {table} does not exist in {self.path}.")
+        metrics, columns = _query_columns(metrics, types, table)
+        _aggregations(aggregate)
+        data = self.load(experiment=experiment, table=table, columns=columns, runs=runs)
+        return _query_frame(data, metrics, timesteps=timesteps, aggregate=aggregate)
+
+    def _column_type(self, arrow_type):
+        if self._pa.types.is_floating(arrow_type):
+            return 'REAL'
+        if self._pa.types.is_integer(arrow_type) or self._pa.types.is_boolean(arrow_type):
+            return 'INTEGER'
+        if self._pa.types.is_timestamp(arrow_type):
+            return 'TIMESTAMP'
+        return 'TEXT'
+
+
+def is_arrow_store(path):
+    """
+    True if a path refers to an Arrow result store, i.e. a directory or a path without file extension.
+    """
+    return os.path.isdir(path) or not os.path.splitext(path)[1]
+
+def open_result_store(path):
+    """
+    Result store of a path, an ArrowResultStore for a directory or a path without file extension, else a ResultStore
+    of the SQLite database.
+    """
+    if is_arrow_store(path):
+        return ArrowResultStore(path)
+    return ResultStore(path)
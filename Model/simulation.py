@@ -1,18 +1,7 @@
 # Dependences
-import pandas as pd
-import numpy as np
 import os
 import sys
-import traceback
 import time
-import streamlit as st
-import pandas as pd
-import sqlite3
-import json
-
-# radCAD
-from radcad import Model, Simulation, Experiment
-from radcad.engine import Engine, Backend
 
 
 # Project dependences
@@ -25,60 +14,52 @@ parent_dir = os.path.abspath(os.path.join(current_dir, os.pardir))
 # Append the parent directory to sys.path
 sys.path.append(parent_dir)
 
-from sys_params import *
-import state_variables
-import state_update_blocks
-import sys_params
-from parts.utils import *
-from plots import *
-from post_processing import *
+# only the model is imported here, the plots and the interface (streamlit, matplotlib) are never needed to simulate
+# and the sweep and result modules are imported on the first simulation, see benchmark_imports.py
+from sys_params import QTM_INPUTS
+from model import build_model
+from substep_compiler import compile_state_update_block
 
-import importlib
-importlib.reload(state_variables)
-importlib.reload(state_update_blocks)
-importlib.reload(sys_params)
+def simulation(inputs=QTM_INPUTS):
+    '''
+    Definition:
+    Simulate the QTM inputs and write the results into the interface database
 
-# Get the current directory
-current_dir = os.path.dirname(os.path.abspath(__file__))
+    Parameters:
+    inputs: path of the exported 'radCAD_inputs' CSV file or its data frame
+    '''
+    from sweep import run_sweep
+    from result_sinks import SQLiteSink
+    from result_store import ResultStore
+    from result_cache import ResultCache, result_key
 
-# Go two folders up
-parent_dir = os.path.abspath(os.path.join(current_dir, os.pardir))
+    start_time = time.time()
 
-def simulation():
-    start_time = time.process_time()
+    # parse the inputs into a new model, no module reloads are needed to switch between inputs
+    model = build_model(inputs)
 
     MONTE_CARLO_RUNS = 1
     TIMESTEPS = 12*10
 
-    model = Model(initial_state=state_variables.initial_state, params=sys_params.sys_param, state_update_blocks=state_update_blocks.state_update_block)
-    simulation = Simulation(model=model, timesteps=TIMESTEPS, runs=MONTE_CARLO_RUNS)
-
-    result = simulation.run()
-    df = pd.DataFrame(result)
-    simulation_end_time = time.process_time()
-
-     # post processing
-
-    postprocessing_one_start_time = time.process_time()
-    data = postprocessing(df, substep=df.substep.max()) # at the end of the timestep = last substep
-    postprocessing_all_end_time = time.process_time()
+    # only the end of each timestep is post processed, so all substeps are fused into one
+    state_update_block = compile_state_update_block(model.state_update_block)
+
+    # scenarios simulated before with the same inputs and model version are restored from the result cache
+    key = result_key(model.sys_param, TIMESTEPS, MONTE_CARLO_RUNS)
+    with ResultCache() as cache, ResultStore('interfaceData.db') as store:
+        data = cache.get(key)
+        if data is not None:
+            print("Restoring cached simulation results..")
+            store.save(data, table='simulation_data', experiment='default')
+        else:
+            # run all parameter subsets of the QTM inputs in parallel, post process them at the end of the timestep =
+            # last substep and stream the results chunk by chunk into the interface database
+            with SQLiteSink('interfaceData.db', table='simulation_data', experiment='default', if_exists='replace') as sink:
+                run_sweep(model.sys_param, model.initial_state, state_update_block,
+                          timesteps=TIMESTEPS, runs=MONTE_CARLO_RUNS, sink=sink)
+            cache.set(key, store.load(experiment='default', table='simulation_data'))
 
     # display necessery time data
-    print("Simulation time: ", simulation_end_time - start_time, " s")
-    print("Post processing one dataframe time: ", postprocessing_all_end_time - postprocessing_one_start_time, " s")
-    print("Post processing all dataframes time: ", postprocessing_all_end_time - simulation_end_time, " s")
-    print("Whole Test time: ", time.process_time() - start_time, " s")
-
-
-    # Apply the conversion function to each column in the DataFrame
-    for col in data.columns:
-        data[col] = data[col].apply(convert_to_json)
+    print("Simulation and post processing time: ", time.time() - start_time, " s")
 
-    conn = sqlite3.connect('interfaceData.db')
-    
-    # Save the DataFrame to a new SQLite table
-    data.to_sql('simulation_data', conn, if_exists='replace', index=False)
-    
-    # Close the connection
-    conn.close()
     return 0
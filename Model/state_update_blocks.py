@@ -239,3 +239,10 @@ state_update_block = [
         },
     }
 ]
+
+# substeps recorded by default: the end of each timestep = last substep
+record_substeps = [len(state_update_block)]
+
+# substeps after the liquidity pool transactions (16: adoption buy, 19: vesting sell, 20: liquidity addition, 21: buyback),
+# e.g. for record_substeps=lp_transaction_substeps+record_substeps to validate the liquidity pool
+lp_transaction_substeps = [16, 19, 20, 21]
@@ -1,33 +1,53 @@
 from sys_params import *
 from parts.utils import *
 
-# initialize the initial stakeholders
-initial_stakeholders = generate_agents(stakeholder_name_mapping)
 
-# initialize the initial liquidity pool
-initial_liquidity_pool = initialize_dex_liquidity()
+def compose_initial_state(sys_param, stakeholder_name_mapping):
+    """
+    Compose the initial state variables of a simulation with the given system parameters and agents.
+    """
+    # initialize the initial stakeholders
+    initial_stakeholders = generate_agents(stakeholder_name_mapping)
 
-# initialize the initial token economy
-initial_token_economy = generate_initial_token_economy_metrics()
+    # initialize the initial liquidity pool
+    initial_liquidity_pool = initialize_dex_liquidity()
 
-# initialize the initial user adoption
-initial_user_adoption = initialize_user_adoption()
+    # initialize the initial token economy
+    initial_token_economy = generate_initial_token_economy_metrics()
 
-# initialize the initial business assumptions
-business_assumptions = initialize_business_assumptions()
+    # initialize the initial user adoption
+    initial_user_adoption = initialize_user_adoption()
 
-# initialize the initial standard utilities
-utilities = initialize_utilities()
+    # initialize the initial business assumptions
+    business_assumptions = initialize_business_assumptions()
 
+    # initialize the initial standard utilities
+    utilities = initialize_utilities()
 
 
-# compose the initial state
-initial_state = {
-    'date': convert_date(sys_param),
-    'agents': initial_stakeholders,
-    'liquidity_pool': initial_liquidity_pool,
-    'token_economy': initial_token_economy,
-    'user_adoption': initial_user_adoption,
-    'business_assumptions': business_assumptions,
-    'utilities': utilities 
-}
+
+    # compose the initial state
+    initial_state = {
+        'date': convert_date(sys_param),
+        'agents': initial_stakeholders,
+        'liquidity_pool': initial_liquidity_pool,
+        'token_economy': initial_token_economy,
+        'user_adoption': initial_user_adoption,
+        'business_assumptions': business_assumptions,
+        'utilities': utilities
+    }
+
+    return initial_state
+
+
+def __getattr__(name):
+    """
+    Initial state of the default inputs (state_variables.initial_state), composed on first use. Use
+    model.build_model() for other inputs.
+    """
+    global initial_state
+    if name == 'initial_state':
+        import sys_params
+        initial_state = compose_initial_state(sys_params.sys_param, stakeholder_name_mapping)
+        return initial_state
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -0,0 +1,252 @@
+# Dependences
+import ast
+import inspect
+import pickle
+import textwrap
+from functools import reduce
+
+from executor import add_signals
+
+
+# Access Analysis
+def _subscript_key(node):
+    """
+    Constant string key of a subscript node, e.g. 'agents' for prev_state['agents'], else None.
+    """
+    key = node.slice
+    if isinstance(key, ast.Index): # Python < 3.9
+        key = key.value
+    if isinstance(key, ast.Constant) and isinstance(key.value, str):
+        return key.value
+    return None
+
+def _subscript_root(node):
+    """
+    Root name of nested subscripts and attributes, e.g. 'agents' for agents[agent]['a_tokens'].
+    """
+    while isinstance(node, (ast.Subscript, ast.Attribute)):
+        node = node.value
+    return node.id if isinstance(node, ast.Name) else None
+
+def analyse_function(function):
+    '''
+    Definition:
+    Static analysis of the state access of a policy or state update function with the radCAD signature
+    (params, substep, state_history, prev_state, ...).
+
+    Returns:
+    dictionary with
+    'reads': state keys read via prev_state['key']
+    'writes': state keys modified in place, i.e. prev_state['key'] (or a local name bound to it) is the target of
+              an item assignment or an update() call
+    'opaque': True if the state access can not be analysed, e.g. prev_state is passed on to another function or
+              the source code is not available
+    'uses_state_history': True if the function reads the state history
+    '''
+    access = {'reads': set(), 'writes': set(), 'opaque': False, 'uses_state_history': False}
+    try:
+        tree = ast.parse(textwrap.dedent(inspect.getsource(function)))
+    except (OSError, TypeError, SyntaxError):
+        access['opaque'] = True
+        return access
+
+    definition = tree.body[0]
+    if not isinstance(definition, (ast.FunctionDef, ast.AsyncFunctionDef)):
+        access['opaque'] = True
+        return access
+    arguments = [argument.arg for argument in definition.args.args]
+    if len(arguments) < 4:
+        access['opaque'] = True
+        return access
+    state_history_name, state_name = arguments[2], arguments[3]
+
+    # local names bound to state variables, e.g. agents = prev_state['agents'] or prev_state['agents'].copy()
+    aliases = {}
+    state_subscripts = set()
+    for node in ast.walk(definition):
+        if isinstance(node, ast.Subscript) and isinstance(node.value, ast.Name) and node.value.id == state_name:
+            key = _subscript_key(node)
+            if key is None:
+                access['opaque'] = True
+            else:
+                access['reads'].add(key)
+                state_subscripts.add(id(node.value))
+        if isinstance(node, ast.Assign) and len(node.targets) == 1 and isinstance(node.targets[0], ast.Name):
+            value = node.value
+            if (isinstance(value, ast.Call) and isinstance(value.func, ast.Attribute) and value.func.attr == 'copy'
+                    and not value.args):
+                value = value.func.value
+            if isinstance(value, ast.Subscript) and isinstance(value.value, ast.Name) and value.value.id == state_name:
+                key = _subscript_key(value)
+                if key is not None:
+                    aliases.setdefault(node.targets[0].id, set()).add(key)
+
+    # any other use of prev_state than prev_state['key'] can not be followed
+    for node in ast.walk(definition):
+        if isinstance(node, ast.Name) and node.id == state_name and id(node) not in state_subscripts:
+            access['opaque'] = True
+        if isinstance(node, ast.Name) and node.id == state_history_name:
+            access['uses_state_history'] = True
+
+    # in-place writes into state variables
+    def written_keys(target):
+        if not isinstance(target, ast.Subscript):
+            return set()
+        root = target.value
+        while isinstance(root, ast.Subscript):
+            if isinstance(root.value, ast.Name) and root.value.id == state_name:
+                return {_subscript_key(root)}
+            root = root.value
+        return aliases.get(_subscript_root(target), set())
+
+    for node in ast.walk(definition):
+        if isinstance(node, ast.Assign):
+            for target in node.targets:
+                access['writes'] |= written_keys(target)
+        elif isinstance(node, ast.AugAssign):
+            access['writes'] |= written_keys(node.target)
+        elif (isinstance(node, ast.Call) and isinstance(node.func, ast.Attribute) and node.func.attr == 'update'
+              and isinstance(node.func.value, (ast.Name, ast.Subscript))):
+            owner = node.func.value
+            if isinstance(owner, ast.Name):
+                access['writes'] |= aliases.get(owner.id, set())
+            else:
+                access['writes'] |= written_keys(owner) | ({_subscript_key(owner)} if isinstance(owner.value, ast.Name) and owner.value.id == state_name else set())
+
+    access['writes'].discard(None)
+    return access
+
+def analyse_substep(psu):
+    '''
+    Definition:
+    Aggregate the state access of all policies and state update functions of one partial state update block.
+
+    Returns:
+    dictionary with the read and written state keys and whether the substep can be fused with its neighbours
+    '''
+    reads, writes, fusable = set(), set(psu['variables'].keys()), True
+    for function in list(psu['policies'].values()) + list(psu['variables'].values()):
+        access = analyse_function(function)
+        reads |= access['reads']
+        writes |= access['writes']
+        if access['opaque'] or access['uses_state_history']:
+            fusable = False
+    return {'reads': reads, 'writes': writes, 'fusable': fusable}
+
+
+# Substep Fusion
+def fuse_substeps(psus, substeps, writes):
+    '''
+    Definition:
+    Fuse sequential partial state update blocks into one block. Its single policy runs the original policies and
+    state update functions in order on a private copy of the written state variables and its state update
+    functions hand the results over to radCAD (or the in-place executor).
+
+    Parameters:
+    psus: partial state update blocks to fuse
+    substeps: original (1-based) substep numbers of the blocks
+    writes: state keys written by the blocks
+    '''
+    written_keys = [key for psu in psus for key in psu['variables']]
+    written_keys = list(dict.fromkeys(written_keys + sorted(writes - set(written_keys))))
+
+    def fused_policy(params, substep, state_history, prev_state, **kwargs):
+        # copy only the written state variables, read-only state views are unpickled as plain copies
+        state = {key: prev_state[key] for key in prev_state}
+        for key in written_keys:
+            state[key] = pickle.loads(pickle.dumps(prev_state[key], -1))
+
+        for original_substep, psu in zip(substeps, psus):
+            policy_signals = [policy(params, original_substep - 1, state_history, state) for policy in psu['policies'].values()]
+            signals = reduce(add_signals, policy_signals, {}) if len(policy_signals) != 1 else policy_signals[0]
+            updates = []
+            for key, function in psu['variables'].items():
+                state_key, value = function(params, original_substep - 1, state_history, state, signals)
+                if state_key != key:
+                    raise KeyError(f"PSU state key {key} doesn't match function state key {state_key}")
+                updates.append((key, value))
+            state.update(updates)
+
+            # substep and timestep as radCAD would record them after the original substep
+            if original_substep == 1:
+                state['timestep'] = state['timestep'] + 1
+            state['substep'] = original_substep
+
+        return {key: state[key] for key in written_keys}
+
+    def state_update(key):
+        def update_fused_state(params, substep, state_history, prev_state, policy_input, **kwargs):
+            return (key, policy_input[key])
+        update_fused_state.__name__ = f'update_fused_{key}'
+        return update_fused_state
+
+    fused_policy.__name__ = f'fused_substeps_{substeps[0]}_{substeps[-1]}'
+    return {
+        'policies': {fused_policy.__name__: fused_policy},
+        'variables': {key: state_update(key) for key in written_keys},
+        'substeps': list(substeps),
+    }
+
+def compile_state_update_block(state_update_block, keep_boundaries=None):
+    '''
+    Definition:
+    Compile the state update block by fusing adjacent substeps into as few partial state update blocks as possible.
+    Every fused block records a single row per timestep instead of one row per original substep.
+
+    Substeps whose state access can not be analysed or that read the state history are not fused.
+
+    Parameters:
+    state_update_block: list of radCAD partial state update blocks
+    keep_boundaries: original (1-based) substep numbers after which a block boundary and therefore a recorded row
+                     is kept, e.g. [16, 19, 20, 21] to debug the liquidity pool transactions
+
+    Returns:
+    compiled state update block, each block lists its original substep numbers under the key 'substeps'
+    '''
+    keep_boundaries = set(keep_boundaries or [])
+    for boundary in keep_boundaries:
+        if not 1 <= boundary <= len(state_update_block):
+            raise ValueError(f"Boundary {boundary} is not a substep of the state update block with {len(state_update_block)} substeps.")
+
+    compiled_block = []
+    group, group_substeps, group_writes = [], [], set()
+
+    def close_group():
+        if len(group) == 1:
+            compiled_block.append(dict(group[0], substeps=list(group_substeps)))
+        elif group:
+            compiled_block.append(fuse_substeps(list(group), list(group_substeps), set(group_writes)))
+        group.clear()
+        group_substeps.clear()
+        group_writes.clear()
+
+    for substep, psu in enumerate(state_update_block, start=1):
+        access = analyse_substep(psu)
+        if not access['fusable']:
+            # keep the substep as its own block
+            close_group()
+            group.append(psu)
+            group_substeps.append(substep)
+            close_group()
+            continue
+
+        group.append(psu)
+        group_substeps.append(substep)
+        group_writes.update(access['writes'])
+        if substep in keep_boundaries:
+            close_group()
+    close_group()
+
+    return compiled_block
+
+def relabel_substeps(df, compiled_block):
+    '''
+    Definition:
+    Replace the substep numbers of a simulation data frame of a compiled state update block by the last original
+    substep of each block, so that e.g. postprocessing(df, substep=16) works as with the original block.
+    '''
+    substep_map = {0: 0}
+    substep_map.update({index: block.get('substeps', [index])[-1] for index, block in enumerate(compiled_block, start=1)})
+    df = df.copy()
+    df['substep'] = df['substep'].map(substep_map)
+    return df
@@ -0,0 +1,155 @@
+# Dependences
+import os
+import itertools
+import pandas as pd
+
+# radCAD
+from radcad import Model, Simulation, Experiment
+from radcad.engine import Engine, Backend
+from radcad.core import generate_parameter_sweep
+
+# Project dependences
+from post_processing import postprocessing
+from vectorized_simulation import vectorized_simulation, N_SUBSTEPS
+
+# simulation engines of the sweep runner, see run_sweep
+ENGINES = ['radcad', 'vectorized']
+
+
+# Helper Functions
+def available_processes(processes=None):
+    """
+    Number of worker processes for a sweep, capped to the available CPU cores.
+    """
+    cpu_count = os.cpu_count() or 1
+    if processes is None:
+        processes = cpu_count - 1 or 1
+    return max(1, min(int(processes), cpu_count))
+
+def cartesian_sweep(sys_param, sweep):
+    """
+    Expand the system parameters to the cartesian product of the given parameter values.
+
+    radCAD zips all parameter lists of a simulation into parameter subsets. This function combines every existing
+    parameter subset of sys_param with every combination of the values in sweep, e.g.
+    cartesian_sweep(sys_param, {'avg_token_selling_allocation': [0.1, 0.2], 'lock_apr': [0.05, 0.1, 0.15]})
+    results in 6 parameter subsets. Note that parameters which are derived from swept parameters in sys_params.py
+    are not recomputed.
+    """
+    for key, values in sweep.items():
+        if key not in sys_param:
+            raise ValueError(f"Sweep parameter {key} is not part of the system parameters.")
+        if len(values) == 0:
+            raise ValueError(f"Sweep parameter {key} has no values.")
+
+    keys = list(sweep.keys())
+    param_sets = [dict(param_set, **dict(zip(keys, values)))
+                  for param_set in generate_parameter_sweep(sys_param)
+                  for values in itertools.product(*[sweep[key] for key in keys])]
+
+    return {key: [param_set[key] for param_set in param_sets] for key in param_sets[0]}
+
+def sweep_chunks(sys_param, chunk_size):
+    """
+    Split the parameter subsets of sys_param into chunks of at most chunk_size subsets.
+    Yields the index of the first subset of each chunk and the chunk system parameters.
+    """
+    param_sets = generate_parameter_sweep(sys_param)
+    for start in range(0, len(param_sets), chunk_size):
+        chunk = param_sets[start:start+chunk_size]
+        yield start, {key: [param_set[key] for param_set in chunk] for key in chunk[0]}
+
+
+def run_chunks(sys_param, runs, chunk_size):
+    """
+    Split the monte carlo runs of all parameter subsets of sys_param into chunks of at most chunk_size runs. Chunks
+    hold all runs of one or more subsets, or a range of the runs of a single subset if it has more than chunk_size runs.
+    Yields the index of the first subset and the number of runs before the first run of each chunk, the chunk system
+    parameters and the number of runs per subset of the chunk.
+    """
+    if runs <= chunk_size:
+        for first_subset, chunk_param in sweep_chunks(sys_param, chunk_size // runs):
+            yield first_subset, 0, chunk_param, runs
+    else:
+        for first_subset, subset_param in sweep_chunks(sys_param, 1):
+            for first_run in range(0, runs, chunk_size):
+                yield first_subset, first_run, subset_param, min(chunk_size, runs - first_run)
+
+
+# Sweep Runner
+def run_sweep(sys_param, initial_state, state_update_block, timesteps, runs=1, processes=None, backend=Backend.PATHOS,
+              chunk_size=None, substep=None, on_chunk=None, sink=None, engine='radcad'):
+    '''
+    Definition:
+    Run all parameter subsets of sys_param as radCAD experiments on a process pool (or with the vectorized engine),
+    chunk by chunk. Each chunk is post processed right after its simulation, so only one chunk of raw simulation
+    results is held in memory. Chunks are split over the parameter subsets and their monte carlo runs (see
+    run_chunks), so with a sink the memory is bounded by the chunk size, no matter how many runs are simulated.
+
+    Parameters:
+    sys_param: system parameters, lists of parameter values as in sys_params.py (see also cartesian_sweep)
+    initial_state: initial state variables
+    state_update_block: the QTM state update block
+    timesteps: number of simulated timesteps
+    runs: number of monte carlo runs per parameter subset
+    processes: number of worker processes, capped to the available CPU cores
+    backend: radCAD execution backend
+    chunk_size: number of simulated runs (parameter subsets times monte carlo runs) per chunk, defaults to 4 runs
+    per worker process
+    substep: substep to extract in the post processing, defaults to the last substep of each timestep
+    on_chunk: optional callback(first_subset, chunk_data) called after each chunk has been post processed
+    sink: optional ResultSink (see result_sinks.py) the post processed chunks are written to instead of being collected
+    engine: 'radcad' to run the chunks as radCAD experiments, or 'vectorized' to simulate them with the vectorized
+            engine in this process (see vectorized_simulation.py), which composes the initial state from the parameters
+            itself and only takes the stakeholders from the agents of initial_state, processes and backend are ignored
+
+    Returns:
+    post processed data frame of all parameter subsets with an additional 'subset' column, or the flushed sink
+    '''
+    if engine not in ENGINES:
+        raise ValueError(f"Unknown simulation engine '{engine}', use one of {ENGINES}.")
+    processes = available_processes(processes)
+    if chunk_size is None:
+        chunk_size = processes * 4
+    if chunk_size < 1:
+        raise ValueError(f"The chunk size has to be positive, not {chunk_size}.")
+
+    frames = []
+    for first_subset, first_run, chunk_param, chunk_runs in run_chunks(sys_param, runs, chunk_size):
+        if engine == 'vectorized':
+            agents = initial_state['agents']
+            stakeholder_name_mapping = dict(zip(agents.objects['a_name'], agents.objects['a_type']))
+            chunk_substep = N_SUBSTEPS if substep is None else substep
+            data = vectorized_simulation(chunk_param, stakeholder_name_mapping, timesteps, runs=chunk_runs, substeps=[chunk_substep],
+                                         action_dicts=True)[chunk_substep]
+            data['subset'] += first_subset
+            data['run'] += first_run
+        else:
+            n_subsets = len(next(iter(chunk_param.values())))
+            chunk_processes = min(processes, n_subsets * chunk_runs)
+
+            model = Model(initial_state=initial_state, params=chunk_param, state_update_blocks=state_update_block)
+            experiment = Experiment([Simulation(model=model, timesteps=timesteps, runs=chunk_runs)])
+            experiment.engine = Engine(backend=backend if chunk_processes > 1 else Backend.SINGLE_PROCESS,
+                                       processes=chunk_processes,
+                                       drop_substeps=substep is None)
+
+            df = pd.DataFrame(experiment.run())
+            df['subset'] += first_subset
+            df['run'] += first_run
+
+            data = postprocessing(df, substep=df.substep.max() if substep is None else substep)
+            data['subset'] = df.loc[data.index, 'subset']
+            del df
+
+        if on_chunk is not None:
+            on_chunk(first_subset, data)
+        if sink is not None:
+            sink.write(data)
+        else:
+            frames.append(data)
+
+    if sink is not None:
+        sink.flush()
+        return sink
+    return pd.concat(frames, ignore_index=True)
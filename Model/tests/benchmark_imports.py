@@ -0,0 +1,73 @@
+# Dependences
+import os
+import subprocess
+import sys
+
+# Get the current directory
+current_dir = os.path.dirname(os.path.abspath(__file__))
+
+# Go up one folder = Model directory
+model_dir = os.path.abspath(os.path.join(current_dir, os.pardir))
+
+# modules imported by simulation workers and headless runs, none of them may load the interface or the plots
+HEADLESS_MODULES = ['simulation', 'model', 'executor', 'state_update_blocks', 'checkpoints']
+
+# modules that are only loaded once they are needed, i.e. by the interface, the plots or when results are processed
+LAZY_MODULES = ['streamlit', 'matplotlib', 'pandas']
+
+# import time target of every headless module in a fresh interpreter
+IMPORT_TIME_TARGET_MS = 300
+
+# number of fresh interpreters per module, the fastest import counts
+REPEATS = 5
+
+_IMPORT_SCRIPT = '''
+import sys, time
+start = time.perf_counter()
+import {module}
+print((time.perf_counter() - start) * 1000)
+print(",".join(sorted(name for name in {lazy_modules!r} if name in sys.modules)))
+'''
+
+
+def import_time(module, repeats=REPEATS):
+    '''
+    Definition:
+    Import a module in fresh Python interpreters, as a worker process does on startup.
+
+    Parameters:
+    module: name of the module within the Model directory
+    repeats: number of fresh interpreters
+
+    Returns:
+    fastest import time in ms, list of the LAZY_MODULES loaded by the import
+    '''
+    times = []
+    for _ in range(repeats):
+        output = subprocess.run([sys.executable, '-c', _IMPORT_SCRIPT.format(module=module, lazy_modules=LAZY_MODULES)],
+                                cwd=model_dir, capture_output=True, text=True, check=True).stdout.splitlines()
+        times.append(float(output[0]))
+    return min(times), [name for name in output[1].split(',') if name]
+
+def benchmark_imports(modules=HEADLESS_MODULES, target=IMPORT_TIME_TARGET_MS, repeats=REPEATS):
+    """
+    Print the import time of every module and return True if all modules stay below the target and load none of the
+    LAZY_MODULES.
+    """
+    passed = True
+    for module in modules:
+        milliseconds, loaded = import_time(module, repeats)
+        ok = milliseconds <= target and not loaded
+        passed &= ok
+        print(("("+u'✓'+") " if ok else "(x) ")+module+": "+str(round(milliseconds))+" ms"
+              +(" (target "+str(target)+" ms)" if milliseconds > target else "")
+              +(", loads "+", ".join(loaded) if loaded else ""))
+    return passed
+
+
+if __name__ == '__main__':
+    print("\n-------------------------------------## BENCHMARK IMPORTS ##---------------------------------------")
+    if not benchmark_imports():
+        print("Import time benchmark failed!")
+        sys.exit(1)
+    print(u'✓'+" Import time benchmark passed!")
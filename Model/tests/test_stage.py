@@ -3,12 +3,14 @@ import pandas as pd
 import numpy as np
 import os
 import sys
-import traceback
+import functools
 import time
+import tempfile
+import pytest
 
 # radCAD
-from radcad import Model, Simulation, Experiment
-from radcad.engine import Engine, Backend
+from radcad import Model, Simulation
+from radcad.core import generate_parameter_sweep
 
 
 # Project dependences
@@ -21,13 +23,13 @@ parent_dir = os.path.abspath(os.path.join(current_dir, os.pardir))
 # Append the parent directory to sys.path
 sys.path.append(parent_dir)
 
-from sys_params import *
 import state_variables
 import state_update_blocks
 import sys_params
-from parts.utils import *
-from plots import *
-from post_processing import *
+from sys_params import stakeholder_names, stakeholder_name_mapping, parse_inputs
+# imported under another name, so test runners do not collect it as a test
+from parts.utils import test_timeseries as check_timeseries, InputsError
+from post_processing import postprocessing, postprocessing_substeps, flatten_records
 
 import importlib
 importlib.reload(state_variables)
@@ -40,43 +42,80 @@ current_dir = os.path.dirname(os.path.abspath(__file__))
 # Go two folders up
 parent_dir = os.path.abspath(os.path.join(os.path.abspath(os.path.join(current_dir, os.pardir)), os.pardir))
 
-QTM_data_tables = pd.read_csv(parent_dir+'/data/Quantitative_Token_Model_V1.89_radCad_integration - Data Tables.csv')
+QTM_data_tables = pd.read_csv(parent_dir+'/data/Quantitative_Token_Model_V1.89_radCAD_integration - Data Tables.csv')
 
-if __name__ == '__main__'   :
-    start_time = time.process_time()
-
-    MONTE_CARLO_RUNS = 1
-    TIMESTEPS = 12*10
+MONTE_CARLO_RUNS = 1
+TIMESTEPS = 12*10
 
-    model = Model(initial_state=state_variables.initial_state, params=sys_params.sys_param, state_update_blocks=state_update_blocks.state_update_block)
-    simulation = Simulation(model=model, timesteps=TIMESTEPS, runs=MONTE_CARLO_RUNS)
+# substeps compared against the QTM data tables: after the liquidity pool transactions and at the end of the timestep
+LAST_SUBSTEP = state_update_blocks.record_substeps[-1]
+TESTED_SUBSTEPS = state_update_blocks.lp_transaction_substeps + [LAST_SUBSTEP]
 
-    result = simulation.run()
-    df = pd.DataFrame(result)
-    simulation_end_time = time.process_time()
-
-    # post processing
-    data_tx1 = postprocessing(df, substep=16) # after adoption buy lp tx
-    data_tx2 = postprocessing(df, substep=19) # after vesting sell lp tx
-    data_tx3 = postprocessing(df, substep=20) # after liquidity addition lp tx
-    data_tx4 = postprocessing(df, substep=21) # after buyback lp tx
-    postprocessing_one_start_time = time.process_time()
-    data = postprocessing(df, substep=df.substep.max()) # at the end of the timestep = last substep
-    postprocessing_all_end_time = time.process_time()
 
+# Reference Simulations
+@functools.lru_cache(maxsize=None)
+def radCAD_substep_data():
+    """
+    radCAD simulation of the default inputs post processed at the TESTED_SUBSTEPS, run once for all tests.
+    """
+    model = Model(initial_state=state_variables.initial_state, params=sys_params.sys_param, state_update_blocks=state_update_blocks.state_update_block)
+    df = pd.DataFrame(Simulation(model=model, timesteps=TIMESTEPS, runs=MONTE_CARLO_RUNS).run())
+    return postprocessing_substeps(df, substeps=TESTED_SUBSTEPS)
+
+@functools.lru_cache(maxsize=None)
+def in_place_sink_data():
+    """
+    Results of the in-place executor streamed into a ListSink (initial state and last substep), run once for all tests.
+    """
+    from executor import simulation_in_place
+    from result_sinks import ListSink
+
+    sink = ListSink(batch_size=50)
+    assert simulation_in_place(state_variables.initial_state, state_update_blocks.state_update_block, sys_params.sys_param, TIMESTEPS,
+                               runs=MONTE_CARLO_RUNS, sink=sink) == [], "The in-place executor kept records despite the result sink."
+    return sink.data
+
+def assert_result_versions(store, data):
+    """
+    Check that the version of an experiment in a result store changes whenever it is written, but not when other
+    experiments are written.
+    """
+    version = store.version('in_place')
+    assert version and store.version() == version, "The result store has no version of the stored experiment."
+    store.save(data.head(10), experiment='other')
+    assert store.version('in_place') == version and len(store.version()) == 2, "Writing another experiment changed the version of the experiment."
+    store.save(data, experiment='in_place')
+    assert store.version('in_place') not in (version, ()), "Rewriting the experiment did not change its version."
+    store.delete('in_place')
+    assert store.version('in_place') != version, "Deleting the experiment did not change its version."
+
+def assert_substep_data_equal(substep_data, engine, substeps=TESTED_SUBSTEPS):
+    """
+    Compare the numeric columns of post processed substep data with the radCAD simulation.
+    """
+    for substep in substeps:
+        radCAD_data = radCAD_substep_data()[substep]
+        for key in radCAD_data.columns:
+            if radCAD_data[key].dtype.kind in 'if':
+                np.testing.assert_allclose(substep_data[substep][key].values.astype(float), radCAD_data[key].values.astype(float), rtol=0.003, atol=0.001,
+                                           err_msg=engine+" value "+key+" at substep "+str(substep)+" is not equal to the radCAD simulation value.")
+
+
+# Tests
+def test_qtm_data_tables():
+    substep_data = radCAD_substep_data()
+    data_tx1 = substep_data[16] # after adoption buy lp tx
+    data_tx2 = substep_data[19] # after vesting sell lp tx
+    data_tx3 = substep_data[20] # after liquidity addition lp tx
+    data_tx4 = substep_data[21] # after buyback lp tx
+    data = substep_data[LAST_SUBSTEP] # at the end of the timestep = last substep
 
-    ### BEGIN TESTS ###
-    print("\n-------------------------------------------------------------------------------------------------------")
-    print("\n-------------------------------------------## BEGIN TESTS ##-------------------------------------------")
-    print("\n-------------------------------------------------------------------------------------------------------")
-    print("\n")
-    
     ### MODEL ###
     ## TEST ADOPTION ##
     print("\n-------------------------------------------## TEST ADOPTION ##-----------------------------------------")
     print("Testing adoption of radCad timeseries simulation against QTM data tables...")
-    test_timeseries(data=data, data_key='ua_product_users', data_row_multiplier=1, QTM_data_tables=QTM_data_tables, QTM_row=7, relative_tolerance=0.003)
-    test_timeseries(data=data, data_key='ua_token_holders', data_row_multiplier=1, QTM_data_tables=QTM_data_tables, QTM_row=8, relative_tolerance=0.003)
+    check_timeseries(data=data, data_key='ua_product_users', data_row_multiplier=1, QTM_data_tables=QTM_data_tables, QTM_row=7, relative_tolerance=0.003)
+    check_timeseries(data=data, data_key='ua_token_holders', data_row_multiplier=1, QTM_data_tables=QTM_data_tables, QTM_row=8, relative_tolerance=0.003)
 
     
     ## TEST AGENT VESTING VALUES ##
@@ -84,37 +123,37 @@ if __name__ == '__main__'   :
     print("Testing individual vesting values of radCad timeseries simulation against QTM data tables...")
     for i in range(len(stakeholder_names)-3):
         stakeholder = stakeholder_names[i]
-        test_timeseries(data=data, data_key=stakeholder+"_a_tokens_vested", data_row_multiplier=1, QTM_data_tables=QTM_data_tables, QTM_row=11+i, relative_tolerance=0.003)
+        check_timeseries(data=data, data_key=stakeholder+"_a_tokens_vested", data_row_multiplier=1, QTM_data_tables=QTM_data_tables, QTM_row=11+i, relative_tolerance=0.003)
     
     print("Testing cumulative vesting values of radCad timeseries simulation against QTM data tables...")
     for i in range(len(stakeholder_names)-3):
         stakeholder = stakeholder_names[i]
-        test_timeseries(data=data, data_key=stakeholder+"_a_tokens_vested_cum", data_row_multiplier=1, QTM_data_tables=QTM_data_tables, QTM_row=28+i, relative_tolerance=0.003)
+        check_timeseries(data=data, data_key=stakeholder+"_a_tokens_vested_cum", data_row_multiplier=1, QTM_data_tables=QTM_data_tables, QTM_row=28+i, relative_tolerance=0.003)
 
     
     ## TEST FREE SUPPLY USAGE ##
     print("\n--------------------------------------## TEST FREE SUPPLY USAGE ##-------------------------------------")
     print("Testing free supply usage of radCad timeseries simulation against QTM data tables...")
-    test_timeseries(data=data, data_key='te_selling_perc', data_row_multiplier=100, QTM_data_tables=QTM_data_tables, QTM_row=45, relative_tolerance=0.003)
-    test_timeseries(data=data, data_key='te_utility_perc', data_row_multiplier=100, QTM_data_tables=QTM_data_tables, QTM_row=46, relative_tolerance=0.003)
-    test_timeseries(data=data, data_key='te_holding_perc', data_row_multiplier=100, QTM_data_tables=QTM_data_tables, QTM_row=47, relative_tolerance=0.003)
+    check_timeseries(data=data, data_key='te_selling_perc', data_row_multiplier=100, QTM_data_tables=QTM_data_tables, QTM_row=45, relative_tolerance=0.003)
+    check_timeseries(data=data, data_key='te_utility_perc', data_row_multiplier=100, QTM_data_tables=QTM_data_tables, QTM_row=46, relative_tolerance=0.003)
+    check_timeseries(data=data, data_key='te_holding_perc', data_row_multiplier=100, QTM_data_tables=QTM_data_tables, QTM_row=47, relative_tolerance=0.003)
 
 
     ## TEST INCENTIVISATION ##
     print("\n---------------------------------------## TEST INCENTIVISATION ##--------------------------------------")
     print("Testing incentivisation of radCad timeseries simulation against QTM data tables...")
-    test_timeseries(data=data, data_key='te_minted_tokens', data_row_multiplier=1, QTM_data_tables=QTM_data_tables, QTM_row=50, relative_tolerance=0.003)
-    test_timeseries(data=data, data_key='te_incentivised_tokens', data_row_multiplier=1, QTM_data_tables=QTM_data_tables, QTM_row=51, relative_tolerance=0.003)
-    test_timeseries(data=data, data_key='te_incentivised_tokens_cum', data_row_multiplier=1, QTM_data_tables=QTM_data_tables, QTM_row=52, relative_tolerance=0.003)
-    test_timeseries(data=data, data_key='te_incentivised_tokens_usd', data_row_multiplier=1, QTM_data_tables=QTM_data_tables, QTM_row=54, relative_tolerance=0.004)
+    check_timeseries(data=data, data_key='te_minted_tokens', data_row_multiplier=1, QTM_data_tables=QTM_data_tables, QTM_row=50, relative_tolerance=0.003)
+    check_timeseries(data=data, data_key='te_incentivised_tokens', data_row_multiplier=1, QTM_data_tables=QTM_data_tables, QTM_row=51, relative_tolerance=0.003)
+    check_timeseries(data=data, data_key='te_incentivised_tokens_cum', data_row_multiplier=1, QTM_data_tables=QTM_data_tables, QTM_row=52, relative_tolerance=0.003)
+    check_timeseries(data=data, data_key='te_incentivised_tokens_usd', data_row_multiplier=1, QTM_data_tables=QTM_data_tables, QTM_row=54, relative_tolerance=0.004)
 
 
     ## TEST AIRDROPS ##
     print("\n------------------------------------------## TEST AIRDROPS ##------------------------------------------")
     print("Testing airdrops of radCad timeseries simulation against QTM data tables...")
-    test_timeseries(data=data, data_key='te_airdrop_tokens', data_row_multiplier=1, QTM_data_tables=QTM_data_tables, QTM_row=57, relative_tolerance=0.003)
-    test_timeseries(data=data, data_key='te_airdrop_tokens_cum', data_row_multiplier=1, QTM_data_tables=QTM_data_tables, QTM_row=59, relative_tolerance=0.003)
-    test_timeseries(data=data, data_key='te_airdrop_tokens_usd', data_row_multiplier=1, QTM_data_tables=QTM_data_tables, QTM_row=61, relative_tolerance=0.003)
+    check_timeseries(data=data, data_key='te_airdrop_tokens', data_row_multiplier=1, QTM_data_tables=QTM_data_tables, QTM_row=57, relative_tolerance=0.003)
+    check_timeseries(data=data, data_key='te_airdrop_tokens_cum', data_row_multiplier=1, QTM_data_tables=QTM_data_tables, QTM_row=59, relative_tolerance=0.003)
+    check_timeseries(data=data, data_key='te_airdrop_tokens_usd', data_row_multiplier=1, QTM_data_tables=QTM_data_tables, QTM_row=61, relative_tolerance=0.003)
 
 
     ## TEST AGENT META BUCKET ALLOCATIONS ##
@@ -122,140 +161,651 @@ if __name__ == '__main__'   :
     print("Testing individual agent meta bucket allocations of radCad timeseries simulation against QTM data tables...")
     for i in range(len(stakeholder_names)-8):
         stakeholder = stakeholder_names[i]
-        test_timeseries(data=data, data_key=stakeholder+"_a_selling_tokens", data_row_multiplier=1, QTM_data_tables=QTM_data_tables, QTM_row=64+i, relative_tolerance=0.003)
-        test_timeseries(data=data, data_key=stakeholder+"_a_utility_tokens", data_row_multiplier=1, QTM_data_tables=QTM_data_tables, QTM_row=77+i, relative_tolerance=0.003)
-        test_timeseries(data=data, data_key=stakeholder+"_a_holding_tokens", data_row_multiplier=1, QTM_data_tables=QTM_data_tables, QTM_row=90+i, relative_tolerance=0.003)
+        check_timeseries(data=data, data_key=stakeholder+"_a_selling_tokens", data_row_multiplier=1, QTM_data_tables=QTM_data_tables, QTM_row=64+i, relative_tolerance=0.003)
+        check_timeseries(data=data, data_key=stakeholder+"_a_utility_tokens", data_row_multiplier=1, QTM_data_tables=QTM_data_tables, QTM_row=77+i, relative_tolerance=0.003)
+        check_timeseries(data=data, data_key=stakeholder+"_a_holding_tokens", data_row_multiplier=1, QTM_data_tables=QTM_data_tables, QTM_row=90+i, relative_tolerance=0.003)
 
 
     ## TEST META BUCKET ALLOCATION SUMS ##
     print("\n---------------------------------## TEST META BUCKET ALLOCATION SUMS ##---------------------------------")
     print("Testing meta bucket allocation sums of radCad timeseries simulation against QTM data tables...")
-    test_timeseries(data=data, data_key='te_selling_allocation', data_row_multiplier=1, QTM_data_tables=QTM_data_tables, QTM_row=74, relative_tolerance=0.003)
-    test_timeseries(data=data, data_key='te_selling_allocation_cum', data_row_multiplier=1, QTM_data_tables=QTM_data_tables, QTM_row=75, relative_tolerance=0.003)
-    test_timeseries(data=data, data_key='te_utility_allocation', data_row_multiplier=1, QTM_data_tables=QTM_data_tables, QTM_row=87, relative_tolerance=0.003)
-    test_timeseries(data=data, data_key='te_utility_allocation_cum', data_row_multiplier=1, QTM_data_tables=QTM_data_tables, QTM_row=88, relative_tolerance=0.003)
-    test_timeseries(data=data, data_key='te_holding_allocation', data_row_multiplier=1, QTM_data_tables=QTM_data_tables, QTM_row=100, relative_tolerance=0.003)
-    test_timeseries(data=data, data_key='te_holding_allocation_cum', data_row_multiplier=1, QTM_data_tables=QTM_data_tables, QTM_row=101, relative_tolerance=0.003)
+    check_timeseries(data=data, data_key='te_selling_allocation', data_row_multiplier=1, QTM_data_tables=QTM_data_tables, QTM_row=74, relative_tolerance=0.003)
+    check_timeseries(data=data, data_key='te_selling_allocation_cum', data_row_multiplier=1, QTM_data_tables=QTM_data_tables, QTM_row=75, relative_tolerance=0.003)
+    check_timeseries(data=data, data_key='te_utility_allocation', data_row_multiplier=1, QTM_data_tables=QTM_data_tables, QTM_row=87, relative_tolerance=0.003)
+    check_timeseries(data=data, data_key='te_utility_allocation_cum', data_row_multiplier=1, QTM_data_tables=QTM_data_tables, QTM_row=88, relative_tolerance=0.003)
+    check_timeseries(data=data, data_key='te_holding_allocation', data_row_multiplier=1, QTM_data_tables=QTM_data_tables, QTM_row=100, relative_tolerance=0.003)
+    check_timeseries(data=data, data_key='te_holding_allocation_cum', data_row_multiplier=1, QTM_data_tables=QTM_data_tables, QTM_row=101, relative_tolerance=0.003)
 
     
     ## TEST META UTILITY SHARE ALLOCATIONS ##
     print("\n--------------------------------## TEST META UTILITY SHARE ALLOCATIONS ##-------------------------------")
     print("Testing meta utility share allocations of radCad timeseries simulation against QTM data tables...")
     # staking: apr
-    test_timeseries(data=data, data_key='u_staking_base_apr_allocation', data_row_multiplier=1, QTM_data_tables=QTM_data_tables, QTM_row=103, relative_tolerance=0.003)
-    test_timeseries(data=data, data_key='u_staking_base_apr_allocation_cum', data_row_multiplier=1, QTM_data_tables=QTM_data_tables, QTM_row=110, relative_tolerance=0.003)
-    test_timeseries(data=data, data_key='u_staking_base_apr_rewards', data_row_multiplier=1, QTM_data_tables=QTM_data_tables, QTM_row=162, relative_tolerance=0.003)
+    check_timeseries(data=data, data_key='u_staking_base_apr_allocation', data_row_multiplier=1, QTM_data_tables=QTM_data_tables, QTM_row=103, relative_tolerance=0.003)
+    check_timeseries(data=data, data_key='u_staking_base_apr_allocation_cum', data_row_multiplier=1, QTM_data_tables=QTM_data_tables, QTM_row=110, relative_tolerance=0.003)
+    check_timeseries(data=data, data_key='u_staking_base_apr_rewards', data_row_multiplier=1, QTM_data_tables=QTM_data_tables, QTM_row=162, relative_tolerance=0.003)
     
     # staking: revenue share
-    test_timeseries(data=data, data_key='u_staking_revenue_share_allocation', data_row_multiplier=1, QTM_data_tables=QTM_data_tables, QTM_row=104, relative_tolerance=0.003)
-    test_timeseries(data=data, data_key='u_staking_revenue_share_allocation_cum', data_row_multiplier=1, QTM_data_tables=QTM_data_tables, QTM_row=111, relative_tolerance=0.003)
-    test_timeseries(data=data, data_key='u_staking_revenue_share_rewards', data_row_multiplier=1, QTM_data_tables=QTM_data_tables, QTM_row=163, relative_tolerance=0.003)
+    check_timeseries(data=data, data_key='u_staking_revenue_share_allocation', data_row_multiplier=1, QTM_data_tables=QTM_data_tables, QTM_row=104, relative_tolerance=0.003)
+    check_timeseries(data=data, data_key='u_staking_revenue_share_allocation_cum', data_row_multiplier=1, QTM_data_tables=QTM_data_tables, QTM_row=111, relative_tolerance=0.003)
+    check_timeseries(data=data, data_key='u_staking_revenue_share_rewards', data_row_multiplier=1, QTM_data_tables=QTM_data_tables, QTM_row=163, relative_tolerance=0.003)
 
     # staking: vesting schedule
-    test_timeseries(data=data, data_key='u_staking_vesting_allocation', data_row_multiplier=1, QTM_data_tables=QTM_data_tables, QTM_row=105, relative_tolerance=0.003)
-    test_timeseries(data=data, data_key='u_staking_vesting_allocation_cum', data_row_multiplier=1, QTM_data_tables=QTM_data_tables, QTM_row=112, relative_tolerance=0.003)
-    test_timeseries(data=data, data_key='u_staking_vesting_rewards', data_row_multiplier=1, QTM_data_tables=QTM_data_tables, QTM_row=164, relative_tolerance=0.003)
+    check_timeseries(data=data, data_key='u_staking_vesting_allocation', data_row_multiplier=1, QTM_data_tables=QTM_data_tables, QTM_row=105, relative_tolerance=0.003)
+    check_timeseries(data=data, data_key='u_staking_vesting_allocation_cum', data_row_multiplier=1, QTM_data_tables=QTM_data_tables, QTM_row=112, relative_tolerance=0.003)
+    check_timeseries(data=data, data_key='u_staking_vesting_rewards', data_row_multiplier=1, QTM_data_tables=QTM_data_tables, QTM_row=164, relative_tolerance=0.003)
     
     # liquidity mining
-    test_timeseries(data=data, data_key='u_liquidity_mining_allocation', data_row_multiplier=1, QTM_data_tables=QTM_data_tables, QTM_row=106, relative_tolerance=0.003)
-    test_timeseries(data=data, data_key='u_liquidity_mining_allocation_cum', data_row_multiplier=1, QTM_data_tables=QTM_data_tables, QTM_row=113, relative_tolerance=0.003)
-    test_timeseries(data=data, data_key='u_liquidity_mining_rewards', data_row_multiplier=1, QTM_data_tables=QTM_data_tables, QTM_row=165, relative_tolerance=0.003)
+    check_timeseries(data=data, data_key='u_liquidity_mining_allocation', data_row_multiplier=1, QTM_data_tables=QTM_data_tables, QTM_row=106, relative_tolerance=0.003)
+    check_timeseries(data=data, data_key='u_liquidity_mining_allocation_cum', data_row_multiplier=1, QTM_data_tables=QTM_data_tables, QTM_row=113, relative_tolerance=0.003)
+    check_timeseries(data=data, data_key='u_liquidity_mining_rewards', data_row_multiplier=1, QTM_data_tables=QTM_data_tables, QTM_row=165, relative_tolerance=0.003)
 
     # burning
-    test_timeseries(data=data, data_key='u_burning_allocation', data_row_multiplier=1, QTM_data_tables=QTM_data_tables, QTM_row=107, relative_tolerance=0.003)
-    test_timeseries(data=data, data_key='u_burning_allocation_cum', data_row_multiplier=1, QTM_data_tables=QTM_data_tables, QTM_row=114, relative_tolerance=0.003)
+    check_timeseries(data=data, data_key='u_burning_allocation', data_row_multiplier=1, QTM_data_tables=QTM_data_tables, QTM_row=107, relative_tolerance=0.003)
+    check_timeseries(data=data, data_key='u_burning_allocation_cum', data_row_multiplier=1, QTM_data_tables=QTM_data_tables, QTM_row=114, relative_tolerance=0.003)
     # holding, cum comes later
-    test_timeseries(data=data, data_key="u_holding_allocation", data_row_multiplier=1, QTM_data_tables=QTM_data_tables, QTM_row=108, relative_tolerance=0.003)
-    test_timeseries(data=data, data_key="u_holding_rewards", data_row_multiplier=1, QTM_data_tables=QTM_data_tables, QTM_row=167, relative_tolerance=0.003)
+    check_timeseries(data=data, data_key="u_holding_allocation", data_row_multiplier=1, QTM_data_tables=QTM_data_tables, QTM_row=108, relative_tolerance=0.003)
+    check_timeseries(data=data, data_key="u_holding_rewards", data_row_multiplier=1, QTM_data_tables=QTM_data_tables, QTM_row=167, relative_tolerance=0.003)
 
     # transfer
-    test_timeseries(data=data, data_key='u_transfer_allocation', data_row_multiplier=1, QTM_data_tables=QTM_data_tables, QTM_row=109, relative_tolerance=0.003)
-    test_timeseries(data=data, data_key='u_transfer_allocation_cum', data_row_multiplier=1, QTM_data_tables=QTM_data_tables, QTM_row=116, relative_tolerance=0.003)
+    check_timeseries(data=data, data_key='u_transfer_allocation', data_row_multiplier=1, QTM_data_tables=QTM_data_tables, QTM_row=109, relative_tolerance=0.003)
+    check_timeseries(data=data, data_key='u_transfer_allocation_cum', data_row_multiplier=1, QTM_data_tables=QTM_data_tables, QTM_row=116, relative_tolerance=0.003)
 
     ## TEST ADOPTION 2 ##
     print("\n------------------------------------------## TEST ADOPTION 2 ##-----------------------------------------")
     print("Testing product revenue and token_buys of radCad timeseries simulation against QTM data tables...")
-    test_timeseries(data=data, data_key='ua_product_revenue', data_row_multiplier=1, QTM_data_tables=QTM_data_tables, QTM_row=119, relative_tolerance=0.003)
-    test_timeseries(data=data, data_key='ua_token_buys', data_row_multiplier=1, QTM_data_tables=QTM_data_tables, QTM_row=121, relative_tolerance=0.003)
+    check_timeseries(data=data, data_key='ua_product_revenue', data_row_multiplier=1, QTM_data_tables=QTM_data_tables, QTM_row=119, relative_tolerance=0.003)
+    check_timeseries(data=data, data_key='ua_token_buys', data_row_multiplier=1, QTM_data_tables=QTM_data_tables, QTM_row=121, relative_tolerance=0.003)
 
     
     ## TEST TOKEN ALLOCATION REMOVAL ##
     print("\n-------------------------------## TEST TOKEN UTILITY REMOVAL ##------------------------------")
     print("Testing token utility removal of radCad timeseries simulation against QTM data tables...")
-    test_timeseries(data=data, data_key='te_remove_perc', data_row_multiplier=100, QTM_data_tables=QTM_data_tables, QTM_row=125, relative_tolerance=0.003)
-    test_timeseries(data=data, data_key='u_staking_base_apr_remove', data_row_multiplier=-1, QTM_data_tables=QTM_data_tables, QTM_row=127, relative_tolerance=0.003, shift=1)
-    test_timeseries(data=data, data_key='u_staking_revenue_share_remove', data_row_multiplier=-1, QTM_data_tables=QTM_data_tables, QTM_row=128, relative_tolerance=0.003, shift=1)
-    test_timeseries(data=data, data_key='u_staking_vesting_remove', data_row_multiplier=-1, QTM_data_tables=QTM_data_tables, QTM_row=129, relative_tolerance=0.003, shift=1)
-    test_timeseries(data=data, data_key='u_liquidity_mining_allocation_remove', data_row_multiplier=-1, QTM_data_tables=QTM_data_tables, QTM_row=130, relative_tolerance=0.003, shift=1)
+    check_timeseries(data=data, data_key='te_remove_perc', data_row_multiplier=100, QTM_data_tables=QTM_data_tables, QTM_row=125, relative_tolerance=0.003)
+    check_timeseries(data=data, data_key='u_staking_base_apr_remove', data_row_multiplier=-1, QTM_data_tables=QTM_data_tables, QTM_row=127, relative_tolerance=0.003, shift=1)
+    check_timeseries(data=data, data_key='u_staking_revenue_share_remove', data_row_multiplier=-1, QTM_data_tables=QTM_data_tables, QTM_row=128, relative_tolerance=0.003, shift=1)
+    check_timeseries(data=data, data_key='u_staking_vesting_remove', data_row_multiplier=-1, QTM_data_tables=QTM_data_tables, QTM_row=129, relative_tolerance=0.003, shift=1)
+    check_timeseries(data=data, data_key='u_liquidity_mining_allocation_remove', data_row_multiplier=-1, QTM_data_tables=QTM_data_tables, QTM_row=130, relative_tolerance=0.003, shift=1)
 
     
     ## TEST BUYBACK FROM REVENUE SHARE FOR STAKERS ##
     print("\n----------------------------## TEST BUYBACK FROM REVENUE SHARE FOR STAKERS ##---------------------------")
     print("Testing token utility removal percentage of radCad timeseries simulation against QTM data tables...")
-    test_timeseries(data=data, data_key='u_buyback_from_revenue_share_usd', data_row_multiplier=1, QTM_data_tables=QTM_data_tables, QTM_row=133, relative_tolerance=0.003)
+    check_timeseries(data=data, data_key='u_buyback_from_revenue_share_usd', data_row_multiplier=1, QTM_data_tables=QTM_data_tables, QTM_row=133, relative_tolerance=0.003)
 
     
     ## TEST SUM OF BUYBACKS ##
     print("\n----------------------------------------## TEST SUM OF BUYBACKS ##--------------------------------------")
     print("Testing sum of buybacks of radCad timeseries simulation against QTM data tables...")
-    test_timeseries(data=data, data_key='ba_buybacks_usd', data_row_multiplier=1, QTM_data_tables=QTM_data_tables, QTM_row=137, relative_tolerance=0.003)
+    check_timeseries(data=data, data_key='ba_buybacks_usd', data_row_multiplier=1, QTM_data_tables=QTM_data_tables, QTM_row=137, relative_tolerance=0.003)
 
     ## TEST PROTOCOL BUCKET BURN ##
     print("\n----------------------------------------## TEST PROTOCOL BUCKET BURN ##--------------------------------------")
     print("Testing protocol bucket burn of radCad timeseries simulation against QTM data tables...")
-    test_timeseries(data=data, data_key='te_tokens_burned', data_row_multiplier=1, QTM_data_tables=QTM_data_tables, QTM_row=141, relative_tolerance=0.003)
+    check_timeseries(data=data, data_key='te_tokens_burned', data_row_multiplier=1, QTM_data_tables=QTM_data_tables, QTM_row=141, relative_tolerance=0.003)
 
 
     ## TEST LIQUIDITY POOL TRANSACTIONS ##
     print("\n-------------------------------------## TEST LIQUIDITY POOL TRANSACTIONS ##-----------------------------------")
     print("Testing liquidity pool transactions of radCad timeseries simulation against QTM data tables...")
     print("Tx1 - after adoption..")
-    test_timeseries(data=data_tx1, data_key='lp_tokens', data_row_multiplier=1, QTM_data_tables=QTM_data_tables, QTM_row=144, relative_tolerance=0.003)
-    test_timeseries(data=data_tx1, data_key='lp_usdc', data_row_multiplier=1, QTM_data_tables=QTM_data_tables, QTM_row=145, relative_tolerance=0.003)
-    test_timeseries(data=data_tx1, data_key='lp_token_price', data_row_multiplier=1, QTM_data_tables=QTM_data_tables, QTM_row=146, relative_tolerance=0.003)
+    check_timeseries(data=data_tx1, data_key='lp_tokens', data_row_multiplier=1, QTM_data_tables=QTM_data_tables, QTM_row=144, relative_tolerance=0.003)
+    check_timeseries(data=data_tx1, data_key='lp_usdc', data_row_multiplier=1, QTM_data_tables=QTM_data_tables, QTM_row=145, relative_tolerance=0.003)
+    check_timeseries(data=data_tx1, data_key='lp_token_price', data_row_multiplier=1, QTM_data_tables=QTM_data_tables, QTM_row=146, relative_tolerance=0.003)
     print("Tx2 - after vesting sell..")
-    test_timeseries(data=data_tx2, data_key='lp_tokens', data_row_multiplier=1, QTM_data_tables=QTM_data_tables, QTM_row=147, relative_tolerance=0.003)
-    test_timeseries(data=data_tx2, data_key='lp_usdc', data_row_multiplier=1, QTM_data_tables=QTM_data_tables, QTM_row=148, relative_tolerance=0.003)
-    test_timeseries(data=data_tx2, data_key='lp_token_price', data_row_multiplier=1, QTM_data_tables=QTM_data_tables, QTM_row=149, relative_tolerance=0.003)
+    check_timeseries(data=data_tx2, data_key='lp_tokens', data_row_multiplier=1, QTM_data_tables=QTM_data_tables, QTM_row=147, relative_tolerance=0.003)
+    check_timeseries(data=data_tx2, data_key='lp_usdc', data_row_multiplier=1, QTM_data_tables=QTM_data_tables, QTM_row=148, relative_tolerance=0.003)
+    check_timeseries(data=data_tx2, data_key='lp_token_price', data_row_multiplier=1, QTM_data_tables=QTM_data_tables, QTM_row=149, relative_tolerance=0.003)
     print("Tx3 - after liquidity addition..")
-    test_timeseries(data=data_tx3, data_key='lp_tokens', data_row_multiplier=1, QTM_data_tables=QTM_data_tables, QTM_row=150, relative_tolerance=0.003)
-    test_timeseries(data=data_tx3, data_key='lp_usdc', data_row_multiplier=1, QTM_data_tables=QTM_data_tables, QTM_row=151, relative_tolerance=0.003)
-    test_timeseries(data=data_tx3, data_key='lp_token_price', data_row_multiplier=1, QTM_data_tables=QTM_data_tables, QTM_row=152, relative_tolerance=0.003)
+    check_timeseries(data=data_tx3, data_key='lp_tokens', data_row_multiplier=1, QTM_data_tables=QTM_data_tables, QTM_row=150, relative_tolerance=0.003)
+    check_timeseries(data=data_tx3, data_key='lp_usdc', data_row_multiplier=1, QTM_data_tables=QTM_data_tables, QTM_row=151, relative_tolerance=0.003)
+    check_timeseries(data=data_tx3, data_key='lp_token_price', data_row_multiplier=1, QTM_data_tables=QTM_data_tables, QTM_row=152, relative_tolerance=0.003)
     print("Tx4 - after buyback..")
-    test_timeseries(data=data_tx4, data_key='lp_tokens', data_row_multiplier=1, QTM_data_tables=QTM_data_tables, QTM_row=153, relative_tolerance=0.003)
-    test_timeseries(data=data_tx4, data_key='lp_usdc', data_row_multiplier=1, QTM_data_tables=QTM_data_tables, QTM_row=154, relative_tolerance=0.003)
-    test_timeseries(data=data_tx4, data_key='lp_token_price', data_row_multiplier=1, QTM_data_tables=QTM_data_tables, QTM_row=155, relative_tolerance=0.003)
+    check_timeseries(data=data_tx4, data_key='lp_tokens', data_row_multiplier=1, QTM_data_tables=QTM_data_tables, QTM_row=153, relative_tolerance=0.003)
+    check_timeseries(data=data_tx4, data_key='lp_usdc', data_row_multiplier=1, QTM_data_tables=QTM_data_tables, QTM_row=154, relative_tolerance=0.003)
+    check_timeseries(data=data_tx4, data_key='lp_token_price', data_row_multiplier=1, QTM_data_tables=QTM_data_tables, QTM_row=155, relative_tolerance=0.003)
 
 
     ## TEST LIQUIDITY POOL VALUATION AND VOLATILITY ##
     print("\n-------------------------------## TEST LIQUIDITY POOL VALUATION AND VOLATILITY ##------------------------------")
     print("Testing liquidity pool valuation and volatility of radCad timeseries simulation against QTM data tables...")
-    test_timeseries(data=data, data_key="lp_valuation", data_row_multiplier=1, QTM_data_tables=QTM_data_tables, QTM_row=157, relative_tolerance=0.003)
-    test_timeseries(data=data, data_key="lp_volatility", data_row_multiplier=1, QTM_data_tables=QTM_data_tables, QTM_row=159, relative_tolerance=0.003)
+    check_timeseries(data=data, data_key="lp_valuation", data_row_multiplier=1, QTM_data_tables=QTM_data_tables, QTM_row=157, relative_tolerance=0.003)
+    check_timeseries(data=data, data_key="lp_volatility", data_row_multiplier=1, QTM_data_tables=QTM_data_tables, QTM_row=159, relative_tolerance=0.003)
 
     
     ## TEST CASH BALANCE ##
     print("\n-----------------------------------------## TEST CASH BALANCE ##----------------------------------------")
     print("Testing cash balance of radCad timeseries simulation against QTM data tables...")
-    test_timeseries(data=data, data_key='ba_cash_balance', data_row_multiplier=1, QTM_data_tables=QTM_data_tables, QTM_row=189, relative_tolerance=0.003)
+    check_timeseries(data=data, data_key='ba_cash_balance', data_row_multiplier=1, QTM_data_tables=QTM_data_tables, QTM_row=189, relative_tolerance=0.003)
 
 
     ## Testing agent end balances ##
-    test_timeseries(data=data, data_key="reserve_a_tokens", data_row_multiplier=1, QTM_data_tables=QTM_data_tables, QTM_row=179, relative_tolerance=0.003)
-    test_timeseries(data=data, data_key="community_a_tokens", data_row_multiplier=1, QTM_data_tables=QTM_data_tables, QTM_row=180, relative_tolerance=0.003)
-    test_timeseries(data=data, data_key="foundation_a_tokens", data_row_multiplier=1, QTM_data_tables=QTM_data_tables, QTM_row=181, relative_tolerance=0.003)
-    test_timeseries(data=data, data_key="incentivisation_a_tokens", data_row_multiplier=1, QTM_data_tables=QTM_data_tables, QTM_row=182, relative_tolerance=0.003)
-    test_timeseries(data=data, data_key="staking_vesting_a_tokens", data_row_multiplier=1, QTM_data_tables=QTM_data_tables, QTM_row=183, relative_tolerance=0.003)
-    test_timeseries(data=data, data_key="lp_tokens", data_row_multiplier=1, QTM_data_tables=QTM_data_tables, QTM_row=184, relative_tolerance=0.003)
-    test_timeseries(data=data, data_key="te_holding_supply", data_row_multiplier=1, QTM_data_tables=QTM_data_tables, QTM_row=185, relative_tolerance=0.003)
+    check_timeseries(data=data, data_key="reserve_a_tokens", data_row_multiplier=1, QTM_data_tables=QTM_data_tables, QTM_row=179, relative_tolerance=0.003)
+    check_timeseries(data=data, data_key="community_a_tokens", data_row_multiplier=1, QTM_data_tables=QTM_data_tables, QTM_row=180, relative_tolerance=0.003)
+    check_timeseries(data=data, data_key="foundation_a_tokens", data_row_multiplier=1, QTM_data_tables=QTM_data_tables, QTM_row=181, relative_tolerance=0.003)
+    check_timeseries(data=data, data_key="incentivisation_a_tokens", data_row_multiplier=1, QTM_data_tables=QTM_data_tables, QTM_row=182, relative_tolerance=0.003)
+    check_timeseries(data=data, data_key="staking_vesting_a_tokens", data_row_multiplier=1, QTM_data_tables=QTM_data_tables, QTM_row=183, relative_tolerance=0.003)
+    check_timeseries(data=data, data_key="lp_tokens", data_row_multiplier=1, QTM_data_tables=QTM_data_tables, QTM_row=184, relative_tolerance=0.003)
+    check_timeseries(data=data, data_key="te_holding_supply", data_row_multiplier=1, QTM_data_tables=QTM_data_tables, QTM_row=185, relative_tolerance=0.003)
     # circulating and vested supply
-    test_timeseries(data=data, data_key="te_unvested_supply", data_row_multiplier=1, QTM_data_tables=QTM_data_tables, QTM_row=186, relative_tolerance=0.003)
-    test_timeseries(data=data, data_key="te_circulating_supply", data_row_multiplier=1, QTM_data_tables=QTM_data_tables, QTM_row=187, relative_tolerance=0.003)
+    check_timeseries(data=data, data_key="te_unvested_supply", data_row_multiplier=1, QTM_data_tables=QTM_data_tables, QTM_row=186, relative_tolerance=0.003)
+    check_timeseries(data=data, data_key="te_circulating_supply", data_row_multiplier=1, QTM_data_tables=QTM_data_tables, QTM_row=187, relative_tolerance=0.003)
     # token valuations
-    test_timeseries(data=data, data_key="lp_token_price", data_row_multiplier=1, QTM_data_tables=QTM_data_tables, QTM_row=192, relative_tolerance=0.003)
-    test_timeseries(data=data, data_key="te_MC", data_row_multiplier=1, QTM_data_tables=QTM_data_tables, QTM_row=193, relative_tolerance=0.003)
-    test_timeseries(data=data, data_key="te_FDV_MC", data_row_multiplier=1, QTM_data_tables=QTM_data_tables, QTM_row=194, relative_tolerance=0.003)
+    check_timeseries(data=data, data_key="lp_token_price", data_row_multiplier=1, QTM_data_tables=QTM_data_tables, QTM_row=192, relative_tolerance=0.003)
+    check_timeseries(data=data, data_key="te_MC", data_row_multiplier=1, QTM_data_tables=QTM_data_tables, QTM_row=193, relative_tolerance=0.003)
+    check_timeseries(data=data, data_key="te_FDV_MC", data_row_multiplier=1, QTM_data_tables=QTM_data_tables, QTM_row=194, relative_tolerance=0.003)
+
+
+
+def test_agent_table():
+    import pickle
+    from parts.utils import generate_agents
+    from parts.agent_table import AgentTable, AGENT_NUMERIC_FIELDS
+
+    print("\n----------------------------------------## TEST AGENT TABLE ##----------------------------------------")
+    print("Testing that copies of the agent table are independent...")
+    agents = generate_agents(stakeholder_name_mapping)
+    numeric, objects = agents.numeric.copy(), {field: list(values) for field, values in agents.objects.items()}
+    agents_copy = agents.copy()
+    agents_copy[0]['a_tokens'] += 1.0
+    agents_copy[1]['a_current_action'] = 'tested'
+    agents_copy.columns['a_usd_funds'] = np.arange(len(agents_copy)) + 1.0
+    np.testing.assert_array_equal(agents.numeric, numeric, err_msg="Updating a copy changed the numeric fields of the original agent table.")
+    assert agents.objects == objects, "Updating a copy changed the object fields of the original agent table."
+    assert agents_copy[0]['a_tokens'] == agents[0]['a_tokens'] + 1.0 and agents_copy[1]['a_current_action'] == 'tested', "The copy was not updated."
+
+    print("Testing the pickle round trip of the agent table...")
+    restored = pickle.loads(pickle.dumps(agents_copy, -1))
+    assert isinstance(restored, AgentTable) and list(restored) == list(agents_copy), "The agents were not restored."
+    np.testing.assert_array_equal(restored.numeric, agents_copy.numeric)
+    assert restored.objects == agents_copy.objects and [dict(agent) for agent in restored.values()] == [dict(agent) for agent in agents_copy.values()], \
+        "The restored agents differ from the pickled ones."
+    restored[0]['a_tokens'] = 0.0
+    assert restored.columns['a_tokens'][0] == 0.0 and agents_copy[0]['a_tokens'] != 0.0, "The agent views of the restored table do not write into its own storage."
+
+    print("Testing the agent table with a run axis...")
+    runs = 3
+    batched = agents.batched(runs)
+    assert batched.numeric.shape == (len(AGENT_NUMERIC_FIELDS), runs, len(agents)), "Wrong shape of the batched agent table."
+    for run in range(runs):
+        np.testing.assert_array_equal(batched.numeric[:, run], agents.numeric)
+    batched.columns['a_tokens'][1] += 1.0
+    batched.objects['a_type'][0] = 'tested'
+    np.testing.assert_array_equal(batched.numeric[:, 0], agents.numeric, err_msg="The runs of the batched agent table share their storage.")
+    assert agents.objects == objects, "Updating the batched agent table changed the original agent table."
+
+    print("Testing the agent masks...")
+    for stakeholder_type in set(stakeholder_name_mapping.values()):
+        np.testing.assert_array_equal(agents.mask('a_type', stakeholder_type), [agent['a_type'] == stakeholder_type for agent in agents.values()])
+    assert not agents.mask('a_type', 'no_type').any(), "The mask of an unknown agent type selects agents."
+    print(u'\u2713'+" Test passed!")
+    print("------------------------------------")
+
+def test_vectorized_engine():
+    from vectorized_simulation import vectorized_simulation
+
+    print("\n-------------------------------------## TEST VECTORIZED ENGINE ##-------------------------------------")
+    print("Testing the vectorized simulation engine against the radCAD simulation...")
+    vectorized_data = vectorized_simulation(sys_params.sys_param, stakeholder_name_mapping, TIMESTEPS, runs=MONTE_CARLO_RUNS, substeps=TESTED_SUBSTEPS)
+    assert_substep_data_equal(vectorized_data, "Vectorized simulation")
+    print(u'\u2713'+" Test passed!")
+    print("------------------------------------")
+
+def test_vectorized_monte_carlo():
+    from vectorized_simulation import vectorized_run, AGENT_ACTIONS
+    from parts.agents_behavior.agent_meta_bucket_behavior import draw_meta_bucket_shares
+    from result_sinks import ListSink
+
+    print("\n----------------------------------## TEST VECTORIZED MONTE CARLO ##-----------------------------------")
+    print("Testing batched stochastic monte carlo runs of the vectorized engine against single runs...")
+    params = dict(generate_parameter_sweep(sys_params.sys_param)[0], agent_behavior='stochastic')
+    names = list(stakeholder_name_mapping)
+    timesteps, runs, seed = 24, 5, 42
+    batched = vectorized_run(params, stakeholder_name_mapping, timesteps, runs=runs, seed=seed, batch_runs=runs)[LAST_SUBSTEP]
+    for batch_runs in [1, 2]:
+        pd.testing.assert_frame_equal(batched, vectorized_run(params, stakeholder_name_mapping, timesteps, runs=runs, seed=seed, batch_runs=batch_runs)[LAST_SUBSTEP],
+                                      obj="Runs in batches of "+str(batch_runs)+" run(s)")
+    pd.testing.assert_frame_equal(vectorized_run(params, stakeholder_name_mapping, timesteps, runs=2, seed=seed, first_run=3)[LAST_SUBSTEP],
+                                  batched[batched.run > 3].reset_index(drop=True), obj="Runs 4 and 5 simulated on their own")
+    first_month = batched[batched.timestep == 1]
+    first_draws = np.stack([draw_meta_bucket_shares(params, size=len(names), rng=np.random.default_rng(run_seed)) for run_seed in np.random.SeedSequence(seed).spawn(runs)])
+    np.testing.assert_allclose(np.stack([first_month[[name+'_a_actions_'+action for action in AGENT_ACTIONS[:3]]].values.reshape(runs, 3) for name in names], axis=1), first_draws,
+                               err_msg="The batched runs do not draw the same agent behavior as per run draws.")
+    print("Testing the stochastic agent meta bucket shares...")
+    shares = batched[[name+'_a_actions_'+action for name in names for action in AGENT_ACTIONS[:3]]].values.reshape(-1, len(names), 3)
+    np.testing.assert_allclose(shares.sum(axis=-1), 1, err_msg="The stochastic agent meta bucket shares do not sum up to 1.")
+    assert (shares > 0).all() and shares[:, :, 0].std() > 0, "The stochastic agent meta bucket shares are not random."
+    print("Testing the agent action dictionaries and the streaming of batches of runs into a result sink...")
+    dict_data = vectorized_run(params, stakeholder_name_mapping, timesteps, runs=2, seed=seed, action_dicts=True)[LAST_SUBSTEP]
+    assert dict_data[names[0]+'_a_actions'].tolist() == batched.loc[batched.run <= 2, [names[0]+'_a_actions_'+action for action in AGENT_ACTIONS]].rename(
+        columns=lambda column: column[len(names[0]+'_a_actions_'):]).to_dict('records'), "The agent action dictionaries differ from the agent action columns."
+    sink = vectorized_run(params, stakeholder_name_mapping, timesteps, substeps=[16, LAST_SUBSTEP], runs=runs, seed=seed, batch_runs=2, sink=ListSink(batch_size=timesteps))
+    assert sink.rows == runs * timesteps * 2 and len(sink.batches) == 2 * 3, "The batches of runs were not streamed into the result sink."
+    pd.testing.assert_frame_equal(sink.data[sink.data.substep == LAST_SUBSTEP].drop(columns='substep').reset_index(drop=True), batched)
+    print(u'\u2713'+" Test passed!")
+    print("------------------------------------")
+
+def test_parameter_sweep():
+    from sweep import cartesian_sweep, sweep_chunks, run_chunks, run_sweep
+    from result_sinks import SQLiteSink
+    from result_store import ResultStore
+
+    print("\n-------------------------------------## TEST PARAMETER SWEEP ##---------------------------------------")
+    print("Testing the cartesian parameter sweep and its chunks...")
+    sweep_param = cartesian_sweep(sys_params.sys_param, {'lock_apr': [4.0, 8.0], 'avg_token_selling_allocation': [0.05, 0.1]})
+    assert [(params['lock_apr'], params['avg_token_selling_allocation']) for params in generate_parameter_sweep(sweep_param)] == [(4.0, 0.05), (4.0, 0.1), (8.0, 0.05), (8.0, 0.1)], \
+        "The cartesian sweep does not combine all parameter values."
+    for chunk_size, boundaries in [(1, [0, 1, 2, 3]), (3, [0, 3]), (4, [0]), (10, [0])]:
+        chunks = list(sweep_chunks(sweep_param, chunk_size))
+        assert [first_subset for first_subset, chunk_param in chunks] == boundaries, "Wrong first subsets of the sweep chunks of size "+str(chunk_size)+"."
+        assert [params for first_subset, chunk_param in chunks for params in generate_parameter_sweep(chunk_param)] == generate_parameter_sweep(sweep_param), \
+            "The sweep chunks of size "+str(chunk_size)+" do not cover all parameter subsets in order."
+    print("Testing the chunked sweep runner against sequential radCAD runs...")
+    timesteps = 24
+    chunk_subsets = []
+    # the process pool is capped to the available CPU cores, on single core machines the chunks run sequentially
+    sweep_data = run_sweep(sweep_param, state_variables.initial_state, state_update_blocks.state_update_block, timesteps, processes=2, chunk_size=1,
+                           on_chunk=lambda first_subset, data: chunk_subsets.append(sorted(data.subset.unique())))
+    assert chunk_subsets == [[0], [1], [2], [3]], "The sweep runner did not run one parameter subset per chunk."
+    df = pd.DataFrame(Simulation(model=Model(initial_state=state_variables.initial_state, params=sweep_param, state_update_blocks=state_update_blocks.state_update_block),
+                                 timesteps=timesteps, runs=1).run())
+    radCAD_data = postprocessing(df, substep=LAST_SUBSTEP)
+    radCAD_data['subset'] = df.loc[radCAD_data.index, 'subset']
+    pd.testing.assert_frame_equal(sweep_data, radCAD_data.reset_index(drop=True))
+    print("Testing the memory bounded streaming of monte carlo runs into an SQLite sink...")
+    runs = 5
+    assert [(first_subset, first_run, chunk_runs) for first_subset, first_run, chunk_param, chunk_runs in run_chunks(sweep_param, runs, 2)] == \
+        [(subset, first_run, min(2, runs - first_run)) for subset in range(4) for first_run in range(0, runs, 2)], "Wrong run chunks of the sweep."
+    assert [(first_subset, chunk_runs) for first_subset, first_run, chunk_param, chunk_runs in run_chunks(sweep_param, 2, 5)] == [(0, 2), (2, 2)], \
+        "Wrong run chunks of the sweep."
+    chunk_runs = []
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        db = os.path.join(tmp_dir, 'results.db')
+        with SQLiteSink(db, experiment='runs') as sink:
+            assert run_sweep(sys_params.sys_param, state_variables.initial_state, state_update_blocks.state_update_block, timesteps, runs=runs, processes=1,
+                             chunk_size=2, sink=sink, on_chunk=lambda first_subset, data: chunk_runs.append(sorted(data.run.unique()))) is sink
+        with ResultStore(db) as store:
+            stored_runs = store.load('runs', columns=['run', 'subset'])
+    assert chunk_runs == [[1, 2], [3, 4], [5]], "The sweep runner did not split the monte carlo runs into chunks of at most 2 runs."
+    assert len(stored_runs) == runs * len(sweep_data[sweep_data.subset == 0]) and (stored_runs.subset == 0).all(), "Wrong number of stored sweep results."
+    assert stored_runs.run.value_counts().to_dict() == dict.fromkeys(range(1, runs + 1), len(sweep_data[sweep_data.subset == 0])), \
+        "The monte carlo runs of the chunks are not numbered consecutively."
+    print(u'\u2713'+" Test passed!")
+    print("------------------------------------")
+
+def test_vectorized_sweep():
+    from sweep import cartesian_sweep, run_sweep
+    from executor import simulation_in_place
+    from result_sinks import ListSink
+
+    print("\n-------------------------------------## TEST VECTORIZED SWEEP ##--------------------------------------")
+    print("Testing the vectorized engine of the sweep runner against the in-place executor...")
+    sweep_param = cartesian_sweep(sys_params.sys_param, {'lock_apr': [4.0, 8.0], 'avg_token_selling_allocation': [0.05, 0.1]})
+    timesteps, runs = 24, 2
+    chunk_subsets = []
+    sweep_data = run_sweep(sweep_param, state_variables.initial_state, state_update_blocks.state_update_block, timesteps, runs=runs, chunk_size=3,
+                           engine='vectorized', on_chunk=lambda first_subset, data: chunk_subsets.append(sorted(data.subset.unique())))
+    assert chunk_subsets == [[0], [1], [2], [3]], "The vectorized sweep did not run one parameter subset per chunk."
+    sink = ListSink(batch_size=timesteps)
+    simulation_in_place(state_variables.initial_state, state_update_blocks.state_update_block, sweep_param, timesteps, runs=runs, sink=sink)
+    in_place_data = sink.data[sink.data.substep == LAST_SUBSTEP].drop(columns='substep').sort_values(['subset', 'run', 'timestep'])
+    pd.testing.assert_frame_equal(sweep_data, in_place_data.reset_index(drop=True), check_dtype=False, check_categorical=False, rtol=1e-10)
+    try:
+        run_sweep(sweep_param, state_variables.initial_state, state_update_blocks.state_update_block, timesteps, engine='unknown')
+        raise AssertionError("The sweep runner accepted an unknown engine.")
+    except ValueError:
+        pass
+    print(u'\u2713'+" Test passed!")
+    print("------------------------------------")
+
+def test_in_place_executor():
+    from executor import simulation_in_place
+
+    print("\n------------------------------------## TEST IN-PLACE EXECUTOR ##--------------------------------------")
+    print("Testing the in-place executor with state mutation checks against the radCAD simulation...")
+    in_place_df = pd.DataFrame(simulation_in_place(state_variables.initial_state, state_update_blocks.state_update_block, sys_params.sys_param, TIMESTEPS,
+                                                   runs=MONTE_CARLO_RUNS, record_substeps=TESTED_SUBSTEPS, check_mutation=True))
+    assert len(in_place_df) == MONTE_CARLO_RUNS * (1 + len(TESTED_SUBSTEPS) * TIMESTEPS), "The in-place executor recorded other substeps than the selected ones."
+    assert_substep_data_equal(postprocessing_substeps(in_place_df, substeps=TESTED_SUBSTEPS), "In-place executor")
+    print(u'\u2713'+" Test passed!")
+    print("------------------------------------")
+
+def test_substep_fusion():
+    from substep_compiler import compile_state_update_block, relabel_substeps
+
+    print("\n-------------------------------------## TEST SUBSTEP FUSION ##---------------------------------------")
+    print("Testing the compiled state update block against the radCAD simulation...")
+    compiled_state_update_block = compile_state_update_block(state_update_blocks.state_update_block, keep_boundaries=[16])
+    compiled_df = relabel_substeps(pd.DataFrame(Simulation(model=Model(initial_state=state_variables.initial_state, params=sys_params.sys_param, state_update_blocks=compiled_state_update_block),
+                                                           timesteps=TIMESTEPS, runs=MONTE_CARLO_RUNS).run()), compiled_state_update_block)
+    assert len(compiled_df) < MONTE_CARLO_RUNS * (1 + LAST_SUBSTEP * TIMESTEPS) / 10, "The compiled state update block records too many substeps."
+    assert_substep_data_equal({substep: postprocessing(compiled_df, substep=substep) for substep in [16, LAST_SUBSTEP]}, "Compiled simulation", substeps=[16, LAST_SUBSTEP])
+    print(u'\u2713'+" Test passed!")
+    print("------------------------------------")
+
+def test_result_sinks():
+    print("\n--------------------------------------## TEST RESULT SINKS ##-----------------------------------------")
+    print("Testing the streaming result sink of the in-place executor...")
+    sink_data = in_place_sink_data()
+    sink_data = sink_data[sink_data.substep == LAST_SUBSTEP].reset_index(drop=True)
+    pd.testing.assert_frame_equal(sink_data.drop(columns=['substep', 'subset']), radCAD_substep_data()[LAST_SUBSTEP].reset_index(drop=True),
+                                  check_exact=False, rtol=0.003, atol=0.001)
+    print(u'\u2713'+" Test passed!")
+    print("------------------------------------")
+
+def test_result_store():
+    from result_store import ResultStore
+
+    print("\n--------------------------------------## TEST RESULT STORE ##-----------------------------------------")
+    print("Testing the typed SQLite result store...")
+    data = in_place_sink_data()
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        with ResultStore(os.path.join(tmp_dir, 'results.db')) as store:
+            store.save(data, experiment='in_place')
+            pd.testing.assert_frame_equal(store.load('in_place'), data)
+            pd.testing.assert_frame_equal(store.load('in_place', columns=['run', 'timestep'], runs=[1]), data.loc[data.run == 1, ['run', 'timestep']].reset_index(drop=True))
+            print("Testing the metric query API...")
+            metrics = ['lp_token_price', 'ua_product_users']
+            in_range = data[data.timestep.between(3, 9)]
+            pd.testing.assert_frame_equal(store.query(metrics, 'in_place', runs=[1], timesteps=(3, 9)),
+                                          in_range.loc[in_range.run == 1, ['run', 'timestep'] + metrics].reset_index(drop=True))
+            for aggregation in ['mean', 'std']:
+                pd.testing.assert_frame_equal(store.query(metrics, 'in_place', timesteps=(3, 9), aggregate=aggregation),
+                                              in_range.groupby('timestep')[metrics].agg(aggregation).reset_index(), check_dtype=False)
+            print("Testing the versions of the experiments...")
+            assert_result_versions(store, data)
+            assert store.tables() == ['simulation_data'], "The versions table is listed as results table."
+    print(u'\u2713'+" Test passed!")
+    print("------------------------------------")
+
+def test_arrow_result_store():
+    from result_store import ArrowResultStore
+
+    print("\n-----------------------------------## TEST ARROW RESULT STORE ##--------------------------------------")
+    pytest.importorskip('pyarrow')
+    print("Testing the partitioned Arrow result store...")
+    data = in_place_sink_data()
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        with ArrowResultStore(os.path.join(tmp_dir, 'results')) as store:
+            store.save(data, experiment='in_place')
+            pd.testing.assert_frame_equal(store.load('in_place'), data)
+            pd.testing.assert_frame_equal(store.load('in_place', columns=['run', 'timestep'], runs=[1]), data.loc[data.run == 1, ['run', 'timestep']].reset_index(drop=True))
+            print("Testing the versions of the experiments...")
+            assert_result_versions(store, data)
+    print(u'\u2713'+" Test passed!")
+    print("------------------------------------")
+
+def test_result_cache():
+    import shutil
+    import result_cache
+    from result_cache import ResultCache, result_key
+
+    print("\n--------------------------------------## TEST RESULT CACHE ##-----------------------------------------")
+    print("Testing the result cache...")
+    data = in_place_sink_data()
+    key = result_key(sys_params.sys_param, TIMESTEPS, MONTE_CARLO_RUNS)
+    assert key == result_key(dict(reversed(list(sys_params.sys_param.items()))), TIMESTEPS, MONTE_CARLO_RUNS), "The result key depends on the parameter order."
+    assert key != result_key(sys_params.sys_param, TIMESTEPS + 1, MONTE_CARLO_RUNS), "The result key ignores the number of timesteps."
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        with ResultCache(os.path.join(tmp_dir, 'cache')) as cache:
+            assert cache.get(key) is None, "The empty result cache returned results."
+            cache.set(key, data)
+            pd.testing.assert_frame_equal(cache.get(key), data)
+    print("Testing the model version...")
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        model_dir = os.path.join(tmp_dir, 'Model')
+        shutil.copytree(parent_dir+'/Model', model_dir, ignore=shutil.ignore_patterns('tests', '*.db', '.*', '__pycache__'))
+        versions = []
+        try:
+            result_cache.MODEL_DIR = model_dir
+            for file in [None, 'plots.py', 'cli.py', 'post_processing.py', os.path.join('parts', 'ecosystem', 'vesting.py')]:
+                if file is not None:
+                    with open(os.path.join(model_dir, file), 'a') as f:
+                        f.write('\n')
+                result_cache.model_version.cache_clear()
+                versions.append(result_cache.model_version())
+        finally:
+            result_cache.MODEL_DIR = os.path.dirname(os.path.abspath(result_cache.__file__))
+            result_cache.model_version.cache_clear()
+    assert versions[0] == versions[1] == versions[2], "Changes of the interface and batch tools changed the model version."
+    assert len(set(versions[2:])) == 3, "Changes of the model did not change the model version."
+    print(u'\u2713'+" Test passed!")
+    print("------------------------------------")
+
+def test_checkpoints():
+    from executor import single_run_in_place
+    from checkpoints import checkpointed_run, fork_run
+
+    print("\n--------------------------------------## TEST CHECKPOINTS ##------------------------------------------")
+    print("Testing scenario forks from state checkpoints...")
+    base_params = generate_parameter_sweep(sys_params.sys_param)[0]
+    base_records, checkpoints = checkpointed_run(state_variables.initial_state, state_update_blocks.state_update_block, base_params, TIMESTEPS, range(12, TIMESTEPS, 12))
+    fork_params = dict(base_params, buyback_end='1.1.30', airdrop_amount3=2 * base_params['airdrop_amount3'])
+    fork_timestep, fork_records = fork_run(checkpoints, state_update_blocks.state_update_block, fork_params, TIMESTEPS)
+    assert fork_timestep > 0, "The scenario fork did not start from a checkpoint."
+    pd.testing.assert_frame_equal(flatten_records(base_records[:fork_timestep+1] + fork_records),
+                                  flatten_records(single_run_in_place(state_variables.initial_state, state_update_blocks.state_update_block, fork_params, TIMESTEPS)))
+    print(u'\u2713'+" Test passed!")
+    print("------------------------------------")
+
+def test_job_queue():
+    from concurrent.futures import Future
+    from concurrent.futures.process import BrokenProcessPool
+    import worker
+    from worker import JobQueue, run_job, record_job_failure, QUEUED, RUNNING, DONE, FAILED, CANCELLED
+    from result_store import ResultStore
+    from sweep import available_processes
+
+    print("\n---------------------------------------## TEST JOB QUEUE ##-------------------------------------------")
+    print("Testing the simulation job queue...")
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        with JobQueue(os.path.join(tmp_dir, 'jobs.db')) as jobs:
+            job_id = jobs.add(experiment='in_place', timesteps=TIMESTEPS, runs=MONTE_CARLO_RUNS)
+            assert jobs.status(job_id)['status'] == QUEUED, "The new simulation job is not queued."
+            jobs.cancel(job_id)
+            assert run_job(jobs.db, job_id) == CANCELLED and jobs.status(job_id)['status'] == CANCELLED, "The cancelled simulation job was run."
+            print("Testing the experiments of the jobs and the failures of their workers...")
+            data = in_place_sink_data()
+            data = data[data.substep == LAST_SUBSTEP].drop(columns='substep')
+            job_ids = [jobs.add(timesteps=TIMESTEPS, runs=MONTE_CARLO_RUNS) for _ in range(2)]
+            assert [jobs.status(job_id)['experiment'] for job_id in job_ids] == ['job-'+str(job_id) for job_id in job_ids], "The job results are not keyed by the job ids."
+            jobs.update(job_ids[0], status=RUNNING)
+            future = Future()
+            future.set_exception(BrokenProcessPool("The worker process died."))
+            with ResultStore(jobs.db) as store:
+                store.save(data.head(TIMESTEPS // 2), experiment='job-'+str(job_ids[1]))
+            record_job_failure(jobs.db, job_ids[1], future)
+            assert jobs.status(job_ids[1])['status'] == FAILED and 'BrokenProcessPool' in jobs.status(job_ids[1])['message'], "The failure of the worker was not recorded."
+            with ResultStore(jobs.db) as store:
+                assert store.experiments() == [], "The partial results of the failed worker were not deleted."
+            assert jobs.status(job_ids[0])['status'] == RUNNING, "The failure of a worker was recorded for another job."
+            assert jobs.fail_unfinished("Interrupted by a restart of the interface.") == 1, "The stale running job was not reset."
+            assert [jobs.status(job_id)['status'] for job_id in [job_id] + job_ids] == [CANCELLED, FAILED, FAILED], "Finished jobs were reset."
+            print("Testing the deletion of the results of replaced, cancelled and failed jobs...")
+            done_job, queued_job = [jobs.add(timesteps=TIMESTEPS, runs=MONTE_CARLO_RUNS) for _ in range(2)]
+            jobs.update(done_job, status=DONE)
+            with ResultStore(jobs.db) as store:
+                for stored_job in [done_job, queued_job]:
+                    store.save(data, experiment='job-'+str(stored_job))
+            jobs.discard(done_job)
+            jobs.discard(queued_job)
+            assert jobs.status(queued_job)['status'] == CANCELLED, "The replaced queued job was not cancelled."
+            with ResultStore(jobs.db) as store:
+                assert store.experiments() == [], "The results of the replaced jobs were not deleted."
+            # stop the simulation of a job after 24 timesteps, i.e. after partial results were written
+            partial_rows = []
+            def stop_job(self, job_id, error):
+                if self.status(job_id)['timestep'] < 24:
+                    return False
+                with ResultStore(self.db) as store:
+                    partial_rows.append(len(store.load('job-'+str(job_id))))
+                if error is not None:
+                    raise error("The worker failed.")
+                return True
+            cancel_requested = JobQueue.cancel_requested
+            for error, status in [(None, CANCELLED), (RuntimeError, FAILED)]:
+                stopped_job = jobs.add(timesteps=36, runs=MONTE_CARLO_RUNS)
+                try:
+                    JobQueue.cancel_requested = lambda self, job_id: stop_job(self, job_id, error)
+                    assert run_job(jobs.db, stopped_job) == status and jobs.status(stopped_job)['status'] == status, "The job was not stopped."
+                finally:
+                    JobQueue.cancel_requested = cancel_requested
+                with ResultStore(jobs.db) as store:
+                    assert partial_rows[-1] > 0 and store.experiments() == [], "The partial results of the "+status+" job were not deleted."
+            assert 'RuntimeError' in jobs.status(stopped_job)['message'], "The failure of the job was not recorded."
+    print("Testing the default size of the worker pool...")
+    assert worker._worker_pool is None, "The worker pool was started by another test."
+    pool = worker.worker_pool()
+    try:
+        assert pool._max_workers == available_processes(), "The worker pool does not use the available CPU cores."
+    finally:
+        pool.shutdown()
+        worker._worker_pool = None
+    print(u'\u2713'+" Test passed!")
+    print("------------------------------------")
+
+def test_model_factory():
+    from model import build_model
+    from executor import simulation_in_place
+    from result_cache import parameter_hash
+
+    print("\n--------------------------------------## TEST MODEL FACTORY ##----------------------------------------")
+    print("Testing the model factory...")
+    model = build_model(pd.read_csv(sys_params.QTM_INPUTS))
+    assert parameter_hash(model.sys_param) == parameter_hash(sys_params.sys_param), "The model factory derives other system parameters than sys_params.py."
+    pd.testing.assert_frame_equal(flatten_records(simulation_in_place(model.initial_state, model.state_update_block, model.sys_param, TIMESTEPS, runs=MONTE_CARLO_RUNS)),
+                                  flatten_records(simulation_in_place(state_variables.initial_state, state_update_blocks.state_update_block, sys_params.sys_param, TIMESTEPS, runs=MONTE_CARLO_RUNS)))
+    print(u'\u2713'+" Test passed!")
+    print("------------------------------------")
+
+def test_inputs_parser():
+    print("\n--------------------------------------## TEST INPUTS PARSER ##----------------------------------------")
+    print("Testing the cached inputs parser...")
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        initial_parameters = parse_inputs(sys_params.QTM_INPUTS, cache_dir=os.path.join(tmp_dir, 'inputs'))
+        assert len(os.listdir(os.path.join(tmp_dir, 'inputs'))) == 1, "The parsed inputs were not cached."
+        assert parse_inputs(sys_params.QTM_INPUTS, cache_dir=os.path.join(tmp_dir, 'inputs')) == initial_parameters == parse_inputs(sys_params.QTM_INPUTS, cache_dir=None), "The cached inputs differ from the parsed inputs."
+    malformed_inputs = pd.read_csv(sys_params.QTM_INPUTS)
+    malformed_inputs.loc[5, 'Initial Value'] = '1x0'
+    malformed_inputs.loc[8, ['Min', 'Max', 'Interval Steps']] = [10, 5, 3]
+    try:
+        parse_inputs(malformed_inputs)
+    except InputsError as e:
+        assert [row for row, name, problem in e.rows] == [7, 10], "The malformed input rows are reported with wrong row numbers."
+    else:
+        raise AssertionError("The malformed inputs were parsed without error.")
+    print(u'\u2713'+" Test passed!")
+    print("------------------------------------")
+
+def test_monte_carlo_aggregation():
+    from aggregation import summarize_runs, SUMMARY_STATISTICS
+    from result_sinks import AggregationSink
+    from plots import aggregate_runs
+
+    print("\n----------------------------------## TEST MONTE CARLO AGGREGATION ##----------------------------------")
+    print("Testing the monte carlo aggregation...")
+    data = radCAD_substep_data()[LAST_SUBSTEP]
+    runs_data = pd.concat([data.assign(run=run, lp_token_price=data.lp_token_price * (1 + run / 10)) for run in range(1, 8)], ignore_index=True)
+    summary = summarize_runs(runs_data, 'timestep', 'lp_token_price')
+    grouped = runs_data.groupby('timestep')['lp_token_price']
+    np.testing.assert_allclose(summary[['mean', 'std', 'min', 'max', 'p5', 'p50', 'p95']].values,
+                               pd.concat([grouped.mean(), grouped.std(), grouped.min(), grouped.max(), grouped.quantile(0.05), grouped.median(), grouped.quantile(0.95)], axis=1).values)
+    with AggregationSink(['lp_token_price']) as aggregation_sink:
+        for run in range(1, 8):
+            aggregation_sink.write(runs_data[runs_data.run == run])
+    np.testing.assert_allclose(aggregation_sink.summary('lp_token_price')[SUMMARY_STATISTICS].values, summary[SUMMARY_STATISTICS].values,
+                               err_msg="The online aggregation differs from the summary of all runs.")
+    print("Testing the aggregated monte carlo runs of the plots...")
+    for x, y in [('timestep', 'lp_token_price'), ('ua_product_users', 'lp_token_price')]:
+        grouped = runs_data[list(dict.fromkeys(['timestep', x, y]))].astype(float).groupby('timestep')
+        for statistic, aggregate in zip(['mean', 'median', 'std', 'min'], aggregate_runs(runs_data, 'timestep', x, y)):
+            pd.testing.assert_frame_equal(aggregate, grouped.agg(statistic).reset_index())
+    print(u'\u2713'+" Test passed!")
+    print("------------------------------------")
+
+def check_batch_scenarios(store_name, engine='in-place'):
+    """Run two scenarios with two tasks each through cli.py and check the rows stored per scenario."""
+    import shutil
+    import cli
+    from result_store import open_result_store
+
+    runs, timesteps = 3, 12
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        for name in ['client_a', 'client_b']:
+            shutil.copy(sys_params.QTM_INPUTS, os.path.join(tmp_dir, name + '.csv'))
+        cli_store = os.path.join(tmp_dir, store_name)
+        # two workers even on single core machines, so the runs of every scenario are split into two tasks
+        available_processes = cli.available_processes
+        try:
+            cli.available_processes = lambda processes=None: 2
+            assert cli.main([tmp_dir, '--store', cli_store, '--workers', '2', '--runs', str(runs), '--timesteps', str(timesteps), '--metrics', 'lp_token_price',
+                             '--engine', engine]) == 0, "The batch run of two scenarios failed."
+        finally:
+            cli.available_processes = available_processes
+        with open_result_store(cli_store) as store:
+            assert store.experiments() == ['client_a', 'client_b'], "The scenarios are not stored as experiments named after their inputs."
+            for name in ['client_a', 'client_b']:
+                stored = store.load(name)
+                assert len(stored) == runs * timesteps and stored.groupby('run').size().to_dict() == dict.fromkeys(range(1, runs + 1), timesteps), \
+                    "Wrong number of rows of the scenario "+name+" in "+store_name+"."
+
+def test_batch_cli():
+    import cli
+    from result_store import ResultStore
+
+    print("\n---------------------------------------## TEST BATCH CLI ##-------------------------------------------")
+    print("Testing the batch command line interface...")
+    data = in_place_sink_data()
+    data = data[data.substep == LAST_SUBSTEP]
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        for engine in ['in-place', 'vectorized']:
+            cli_store = os.path.join(tmp_dir, engine+'.db')
+            assert cli.main([sys_params.QTM_INPUTS, '--store', cli_store, '--workers', '1', '--timesteps', str(TIMESTEPS), '--metrics', 'lp_token_price',
+                             '--engine', engine]) == 0, "The batch run with the "+engine+" engine failed."
+            with ResultStore(cli_store) as store:
+                pd.testing.assert_frame_equal(store.load(cli.scenario_name(sys_params.QTM_INPUTS)),
+                                              data[['run', 'subset', 'timestep', 'lp_token_price']].reset_index(drop=True), check_dtype=False, rtol=1e-10)
+    print("Testing the tasks of the monte carlo runs and the parameter subsets of the scenarios...")
+    assert cli.scenario_tasks(sys_params.QTM_INPUTS, {}, 5, 3)[1] == [((0, 1), (0, 2)), ((0, 1), (2, 4)), ((0, 1), (4, 5))], "Wrong run ranges of the tasks."
+    assert cli.scenario_tasks(sys_params.QTM_INPUTS, {'lock_apr': [4.0, 8.0, 12.0]}, 2, 2)[1] == [((0, 1), (0, 2)), ((1, 2), (0, 2)), ((2, 3), (0, 2))], \
+        "Wrong subset ranges of the tasks."
+    print("Testing batch runs of two scenarios into a SQLite result store...")
+    check_batch_scenarios('cli.db')
+    check_batch_scenarios('cli_vectorized.db', engine='vectorized')
+    print(u'\u2713'+" Test passed!")
+    print("------------------------------------")
+
+def test_batch_cli_arrow_store():
+    print("\n----------------------------------## TEST BATCH CLI ARROW STORE ##------------------------------------")
+    pytest.importorskip('pyarrow')
+    print("Testing batch runs of two scenarios into an Arrow result store...")
+    check_batch_scenarios('cli_arrow')
+    print(u'\u2713'+" Test passed!")
+    print("------------------------------------")
+
+
+# all tests in the order of python test_stage.py
+TESTS = [test_qtm_data_tables, test_agent_table, test_vectorized_engine, test_vectorized_monte_carlo, test_parameter_sweep, test_vectorized_sweep,
+         test_in_place_executor, test_substep_fusion, test_result_sinks, test_result_store, test_arrow_result_store, test_result_cache, test_checkpoints,
+         test_job_queue, test_model_factory, test_inputs_parser, test_monte_carlo_aggregation, test_batch_cli, test_batch_cli_arrow_store]
+
+if __name__ == '__main__':
+    start_time = time.process_time()
+
+    ### BEGIN TESTS ###
+    print("\n-------------------------------------------------------------------------------------------------------")
+    print("\n-------------------------------------------## BEGIN TESTS ##-------------------------------------------")
+    print("\n-------------------------------------------------------------------------------------------------------")
+    print("\n")
 
+    test_times = {}
+    for test in TESTS:
+        test_start_time = time.process_time()
+        try:
+            test()
+        except pytest.skip.Exception as skip:
+            print("Skipped: "+str(skip))
+        test_times[test.__name__] = time.process_time() - test_start_time
 
     ### END OF TESTS ###
     print("\n")
@@ -266,8 +816,7 @@ if __name__ == '__main__'   :
     print("\n-------------------------------------------## END OF TESTS ##-------------------------------------------")
     print("\n-------------------------------------------------------------------------------------------------------")
     print("\n")
-    # display necessery time data
-    print("Simulation time: ", simulation_end_time - start_time, " s")
-    print("Post processing one dataframe time: ", postprocessing_all_end_time - postprocessing_one_start_time, " s")
-    print("Post processing all dataframes time: ", postprocessing_all_end_time - simulation_end_time, " s")
+    # display necessery time data, the first test includes the reference radCAD simulation
+    for name, seconds in test_times.items():
+        print(name+" time: ", seconds, " s")
     print("Whole Test time: ", time.process_time() - start_time, " s")
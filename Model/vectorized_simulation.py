@@ -0,0 +1,653 @@
+# Dependences
+import numpy as np
+import pandas as pd
+
+from radcad.core import generate_parameter_sweep
+
+from parts.utils import *
+from parts.agents_behavior.agent_meta_bucket_behavior import draw_meta_bucket_shares
+from parts.ecosystem.vesting import vesting_schedule
+from parts.business.user_adoption import user_adoption_curves, precompute_user_adoption
+from parts.simulation_calendar import simulation_calendar
+
+# number of substeps in the QTM state update block (see state_update_blocks.py)
+N_SUBSTEPS = 23
+
+# number of monte carlo runs simulated at once by default (see vectorized_run)
+RUN_BATCH_SIZE = 100
+
+# keys of the agent actions, in the order of the last axis of the batched state['agent_actions']
+AGENT_ACTIONS = ['sell', 'hold', 'utility', 'remove_tokens']
+
+
+# Helper Functions
+def prepare_vectorized_run(params, stakeholder_name_mapping, timesteps):
+    """
+    Precompute all agent masks, per agent parameters and the simulation calendar for one parameter set.
+    """
+    names = list(stakeholder_name_mapping.keys())
+    types = np.array(list(stakeholder_name_mapping.values()))
+    lower_names = [name.lower() for name in names]
+    total_token_supply = params['initial_total_supply']
+
+    # agent type masks
+    is_protocol_bucket = types == 'protocol_bucket'
+
+    # agent name masks w.r.t. the payout sources and destinations of the parameter set
+    def name_in(target):
+        return np.array([name in target.lower() for name in lower_names])
+
+    incentivisation_source = np.array([params['incentivisation_payout_source'].lower() in name for name in lower_names]) & is_protocol_bucket
+    burn_bucket = np.array([params['burn_project_bucket'].lower() in name for name in lower_names]) & is_protocol_bucket
+
+    # vesting schedule of all agents, shared by all parameter sets with the same vesting parameters
+    vesting_matrix = vesting_schedule(params, tuple(names), timesteps)
+
+    # simulation calendar and user adoption curves of the timesteps
+    calendar = simulation_calendar(params, months=timesteps)
+    product_users, token_holders = user_adoption_curves(params, timesteps)
+
+    airdrop_tokens = np.zeros(timesteps + 1)
+    for i in [1, 2, 3]:
+        airdrop_tokens += calendar.events['airdrop_date'+str(i)] * total_token_supply * params['airdrop_allocation']/100 * params['airdrop_amount'+str(i)]/100
+
+    return {
+        'names': names,
+        'types': types,
+        'is_protocol_bucket': is_protocol_bucket,
+        'is_vesting_investor': (types == 'early_investor') | (types == 'team'),
+        'incentivisation_source': incentivisation_source,
+        'incentivisation_receivers': types == 'incentivisation_receivers',
+        'airdrop_receivers': types == 'airdrop_receivers',
+        'market_investors': types == 'market_investors',
+        'burn_bucket': burn_bucket,
+        'lock_payout_source': name_in(params['lock_payout_source']),
+        'staking_vesting_bucket': np.array([name == 'staking_vesting' for name in lower_names]),
+        'transfer_destination': name_in(params['transfer_destination']),
+        'holding_payout_source': name_in(params['holding_payout_source']),
+        'liquidity_mining_payout_source': name_in(params['liquidity_mining_payout_source']),
+        'buyback_bucket': name_in(params['buyback_bucket']),
+        'vesting_matrix': vesting_matrix,
+        'dates': calendar.dates,
+        'product_users': product_users,
+        'token_holders': token_holders,
+        'buyback_window': calendar.windows['buyback'],
+        'burn_window': calendar.windows['burn'],
+        'airdrop_tokens': np.maximum(airdrop_tokens, 0),
+        'raised_capital': calculate_raised_capital(params),
+    }
+
+def initialize_vectorized_state(ctx, runs=1):
+    """
+    Initialize the batched vectorized state of all runs. All state variables carry a leading run axis, i.e. the
+    agents are a columnar AgentTable of shape (fields, runs, agents) and all other metrics are arrays of shape (runs,).
+    """
+    def batched(metrics):
+        return {key: np.full(runs, value, dtype=float) for key, value in metrics.items()}
+
+    return {
+        'timestep': 0,
+        'date': ctx['dates'][1],
+        'agents': generate_agents(dict(zip(ctx['names'], ctx['types'].tolist()))).batched(runs),
+        'agent_actions': np.zeros((runs, len(ctx['names']), 4)),
+        'liquidity_pool': batched(initialize_dex_liquidity()),
+        'token_economy': batched(generate_initial_token_economy_metrics()),
+        'user_adoption': batched(initialize_user_adoption()),
+        'business_assumptions': batched(initialize_business_assumptions()),
+        'utilities': batched(initialize_utilities()),
+    }
+
+def update_lp_price_range(liquidity_pool, token_price, tx, current_month, initial_token_price):
+    """
+    Update the price range and volatility of the liquidity pool after a transaction (see update_liquidity_pool_after_transaction).
+    """
+    if tx == 1:
+        liquidity_pool['lp_token_price_max'] = token_price
+        liquidity_pool['lp_token_price_min'] = token_price
+    else:
+        liquidity_pool['lp_token_price_max'] = np.maximum(np.maximum(liquidity_pool['lp_token_price_max'], token_price), initial_token_price if current_month == 1 else 0)
+        liquidity_pool['lp_token_price_min'] = np.minimum(np.minimum(liquidity_pool['lp_token_price_min'], token_price), initial_token_price if current_month == 1 else 1e20)
+
+    liquidity_pool['lp_valuation'] = liquidity_pool['lp_usdc'] + liquidity_pool['lp_tokens'] * liquidity_pool['lp_token_price']
+    liquidity_pool['lp_volatility'] = ((liquidity_pool['lp_token_price_max'] - liquidity_pool['lp_token_price_min'])
+                                       / liquidity_pool['lp_token_price_max'] * 100)
+
+def safe_divide(numerator, denominator):
+    """
+    Element-wise division returning 0 wherever the denominator is not positive.
+    """
+    positive = denominator > 0
+    return np.where(positive, numerator / np.where(positive, denominator, 1), 0)
+
+
+# Vectorized QTM timestep
+def vectorized_timestep(params, ctx, state, current_month, record=None, rng=np.random):
+    """
+    Advance the batched vectorized state by one timestep, running the 23 QTM substeps as array operations over all
+    runs and agents. Deterministic quantities (vesting, adoption, calendar) are computed once and broadcast over the
+    runs, only the stochastic agent behavior is drawn per run.
+    record: optional callable(substep, state) invoked after each substep
+    rng: numpy random generator or the numpy.random module for the stochastic agent behavior
+    """
+    agents = state['agents'].columns
+    lp = state['liquidity_pool']
+    te = state['token_economy']
+    ua = state['user_adoption']
+    ba = state['business_assumptions']
+    u = state['utilities']
+    runs = state['agent_actions'].shape[0]
+    total_token_supply = params['initial_total_supply']
+    initial_token_price = params['initial_token_price']
+
+    # substep 1: initialize the liquidity pool
+    if current_month == 1:
+        required_usdc = params['initial_required_usdc']
+        required_tokens = params['initial_lp_token_allocation']
+        lp['lp_tokens'] = np.full(runs, required_tokens, dtype=float)
+        lp['lp_usdc'] = np.full(runs, required_usdc, dtype=float)
+        lp['lp_constant_product'] = np.full(runs, required_usdc * required_tokens, dtype=float)
+        lp['lp_token_price'] = np.full(runs, required_usdc / required_tokens, dtype=float)
+        if required_usdc > ctx['raised_capital']:
+            raise ValueError(f'The required funds to seed the DEX liquidity are {required_usdc}, '
+                             f'which is higher than the sum of raised capital {ctx["raised_capital"]}!')
+    if record: record(1, state)
+
+    # substep 2: date
+    state['date'] = ctx['dates'][current_month]
+    if record: record(2, state)
+
+    # substep 3: vesting
+    vested = ctx['vesting_matrix'][:, current_month]
+    agents['a_tokens'] += vested
+    agents['a_tokens_vested'] = vested
+    agents['a_tokens_vested_cum'] += vested
+    if record: record(3, state)
+
+    # substep 4: incentivisation
+    source = ctx['incentivisation_source']
+    vested_incentivisation_tokens = agents['a_tokens'][:, source][:, -1] if source.any() else np.zeros(runs)
+    minted_incentivisation_tokens = total_token_supply * params['mint_incentivisation']/100 if params['incentivisation_payout_source'] == 'Minting' else 0
+    agents['a_tokens'][:, source] -= vested_incentivisation_tokens[:, np.newaxis]
+    receivers = ctx['incentivisation_receivers']
+    if receivers.any():
+        per_receiver = vested_incentivisation_tokens[:, np.newaxis] / receivers.sum()
+        agents['a_tokens'][:, receivers] += per_receiver
+        agents['a_tokens_incentivised'][:, receivers] = per_receiver
+        agents['a_tokens_incentivised_cum'][:, receivers] += per_receiver
+    te['te_minted_tokens'] = np.full(runs, minted_incentivisation_tokens, dtype=float)
+    te['te_minted_tokens_cum'] = minted_incentivisation_tokens * lp['lp_token_price']
+    te['te_incentivised_tokens'] = vested_incentivisation_tokens + minted_incentivisation_tokens
+    te['te_incentivised_tokens_cum'] += vested_incentivisation_tokens + minted_incentivisation_tokens
+    if record: record(4, state)
+
+    # substep 5: airdrops
+    airdrop_tokens = ctx['airdrop_tokens'][current_month]
+    receivers = ctx['airdrop_receivers']
+    if receivers.any():
+        per_receiver = airdrop_tokens / receivers.sum()
+        agents['a_tokens'][:, receivers] += per_receiver
+        agents['a_tokens_airdropped'][:, receivers] = per_receiver
+        agents['a_tokens_airdropped_cum'][:, receivers] += per_receiver
+    te['te_airdrop_tokens'] = np.full(runs, airdrop_tokens)
+    te['te_airdrop_tokens_cum'] += airdrop_tokens
+    te['te_airdrop_tokens_usd'] = airdrop_tokens * lp['lp_token_price']
+    if record: record(5, state)
+
+    # substep 6: burn from protocol bucket
+    burn_token_amount = max(total_token_supply * params['burn_per_month']/100, 0) if ctx['burn_window'][current_month] else 0
+    bucket = ctx['burn_bucket']
+    agents['a_tokens'][:, bucket] -= np.minimum(burn_token_amount, agents['a_tokens'][:, bucket])
+    agents['a_tokens_burned'][:, bucket] = burn_token_amount
+    agents['a_tokens_burned_cum'][:, bucket] += burn_token_amount
+    te['te_tokens_burned'] = np.full(runs, burn_token_amount, dtype=float)
+    te['te_tokens_burned_cum'] += burn_token_amount
+    te['te_tokens_burned_usd'] = burn_token_amount * lp['lp_token_price']
+    if record: record(6, state)
+
+    # substep 7: agent meta bucket behavior, one random draw for all runs and agents in the stochastic case
+    removal_perc = params['avg_token_utility_removal']
+    if params['agent_behavior'] == 'static':
+        state['agent_actions'][:] = [params['avg_token_selling_allocation'], params['avg_token_holding_allocation'],
+                                     params['avg_token_utility_allocation'], removal_perc]
+    elif params['agent_behavior'] == 'stochastic':
+        state['agent_actions'][..., :3] = draw_meta_bucket_shares(params, size=(runs, len(ctx['names'])), rng=rng)
+        state['agent_actions'][..., 3] = removal_perc
+    else:
+        raise ValueError("params['agent_behavior'] must be either 'stochastic' or 'static'.")
+    selling_perc = state['agent_actions'][..., 0]
+    holding_perc = state['agent_actions'][..., 1]
+    utility_perc = state['agent_actions'][..., 2]
+    if record: record(7, state)
+
+    # substep 8: agent meta bucket allocations
+    vesting_investors = ctx['is_vesting_investor']
+    not_protocol_bucket = ~ctx['is_protocol_bucket']
+    a_tokens_vested = np.where(vesting_investors, agents['a_tokens_vested'], 0)
+    a_token_holdings_tm1 = np.where(not_protocol_bucket, agents['a_tokens'] - agents['a_tokens_vested'], 0)
+    agents['a_selling_tokens'] = a_tokens_vested * selling_perc
+    agents['a_utility_tokens'] = a_tokens_vested * utility_perc
+    agents['a_holding_tokens'] = a_tokens_vested * holding_perc
+    agents['a_selling_from_holding_tokens'] = a_token_holdings_tm1 * selling_perc
+    agents['a_utility_from_holding_tokens'] = a_token_holdings_tm1 * utility_perc
+    agents['a_holding_from_holding_tokens'] = a_token_holdings_tm1 * holding_perc
+    agents['a_tokens'] -= (agents['a_selling_tokens'] + agents['a_utility_tokens']
+                           + agents['a_selling_from_holding_tokens'] + agents['a_utility_from_holding_tokens'])
+    selling_allocation = (agents['a_selling_tokens'] + agents['a_selling_from_holding_tokens']).sum(axis=-1)
+    utility_allocation = (agents['a_utility_tokens'] + agents['a_utility_from_holding_tokens']).sum(axis=-1)
+    holding_allocation = (agents['a_holding_tokens'] + agents['a_holding_from_holding_tokens']).sum(axis=-1)
+    te['te_selling_allocation'] = selling_allocation
+    te['te_utility_allocation'] = utility_allocation
+    te['te_holding_allocation'] = holding_allocation
+    te['te_selling_allocation_cum'] += selling_allocation
+    te['te_utility_allocation_cum'] += utility_allocation
+    te['te_holding_allocation_cum'] += holding_allocation
+    if record: record(8, state)
+
+    # substep 9: user adoption
+    product_users = ctx['product_users'][current_month]
+    token_holders = ctx['token_holders'][current_month]
+    if current_month == 1:
+        product_revenue = product_users*(params['one_time_product_revenue_per_user']+params['regular_product_revenue_per_user'])
+        token_buys = (params['one_time_token_buy_per_user']+params['regular_token_buy_per_user'])*token_holders
+    else:
+        product_revenue = (product_users-ua['ua_product_users'])*params['one_time_product_revenue_per_user']+product_users*params['regular_product_revenue_per_user']
+        token_buys = ((token_holders-ua['ua_token_holders'])*params['one_time_token_buy_per_user'])+token_holders*params['regular_token_buy_per_user']
+    ua['ua_product_users'] = np.full(runs, product_users)
+    ua['ua_token_holders'] = np.full(runs, token_holders)
+    ua['ua_product_revenue'] = np.full(runs, product_revenue)
+    ua['ua_token_buys'] = np.full(runs, token_buys)
+    if record: record(9, state)
+
+    # utility token allocations from vesting, airdrops, incentivisation, and holdings of previous timestep
+    utility_tokens = agents['a_utility_tokens'] + agents['a_utility_from_holding_tokens']
+
+    # substep 10: staking base apr
+    lock_apr = params['lock_apr']/100
+    allocations = utility_tokens * params['lock_share']/100
+    removal = agents['a_tokens_apr_locked_cum'] * removal_perc
+    rewards = (agents['a_tokens_apr_locked_cum'] + allocations - removal) * lock_apr/12
+    u['u_staking_base_apr_rewards'] = rewards.sum(axis=-1)
+    u['u_staking_base_apr_allocation'] = allocations.sum(axis=-1)
+    u['u_staking_base_apr_allocation_cum'] += allocations.sum(axis=-1) - removal.sum(axis=-1)
+    u['u_staking_base_apr_remove'] = removal.sum(axis=-1)
+    agents['a_tokens_apr_locked'] = allocations
+    agents['a_tokens_apr_locked_cum'] += allocations - removal
+    agents['a_tokens_apr_locked_remove'] = removal
+    agents['a_tokens_apr_locked_rewards'] = rewards
+    agents['a_tokens'] += rewards + removal
+    agents['a_tokens'][:, ctx['lock_payout_source']] -= rewards.sum(axis=-1)[:, np.newaxis]
+    if record: record(10, state)
+
+    # substep 11: buyback amount from revenue share
+    if float(params['lock_buyback_distribute_share']) > 0:
+        u['u_buyback_from_revenue_share_usd'] = ua['ua_product_revenue'] * float(params['lock_buyback_from_revenue_share']) / 100
+    else:
+        u['u_buyback_from_revenue_share_usd'] = np.zeros(runs)
+    if record: record(11, state)
+
+    # substep 12: staking vesting
+    staking_vesting_bucket = ctx['staking_vesting_bucket']
+    staking_vesting_bucket_tokens = agents['a_tokens'][:, staking_vesting_bucket][:, 0]
+    allocations = utility_tokens * params['lock_vesting_share']/100
+    removal = agents['a_tokens_staking_vesting_locked_cum'] * removal_perc
+    staked = u['u_staking_vesting_allocation_cum'] + allocations.sum(axis=-1) - removal.sum(axis=-1)
+    rewards = safe_divide(staking_vesting_bucket_tokens[:, np.newaxis] * (agents['a_tokens_staking_vesting_locked_cum'] + allocations - removal),
+                          staked[:, np.newaxis])
+    u['u_staking_vesting_rewards'] = staking_vesting_bucket_tokens
+    u['u_staking_vesting_allocation'] = allocations.sum(axis=-1)
+    u['u_staking_vesting_allocation_cum'] += allocations.sum(axis=-1) - removal.sum(axis=-1)
+    u['u_staking_vesting_remove'] = removal.sum(axis=-1)
+    agents['a_tokens_staking_vesting_locked'] = allocations
+    agents['a_tokens_staking_vesting_locked_cum'] += allocations - removal
+    agents['a_tokens_staking_vesting_locked_remove'] = removal
+    agents['a_tokens_staking_vesting_locked_rewards'] = rewards
+    agents['a_tokens'] += rewards + removal
+    agents['a_tokens'][:, staking_vesting_bucket] -= staking_vesting_bucket_tokens[:, np.newaxis]
+    if record: record(12, state)
+
+    # substep 13: burning
+    allocations = utility_tokens * params['burning_share']/100
+    agents['a_tokens_burned'] = allocations
+    agents['a_tokens_burned_cum'] += allocations
+    u['u_burning_allocation'] = allocations.sum(axis=-1)
+    u['u_burning_allocation_cum'] += allocations.sum(axis=-1)
+    if record: record(13, state)
+
+    # substep 14: transfer
+    allocations = utility_tokens * params['transfer_share']/100
+    agents['a_tokens_transferred'] = allocations
+    agents['a_tokens_transferred_cum'] += allocations
+    agents['a_tokens'][:, ctx['transfer_destination']] += allocations.sum(axis=-1)[:, np.newaxis]
+    u['u_transfer_allocation'] = allocations.sum(axis=-1)
+    u['u_transfer_allocation_cum'] += allocations.sum(axis=-1)
+    if record: record(14, state)
+
+    # substep 15: business assumptions
+    expenditures = params['salaries_per_month'] + params['license_costs_per_month'] + params['other_monthly_costs']
+    revenue_streams = max(params['royalty_income_per_month'] + params['other_income_per_month'] + params['treasury_income_per_month'], 0)
+    buybacks = u['u_buyback_from_revenue_share_usd']
+    if ctx['buyback_window'][current_month]:
+        if params['buyback_type'] == "Fixed":
+            buybacks = buybacks + params['buyback_fixed_per_month']
+        elif params['buyback_type'] == "Percentage":
+            buybacks = buybacks + ba['ba_cash_balance'] * params['buyback_perc_per_month'] / 100
+        else:
+            raise ValueError('The buyback type is not defined!')
+    if current_month == 1:
+        required_liquidity_pool_fund_allocation = params['initial_lp_token_allocation'] * initial_token_price
+        cash_flow = (ctx['raised_capital'] - required_liquidity_pool_fund_allocation + revenue_streams + ua['ua_product_revenue']
+                     - (expenditures + params['one_time_payments_1'] + params['one_time_payments_2'] + buybacks))
+    else:
+        cash_flow = revenue_streams + ua['ua_product_revenue'] - (expenditures + buybacks)
+    ba['ba_buybacks_usd'] = buybacks
+    ba['ba_cash_balance'] = ba['ba_cash_balance'] + cash_flow
+    if record: record(15, state)
+
+    # substep 16: liquidity pool tx1 after adoption buys
+    token_buys = ua['ua_token_buys']
+    lp_tokens = lp['lp_tokens'] * (lp['lp_usdc'] / (lp['lp_usdc'] + token_buys))
+    bought_tokens = lp['lp_tokens'] - lp_tokens
+    market_investors = ctx['market_investors']
+    if market_investors.any():
+        agents['a_tokens'][:, market_investors] += bought_tokens[:, np.newaxis] / market_investors.sum()
+    lp['lp_tokens'] = lp_tokens
+    lp['lp_usdc'] = lp['lp_usdc'] + token_buys
+    lp['lp_token_price'] = lp['lp_usdc'] / lp['lp_tokens']
+    update_lp_price_range(lp, lp['lp_token_price'], 1, current_month, initial_token_price)
+    lp['lp_tokens_after_adoption'] = lp['lp_tokens']
+    if record: record(16, state)
+
+    # substep 17: holding
+    allocations = utility_tokens * params['holding_share']/100
+    rewards = np.where(not_protocol_bucket,
+                       (agents['a_tokens'] - agents['a_tokens_apr_locked_rewards'] - agents['a_tokens_apr_locked_remove']
+                        - agents['a_tokens_staking_vesting_locked_rewards'] - agents['a_tokens_staking_vesting_locked_remove']
+                        + allocations) * params['holding_apr']/100/12, 0)
+    agents['a_tokens'] += allocations + rewards
+    agents['a_tokens'][:, ctx['holding_payout_source']] -= rewards.sum(axis=-1)[:, np.newaxis]
+    u['u_holding_rewards'] = rewards.sum(axis=-1)
+    u['u_holding_allocation'] = allocations.sum(axis=-1)
+    u['u_holding_allocation_cum'] += allocations.sum(axis=-1)
+    if record: record(17, state)
+
+    # substep 18: liquidity mining
+    IL_adjustment_factor = np.where(lp['lp_tokens_after_liquidity_addition'] > 0,
+                                    safe_divide(lp['lp_tokens'] + te['te_selling_allocation'], lp['lp_tokens_after_liquidity_addition']), 1)
+    allocations = utility_tokens * params['liquidity_mining_share']/100
+    removal = agents['a_tokens_liquidity_mining_cum'] * removal_perc
+    rewards = (agents['a_tokens_liquidity_mining_cum'] * IL_adjustment_factor[:, np.newaxis] + allocations - removal) * params['liquidity_mining_apr']/100/12
+    agents['a_tokens_liquidity_mining'] = allocations
+    agents['a_tokens_liquidity_mining_cum'] = agents['a_tokens_liquidity_mining_cum'] * IL_adjustment_factor[:, np.newaxis] + allocations - removal
+    agents['a_tokens_liquidity_mining_remove'] = removal
+    agents['a_tokens_liquidity_mining_rewards'] = rewards
+    agents['a_tokens'] += rewards + removal
+    agents['a_tokens'][:, ctx['liquidity_mining_payout_source']] -= rewards.sum(axis=-1)[:, np.newaxis]
+    u['u_liquidity_mining_rewards'] = rewards.sum(axis=-1)
+    u['u_liquidity_mining_allocation'] = allocations.sum(axis=-1)
+    u['u_liquidity_mining_allocation_cum'] = u['u_liquidity_mining_allocation_cum'] * IL_adjustment_factor + allocations.sum(axis=-1) - removal.sum(axis=-1)
+    u['u_liquidity_mining_allocation_remove'] = removal.sum(axis=-1)
+    if record: record(18, state)
+
+    # substep 19: liquidity pool tx2 after vesting sell
+    tokens_to_sell = (agents['a_selling_tokens'] + agents['a_selling_from_holding_tokens']).sum(axis=-1)
+    lp['lp_usdc'] = lp['lp_usdc'] * (lp['lp_tokens'] / (lp['lp_tokens'] + tokens_to_sell))
+    lp['lp_tokens'] = lp['lp_tokens'] + tokens_to_sell
+    lp['lp_token_price'] = lp['lp_usdc'] / lp['lp_tokens']
+    update_lp_price_range(lp, lp['lp_token_price'], 2, current_month, initial_token_price)
+    if record: record(19, state)
+
+    # substep 20: liquidity pool tx3 after liquidity addition
+    tokens_for_liquidity = (agents['a_tokens_liquidity_mining'] - agents['a_tokens_liquidity_mining_remove']).sum(axis=-1)
+    lp['lp_usdc'] = lp['lp_usdc'] + tokens_for_liquidity * lp['lp_token_price']
+    lp['lp_tokens'] = lp['lp_tokens'] + tokens_for_liquidity
+    lp['lp_token_price'] = np.maximum(lp['lp_usdc'] / lp['lp_tokens'], 0)
+    lp['lp_constant_product'] = lp['lp_usdc'] * lp['lp_tokens']
+    update_lp_price_range(lp, lp['lp_token_price'], 3, current_month, initial_token_price)
+    lp['lp_tokens_after_liquidity_addition'] = lp['lp_tokens']
+    if record: record(20, state)
+
+    # substep 21: liquidity pool tx4 after buyback
+    buybacks_usd = ba['ba_buybacks_usd']
+    lp['lp_tokens'] = lp['lp_tokens'] * (lp['lp_usdc'] / (lp['lp_usdc'] + buybacks_usd))
+    lp['lp_usdc'] = lp['lp_usdc'] + buybacks_usd
+    lp['lp_token_price'] = lp['lp_usdc'] / lp['lp_tokens']
+    update_lp_price_range(lp, lp['lp_token_price'], 4, current_month, initial_token_price)
+    lp['lp_tokens_after_buyback'] = lp['lp_tokens']
+    if record: record(21, state)
+
+    # substep 22: staking revenue share buyback allocation
+    bought_back_tokens = lp['lp_tokens_after_liquidity_addition'] - lp['lp_tokens']
+    revenue_share = np.where(ba['ba_buybacks_usd'] != 0, u['u_buyback_from_revenue_share_usd'] / np.where(ba['ba_buybacks_usd'] != 0, ba['ba_buybacks_usd'], 1), 0)
+    rewards_sum = bought_back_tokens * revenue_share
+    business_buyback = bought_back_tokens * (1 - revenue_share)
+    allocations = utility_tokens * params['lock_buyback_distribute_share']/100
+    removal = agents['a_tokens_buyback_locked_cum'] * removal_perc
+    staked = u['u_staking_revenue_share_allocation_cum'] + allocations.sum(axis=-1) - removal.sum(axis=-1)
+    rewards = safe_divide(rewards_sum[:, np.newaxis] * (agents['a_tokens_buyback_locked_cum'] + allocations - removal), staked[:, np.newaxis])
+    agents['a_tokens_buyback_locked'] = allocations
+    agents['a_tokens_buyback_locked_cum'] += allocations - removal
+    agents['a_tokens_buyback_locked_remove'] = removal
+    agents['a_tokens_buyback_locked_rewards'] = rewards
+    agents['a_tokens'] += rewards + removal
+    agents['a_tokens'][:, ctx['buyback_bucket']] += business_buyback[:, np.newaxis]
+    u['u_staking_revenue_share_rewards'] = rewards_sum
+    u['u_staking_revenue_share_allocation'] = allocations.sum(axis=-1)
+    u['u_staking_revenue_share_allocation_cum'] += allocations.sum(axis=-1) - removal.sum(axis=-1)
+    u['u_staking_revenue_share_remove'] = removal.sum(axis=-1)
+    if record: record(22, state)
+
+    # substep 23: token economy metrics
+    protocol_bucket_tokens = agents['a_tokens'][:, ctx['is_protocol_bucket']].sum(axis=-1)
+    held_tokens = agents['a_tokens'][:, not_protocol_bucket].sum(axis=-1)
+    circulating_tokens = (protocol_bucket_tokens + held_tokens + lp['lp_tokens'] + u['u_staking_base_apr_allocation_cum']
+                          + u['u_staking_revenue_share_allocation_cum'] + u['u_staking_vesting_allocation_cum'])
+    te['te_total_supply'] = np.full(runs, total_token_supply, dtype=float)
+    te['te_circulating_supply'] = circulating_tokens
+    te['te_unvested_supply'] = total_token_supply - agents['a_tokens_vested_cum'].sum(axis=-1) - te['te_airdrop_tokens_cum'] - params['initial_lp_token_allocation']
+    te['te_MC'] = lp['lp_token_price'] * circulating_tokens
+    te['te_FDV_MC'] = lp['lp_token_price'] * total_token_supply
+    te['te_selling_perc'] = np.full(runs, params['avg_token_selling_allocation'], dtype=float)
+    te['te_utility_perc'] = np.full(runs, params['avg_token_utility_allocation'], dtype=float)
+    te['te_holding_perc'] = np.full(runs, params['avg_token_holding_allocation'], dtype=float)
+    te['te_remove_perc'] = np.full(runs, removal_perc, dtype=float)
+    te['te_holding_supply'] = held_tokens
+    te['te_incentivised_tokens_usd'] = te['te_incentivised_tokens'] * lp['lp_token_price']
+    te['te_airdrop_tokens_usd'] = te['te_airdrop_tokens'] * lp['lp_token_price']
+    if record: record(23, state)
+
+
+# Result Recording
+class SubstepRecorder:
+    """
+    Collect flat snapshots of the batched vectorized state at the selected substeps.
+    """
+    def __init__(self, substeps):
+        self.substeps = set(substeps)
+        self.rows = {substep: [] for substep in substeps}
+
+    def __call__(self, substep, state):
+        if substep in self.substeps:
+            self.rows[substep].append((
+                state['timestep'],
+                state['date'],
+                np.array(list(state['token_economy'].values())),
+                np.array(list(state['liquidity_pool'].values())),
+                state['agents'].numeric.copy(),
+                np.array(list(state['utilities'].values())),
+                np.array(list(state['user_adoption'].values())),
+                np.array(list(state['business_assumptions'].values())),
+                state['agent_actions'].copy(),
+            ))
+
+    def to_frames(self, ctx, state, params, first_run=1, subset=0, action_dicts=False):
+        """
+        Convert the snapshots to data frames with the column names of post_processing.postprocessing.
+        The rows are ordered by run and timestep like the radCAD results, runs are numbered from first_run on.
+        All columns are numeric or categorical: the agent names, types and current actions are categoricals and the
+        agent actions are written into the columns '<name>_a_actions_<action>' for the AGENT_ACTIONS. With
+        action_dicts=True the agent actions are written as dictionaries into '<name>_a_actions' instead, as radCAD
+        records them, which is much slower and needs much more memory for many runs.
+        """
+        runs = state['agent_actions'].shape[0]
+        frames = {}
+        for substep, rows in self.rows.items():
+            n_timesteps = len(rows)
+            n_rows = n_timesteps * runs
+
+            def flatten(values):
+                # (timesteps, runs) -> run major rows
+                return np.asarray(values).T.reshape(n_rows)
+
+            def categorical(value):
+                return pd.Categorical.from_codes(np.zeros(n_rows, dtype=np.int8), categories=[value])
+
+            columns = {
+                'timestep': np.tile([row[0] for row in rows], runs),
+                'date': np.tile(pd.to_datetime([row[1] for row in rows]).values, runs),
+                'run': np.repeat(np.arange(first_run, first_run + runs), n_timesteps),
+            }
+            for i, group in [(2, 'token_economy'), (3, 'liquidity_pool')]:
+                values = np.array([row[i] for row in rows], dtype=float).reshape(n_timesteps, -1, runs)
+                for j, key in enumerate(state[group]):
+                    columns[key] = flatten(values[:, j])
+
+            agent_values = np.array([row[4] for row in rows]).reshape(n_timesteps, len(AGENT_NUMERIC_FIELDS), runs, -1)
+            agent_actions = np.array([row[8] for row in rows]).reshape(n_timesteps, runs, -1, len(AGENT_ACTIONS))
+            for k, name in enumerate(ctx['names']):
+                columns[name+'_agents'] = np.ones(n_rows, dtype=int)
+                for field in AGENT_FIELDS:
+                    if field == 'a_name':
+                        columns[name+'_'+field] = categorical(name)
+                    elif field == 'a_type':
+                        columns[name+'_'+field] = categorical(ctx['types'][k])
+                    elif field == 'a_actions':
+                        actions = agent_actions[:, :, k].transpose(1, 0, 2).reshape(n_rows, len(AGENT_ACTIONS))
+                        if action_dicts:
+                            columns[name+'_'+field] = [dict(zip(AGENT_ACTIONS, row)) for row in actions.tolist()]
+                        else:
+                            for a, action in enumerate(AGENT_ACTIONS):
+                                columns[name+'_'+field+'_'+action] = actions[:, a]
+                    elif field == 'a_current_action':
+                        columns[name+'_'+field] = categorical('hold')
+                    else:
+                        columns[name+'_'+field] = flatten(agent_values[:, AGENT_FIELD_INDEX[field], :, k])
+
+            for i, group in [(5, 'utilities'), (6, 'user_adoption'), (7, 'business_assumptions')]:
+                values = np.array([row[i] for row in rows], dtype=float).reshape(n_timesteps, -1, runs)
+                for j, key in enumerate(state[group]):
+                    columns[key] = flatten(values[:, j])
+
+            data = pd.DataFrame(columns)
+            data['subset'] = subset
+            frames[substep] = data
+        return frames
+
+
+class RunGenerators:
+    """
+    One random generator per monte carlo run, drawing the random numbers of a batch of runs along the run axis.
+    Every run draws the same numbers whether it is simulated alone or within a batch of runs. The draws of
+    buffered_draws calls are drawn at once per run, which gives the same numbers as drawing them call by call.
+    """
+    def __init__(self, seeds, buffered_draws=1):
+        self.generators = [np.random.default_rng(seed) for seed in seeds]
+        self.buffered_draws = max(int(buffered_draws), 1)
+        self._key = None
+        self._buffer = None
+        self._next = 0
+
+    def gamma(self, shape, size):
+        # size = (runs, ...) as drawn by draw_meta_bucket_shares for the batched state
+        size = tuple(size[1:])
+        key = (np.asarray(shape).tobytes(), size)
+        if key != self._key or self._next == self.buffered_draws:
+            self._key, self._next = key, 0
+            self._buffer = np.stack([generator.gamma(shape, size=(self.buffered_draws,) + size) for generator in self.generators])
+        draws = self._buffer[:, self._next]
+        self._next += 1
+        return draws
+
+
+# Simulation
+def vectorized_run(params, stakeholder_name_mapping, timesteps, substeps=None, runs=1, subset=0, seed=None,
+                   batch_runs=RUN_BATCH_SIZE, sink=None, action_dicts=False, first_run=0):
+    """
+    Definition:
+    Run the QTM for one parameter set with the vectorized engine, advancing batches of monte carlo runs in lockstep.
+
+    Parameters:
+    params: single parameter set (scalar values, as passed by radCAD to the policy functions)
+    stakeholder_name_mapping: mapping of the stakeholder names to their types
+    timesteps: number of simulated months
+    substeps: substeps to record, defaults to the last substep of each timestep
+    runs: number of monte carlo runs
+    seed: seed (or numpy SeedSequence) of the random generators for the stochastic agent behavior, every run draws
+          from its own generator, so the results do not depend on batch_runs
+    batch_runs: number of runs simulated at once, bounds the memory of the batched state and its recorded results
+    sink: optional ResultSink (see result_sinks.py) the results of every batch of runs are written to, with an
+          additional 'substep' column, instead of being collected
+    action_dicts: write the agent actions as dictionaries, see SubstepRecorder.to_frames
+    first_run: number of runs before the first simulated run, e.g. of a range of runs simulated by a worker, the runs
+               draw the same random numbers as in a simulation of all runs with the same seed
+
+    Returns:
+    dictionary of post processed data frames per recorded substep, with the run index first_run+1..first_run+runs in
+    the 'run' column, or the flushed sink
+    """
+    if batch_runs < 1:
+        raise ValueError(f"The number of runs per batch has to be positive, not {batch_runs}.")
+    substeps = [N_SUBSTEPS] if substeps is None else list(substeps)
+    ctx = prepare_vectorized_run(params, stakeholder_name_mapping, timesteps)
+    run_seeds = (seed if isinstance(seed, np.random.SeedSequence) else np.random.SeedSequence(seed)).spawn(first_run + runs)[first_run:]
+    frames = {substep: [] for substep in substeps}
+
+    for batch_start in range(0, runs, batch_runs):
+        batch_seeds = run_seeds[batch_start:batch_start + batch_runs]
+        state = initialize_vectorized_state(ctx, runs=len(batch_seeds))
+        recorder = SubstepRecorder(substeps)
+        rng = RunGenerators(batch_seeds, buffered_draws=timesteps)
+
+        for current_month in range(1, timesteps + 1):
+            state['timestep'] = current_month
+            vectorized_timestep(params, ctx, state, current_month, record=recorder, rng=rng)
+
+        batch_frames = recorder.to_frames(ctx, state, params, first_run=first_run + batch_start + 1, subset=subset, action_dicts=action_dicts)
+        del recorder, state
+        for substep in substeps:
+            if sink is not None:
+                sink.write(batch_frames[substep].assign(substep=substep))
+            else:
+                frames[substep].append(batch_frames[substep])
+
+    if sink is not None:
+        sink.flush()
+        return sink
+    return {substep: pd.concat(frames[substep], ignore_index=True) if len(frames[substep]) > 1 else frames[substep][0]
+            for substep in substeps}
+
+def vectorized_simulation(sys_param, stakeholder_name_mapping, timesteps, runs=1, substeps=None, seed=None,
+                          batch_runs=RUN_BATCH_SIZE, sink=None, action_dicts=False):
+    """
+    Definition:
+    Run all parameter subsets of sys_param with the vectorized engine, following the radCAD parameter sweep convention.
+    The monte carlo runs of each parameter subset are simulated in batches of batch_runs runs (see vectorized_run).
+
+    Returns:
+    dictionary of post processed data frames per recorded substep, or the flushed sink
+    """
+    substeps = [N_SUBSTEPS] if substeps is None else list(substeps)
+    frames = {substep: [] for substep in substeps}
+    param_sweep = generate_parameter_sweep(sys_param)
+    seeds = np.random.SeedSequence(seed).spawn(len(param_sweep))
+    precompute_user_adoption(param_sweep, timesteps)
+
+    for subset, params in enumerate(param_sweep):
+        subset_frames = vectorized_run(params, stakeholder_name_mapping, timesteps, substeps=substeps, runs=runs, subset=subset,
+                                       seed=seeds[subset], batch_runs=batch_runs, sink=sink, action_dicts=action_dicts)
+        if sink is None:
+            for substep in substeps:
+                frames[substep].append(subset_frames[substep])
+
+    if sink is not None:
+        return sink
+    return {substep: pd.concat(frames[substep], ignore_index=True) for substep in substeps}
@@ -0,0 +1,300 @@
+# Dependences
+import sqlite3
+import time
+import traceback
+import functools
+from concurrent.futures import ProcessPoolExecutor
+
+# Project dependences
+from result_sinks import SQLiteSink
+from result_store import ResultStore, DEFAULT_TABLE
+
+# table of the simulation jobs, next to the results in the interface database
+JOBS_TABLE = 'simulation_jobs'
+
+# job states
+QUEUED = 'queued'
+RUNNING = 'running'
+DONE = 'done'
+FAILED = 'failed'
+CANCELLED = 'cancelled'
+FINISHED_STATES = (DONE, FAILED, CANCELLED)
+
+# number of result rows written at once while a job runs, i.e. how often partial results become visible
+PARTIAL_RESULT_ROWS = 12
+
+# process pool shared by all sessions of the interface, see worker_pool()
+_worker_pool = None
+
+
+class JobCancelled(Exception):
+    """
+    Raised within a simulation job when its cancellation was requested.
+    """
+
+
+class JobQueue:
+    """
+    Status table of the simulation jobs in an SQLite database, e.g. interfaceData.db.
+
+    The interface submits jobs and polls their status, the worker processes update the status and progress of their
+    job after every simulated timestep. The database is opened in WAL mode, so polling never blocks the workers.
+    """
+
+    def __init__(self, db):
+        self.db = db
+        self.conn = sqlite3.connect(db, timeout=30)
+        self.conn.row_factory = sqlite3.Row
+        self.conn.execute('PRAGMA journal_mode=WAL')
+        with self.conn:
+            self.conn.execute(f'''CREATE TABLE IF NOT EXISTS {JOBS_TABLE} (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                experiment TEXT NOT NULL,
+                timesteps INTEGER NOT NULL,
+                runs INTEGER NOT NULL,
+                inputs TEXT,
+                status TEXT NOT NULL,
+                progress REAL NOT NULL DEFAULT 0,
+                timestep INTEGER NOT NULL DEFAULT 0,
+                cancel INTEGER NOT NULL DEFAULT 0,
+                message TEXT,
+                created REAL NOT NULL,
+                updated REAL NOT NULL)''')
+            if 'inputs' not in [row[1] for row in self.conn.execute(f'PRAGMA table_info({JOBS_TABLE})')]:
+                # job table of a former version
+                self.conn.execute(f'ALTER TABLE {JOBS_TABLE} ADD COLUMN inputs TEXT')
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def close(self):
+        self.conn.close()
+
+    def add(self, experiment=None, timesteps=120, runs=1, inputs=None):
+        """
+        Add a queued job and return its id, see submit() to also start it. The results of the job are stored as the
+        given experiment, by default as the experiment 'job-<id>' of the job.
+        """
+        now = time.time()
+        with self.conn:
+            cursor = self.conn.execute(f'INSERT INTO {JOBS_TABLE} (experiment, timesteps, runs, inputs, status, created, updated) '
+                                       f'VALUES (?, ?, ?, ?, ?, ?, ?)', (experiment or '', timesteps, runs, inputs, QUEUED, now, now))
+            if experiment is None:
+                self.conn.execute(f"UPDATE {JOBS_TABLE} SET experiment = 'job-' || id WHERE id = ?", (cursor.lastrowid,))
+        return cursor.lastrowid
+
+    def submit(self, experiment=None, timesteps=120, runs=1, inputs=None, replaces=None):
+        '''
+        Definition:
+        Queue a simulation job on the shared worker pool.
+
+        Parameters:
+        experiment: name of the experiment the results are stored as in the results table of the database, defaults to
+                    'job-<id>', so the results of concurrent jobs do not overwrite each other
+        timesteps: number of simulated timesteps
+        runs: number of monte carlo runs
+        inputs: path of the 'radCAD_inputs' CSV file to simulate, defaults to the inputs in data/
+        replaces: id of a former job whose results are replaced, e.g. the last job of an interface session, the job
+                  is cancelled and its results are deleted (see discard())
+
+        Returns:
+        id of the job
+        '''
+        if replaces is not None:
+            self.discard(replaces)
+        # the pool is started before the job is added, so starting it does not reset the new job as stale job
+        pool = worker_pool(db=self.db)
+        job_id = self.add(experiment, timesteps, runs, inputs)
+        future = pool.submit(run_job, self.db, job_id)
+        future.add_done_callback(functools.partial(record_job_failure, self.db, job_id))
+        return job_id
+
+    def status(self, job_id):
+        """
+        Dictionary of the job table row of a job, None for unknown jobs.
+        """
+        row = self.conn.execute(f'SELECT * FROM {JOBS_TABLE} WHERE id = ?', (job_id,)).fetchone()
+        return dict(row) if row is not None else None
+
+    def jobs(self, limit=20):
+        """
+        Latest jobs, newest first.
+        """
+        return [dict(row) for row in self.conn.execute(f'SELECT * FROM {JOBS_TABLE} ORDER BY id DESC LIMIT ?', (limit,))]
+
+    def update(self, job_id, **fields):
+        """
+        Update columns of a job, e.g. its status or progress.
+        """
+        fields['updated'] = time.time()
+        with self.conn:
+            self.conn.execute(f'UPDATE {JOBS_TABLE} SET {", ".join(key + " = ?" for key in fields)} WHERE id = ?',
+                              (*fields.values(), job_id))
+
+    def cancel(self, job_id):
+        """
+        Request the cancellation of a job, a running job stops after its current timestep.
+        """
+        now = time.time()
+        with self.conn:
+            self.conn.execute(f'UPDATE {JOBS_TABLE} SET cancel = 1, updated = ? WHERE id = ?', (now, job_id))
+            self.conn.execute(f'UPDATE {JOBS_TABLE} SET status = ?, updated = ? WHERE id = ? AND status = ?',
+                              (CANCELLED, now, job_id, QUEUED))
+
+    def cancel_requested(self, job_id):
+        return bool(self.conn.execute(f'SELECT cancel FROM {JOBS_TABLE} WHERE id = ?', (job_id,)).fetchone()[0])
+
+    def discard(self, job_id):
+        """
+        Cancel a job and delete its results. A running job deletes its partial results itself once it stops.
+        """
+        job = self.status(job_id)
+        if job is None:
+            return
+        self.cancel(job_id)
+        if job['status'] != RUNNING:
+            delete_job_results(self.db, job['experiment'])
+
+    def fail_unfinished(self, message, job_id=None):
+        """
+        Mark the queued and running jobs, or only the given job if it is unfinished, as failed with the given message
+        and delete their partial results. Returns the number of failed jobs.
+        """
+        condition, values = 'status IN (?, ?)', (QUEUED, RUNNING)
+        if job_id is not None:
+            condition, values = condition + ' AND id = ?', values + (job_id,)
+        experiments = [row[0] for row in self.conn.execute(f'SELECT experiment FROM {JOBS_TABLE} WHERE {condition}', values)]
+        with self.conn:
+            failed = self.conn.execute(f'UPDATE {JOBS_TABLE} SET status = ?, message = ?, updated = ? WHERE {condition}',
+                                       (FAILED, message, time.time(), *values)).rowcount
+        for experiment in experiments:
+            delete_job_results(self.db, experiment)
+        return failed
+
+
+class ProgressSink(SQLiteSink):
+    """
+    Result sink of a simulation job: writes the results into the results table, reports the progress to the job
+    table after every timestep and stops the job when its cancellation was requested.
+    """
+
+    def __init__(self, jobs, job_id, total_timesteps, db, experiment='default', batch_size=PARTIAL_RESULT_ROWS):
+        super().__init__(db, experiment=experiment, if_exists='replace', batch_size=batch_size)
+        self.jobs = jobs
+        self.job_id = job_id
+        self.total_timesteps = total_timesteps
+        self.completed_timesteps = 0
+
+    def append(self, records):
+        # the in-place executor hands over the records of every completed timestep
+        super().append(records)
+        self.completed_timesteps += 1
+        self.jobs.update(self.job_id, progress=min(self.completed_timesteps / self.total_timesteps, 1.0),
+                         timestep=records[-1]['timestep'] if records else 0)
+        if self.jobs.cancel_requested(self.job_id):
+            raise JobCancelled(f"Job {self.job_id} was cancelled.")
+
+    def write_batch(self, data):
+        # same rows and columns as the results of simulation.simulation(), i.e. without the initial state
+        super().write_batch(data[data['substep'] > 0].drop(columns='substep').reset_index(drop=True))
+
+
+# Worker
+def worker_pool(processes=None, db=None):
+    """
+    Process pool of the simulation workers, created once per interface server and shared by all its sessions. When the
+    pool is started, the queued and running jobs in the job table of db were left behind by a former server and are
+    marked as failed, no worker will ever finish them.
+    processes: number of worker processes, defaults to the number of CPU cores minus one (see sweep.available_processes)
+    """
+    global _worker_pool
+    if _worker_pool is None:
+        from sweep import available_processes
+        if db is not None:
+            with JobQueue(db) as jobs:
+                jobs.fail_unfinished("Interrupted by a restart of the interface.")
+        _worker_pool = ProcessPoolExecutor(max_workers=available_processes(processes))
+    return _worker_pool
+
+def delete_job_results(db, experiment):
+    """
+    Delete the (partial) results of a job from the results table of db.
+    """
+    with ResultStore(db) as store:
+        if experiment in store.experiments(DEFAULT_TABLE):
+            store.delete(experiment, table=DEFAULT_TABLE)
+
+def record_job_failure(db, job_id, future):
+    """
+    Done callback of the future of a job, marks the job as failed if its worker raised outside of run_job(), e.g. when
+    the worker process died.
+    """
+    if future.cancelled() or future.exception() is None:
+        return
+    exception = future.exception()
+    with JobQueue(db) as jobs:
+        jobs.fail_unfinished(''.join(traceback.format_exception(type(exception), exception, exception.__traceback__)), job_id)
+
+def run_job(db, job_id):
+    '''
+    Definition:
+    Run a queued simulation job in a worker process. The results are restored from the result cache if the scenario
+    was simulated before, else simulated timestep by timestep with the in-place executor and streamed into the
+    results table of the database, so partial results can be plotted while the job is running. The partial results
+    of cancelled and failed jobs are deleted.
+
+    Parameters:
+    db: SQLite database of the job table and the results
+    job_id: id of the job in the job table
+
+    Returns:
+    final status of the job
+    '''
+    # the model is imported in the worker process, so the interface process stays responsive
+    from model import load_model
+    from sys_params import QTM_INPUTS
+    from executor import simulation_in_place
+    from result_cache import ResultCache, result_key
+
+    with JobQueue(db) as jobs:
+        job = jobs.status(job_id)
+        if job is None or job['cancel']:
+            if job is not None:
+                jobs.update(job_id, status=CANCELLED)
+            return CANCELLED
+        jobs.update(job_id, status=RUNNING)
+        try:
+            # models are cached per inputs file, so switching between inputs needs no module reloads
+            model = load_model(job['inputs'] or QTM_INPUTS)
+            key = result_key(model.sys_param, job['timesteps'], job['runs'])
+            with ResultCache() as cache:
+                data = cache.get(key)
+                if data is not None:
+                    with ResultStore(db) as store:
+                        store.save(data, experiment=job['experiment'], table=DEFAULT_TABLE)
+                else:
+                    total_timesteps = job['timesteps'] * job['runs'] * len(model.param_sweep())
+                    with ProgressSink(jobs, job_id, total_timesteps, db, experiment=job['experiment']) as sink:
+                        simulation_in_place(model.initial_state, model.state_update_block, model.sys_param,
+                                            job['timesteps'], runs=job['runs'], sink=sink)
+                    with ResultStore(db) as store:
+                        cache.set(key, store.load(experiment=job['experiment'], table=DEFAULT_TABLE))
+            # a job discarded while its last results were written is not reported as done
+            if jobs.cancel_requested(job_id):
+                raise JobCancelled(f"Job {job_id} was cancelled.")
+            jobs.update(job_id, status=DONE, progress=1.0, timestep=job['timesteps'])
+            return DONE
+        except JobCancelled:
+            delete_job_results(db, job['experiment'])
+            jobs.update(job_id, status=CANCELLED, message="Cancelled by the user.")
+            return CANCELLED
+        except Exception:
+            message = traceback.format_exc()
+            try:
+                delete_job_results(db, job['experiment'])
+            finally:
+                jobs.update(job_id, status=FAILED, message=message)
+            return FAILED